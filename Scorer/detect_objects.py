@@ -2,13 +2,42 @@ import os, io
 from google.cloud import vision
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = 'google_cloud/vision_key.json'
-def vision_detect(image_path):
-    vision_client = vision.ImageAnnotatorClient()
-    with io.open(image_path, 'rb') as image_file:
-        image_content = image_file.read()
-    image = vision.Image(content=image_content)
-    response = vision_client.object_localization(image=image)
-    localized_object_annotations = response.localized_object_annotations
+
+# image: encoded bytes, a file path, or a frame.Frame (sent as its cached JPEG)
+def _image_content(image) -> bytes:
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, (str, os.PathLike)):
+        with io.open(image, 'rb') as image_file:
+            return image_file.read()
+    if hasattr(image, "jpeg"):
+        return image.jpeg
+    raise TypeError(f"unsupported image type: {type(image).__name__}")
+
+# goes through the shared VisionService: one long-lived client per worker,
+# images sent at about the same time share a batch_annotate_images request
+def vision_detect(image):
+    from Scorer.vision_service import default_vision_service
+    return default_vision_service().detect(image)
+
+# an ImageAnnotatorAsyncClient binds to the running event loop, create it from inside one
+def vision_async_client():
+    return vision.ImageAnnotatorAsyncClient()
+
+# same as vision_detect on the asyncio client; pass a client to reuse its channel
+async def vision_detect_async(image, client=None):
+    vision_client = client or vision_async_client()
+    request = vision.AnnotateImageRequest(
+        image=vision.Image(content=_image_content(image)),
+        features=[vision.Feature(type_=vision.Feature.Type.OBJECT_LOCALIZATION)],
+    )
+    batch = await vision_client.batch_annotate_images(requests=[request])
+    response = batch.responses[0]
+    if response.error.message:
+        raise RuntimeError(f"vision error: {response.error.message}")
+    return _object_list(response.localized_object_annotations)
+
+def _object_list(localized_object_annotations):
     obj_list = []
     for obj in localized_object_annotations:
         vertices = obj.bounding_poly.normalized_vertices
@@ -0,0 +1,219 @@
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from frame import Frame
+from Scorer.vision_service import default_vision_service
+
+# Object detectors behind one interface.
+# Every backend's detect(image) returns what vision_detect returns: a list of
+# {'object': label, 'score': float, 'bbox': [x_min, y_min, x_max, y_max]}
+# with the box normalized to [0, 1]. image can be a Frame, a BGR array,
+# encoded bytes or a file path.
+#   CloudVisionBackend  Cloud Vision through the shared VisionService
+#   OpenCVDNNBackend    local CPU model through cv2.dnn, input blob preallocated
+#   HybridBackend       local model on every frame, Cloud Vision only to confirm
+#                       detections the local model is unsure about
+
+ImageInput = Union[Frame, np.ndarray, bytes, bytearray, memoryview, str, os.PathLike]
+
+class DetectorBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def detect(self, image: ImageInput) -> List[dict]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+class CloudVisionBackend(DetectorBackend):
+    name = "cloud"
+
+    def __init__(self, service=None, timeout_s: Optional[float] = 10.0):
+        self.service = service  # None: the shared default_vision_service()
+        self.timeout_s = timeout_s
+
+    def submit(self, image: ImageInput) -> Future:
+        if isinstance(image, np.ndarray):
+            image = Frame(image)  # sent as its JPEG
+        return (self.service or default_vision_service()).submit(image)
+
+    def detect(self, image: ImageInput) -> List[dict]:
+        return self.submit(image).result(self.timeout_s)
+
+# OpenCV's detection layout: a (1, 1, N, 7) tensor of
+# [image_id, class_id, confidence, x_min, y_min, x_max, y_max] (SSD DetectionOutput)
+def parse_detection_output(out: np.ndarray, labels: Sequence[str], score_threshold: float) -> List[dict]:
+    rows = out.reshape(-1, 7)
+    rows = rows[rows[:, 2] >= score_threshold]
+    boxes = np.clip(rows[:, 3:7], 0.0, 1.0)
+    dets = []
+    for row, box in zip(rows, boxes):
+        cls = int(row[1])
+        label = labels[cls] if 0 <= cls < len(labels) else str(cls)
+        dets.append({'object': label, 'score': float(row[2]), 'bbox': [float(v) for v in box]})
+    return dets
+
+def load_labels(labels: Union[None, str, os.PathLike, Sequence[str]]) -> List[str]:
+    if labels is None:
+        return []
+    if isinstance(labels, (str, os.PathLike)):
+        with open(labels, encoding="utf-8") as f:
+            return [line.strip() for line in f]
+    return list(labels)
+
+# model: path to anything cv2.dnn.readNet reads (.onnx, .pb, .tflite, ...) or ONNX bytes.
+# The input blob (1, 3, h, w) and the intermediate images are allocated once;
+# every frame is resized, normalized and split into the blob's planes in place,
+# which gives the same blob as cv2.dnn.blobFromImage(image, scale, input_size, mean, swap_rb).
+# parse turns the network output into detections (default: parse_detection_output).
+class OpenCVDNNBackend(DetectorBackend):
+    name = "local"
+
+    def __init__(self, model: Union[str, os.PathLike, bytes], input_size: Tuple[int, int] = (300, 300),
+                 labels: Union[None, str, os.PathLike, Sequence[str]] = None, score_threshold: float = 0.3,
+                 scale: float = 1.0 / 127.5, mean: Tuple[float, float, float] = (127.5, 127.5, 127.5),
+                 swap_rb: bool = True,
+                 parse: Optional[Callable[[np.ndarray, Sequence[str], float], List[dict]]] = None):
+        if isinstance(model, (bytes, bytearray, memoryview)):
+            self.net = cv2.dnn.readNetFromONNX(np.frombuffer(model, dtype=np.uint8))
+        else:
+            self.net = cv2.dnn.readNet(str(model))
+        self.input_size = tuple(input_size)  # (width, height)
+        self.labels = load_labels(labels)
+        self.score_threshold = score_threshold
+        self.scale = np.float32(scale)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        offset = self.mean * self.scale
+        # a scalar offset broadcasts much faster than a per-channel one
+        self._offset = offset[0] if np.all(offset == offset[0]) else offset
+        self.swap_rb = swap_rb
+        self.parse = parse or parse_detection_output
+        w, h = self.input_size
+        self._resized = np.empty((h, w, 3), dtype=np.uint8)
+        self._normalized = np.empty((h, w, 3), dtype=np.float32)
+        self.blob = np.empty((1, 3, h, w), dtype=np.float32)
+        # cv2.split writes straight into the blob's channel planes; listing them
+        # in reverse order does the BGR -> RGB swap for free
+        planes = [self.blob[0, c] for c in range(3)]
+        self._planes = planes[::-1] if swap_rb else planes
+        self._lock = threading.Lock()  # one frame at a time through the shared buffers
+
+    @staticmethod
+    def _bgr(image: ImageInput) -> np.ndarray:
+        if isinstance(image, Frame):
+            image = image.image
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            image = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        elif isinstance(image, (str, os.PathLike)):
+            image = cv2.imread(str(image), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("could not decode image")
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        return image
+
+    # fill self.blob from image, no allocation once the buffers exist
+    def prepare(self, image: ImageInput) -> np.ndarray:
+        src = cv2.resize(self._bgr(image), self.input_size, dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        # (x - mean) * scale as x * scale - mean * scale
+        np.multiply(src, self.scale, out=self._normalized, casting="unsafe")
+        np.subtract(self._normalized, self._offset, out=self._normalized)
+        cv2.split(self._normalized, self._planes)
+        return self.blob
+
+    def detect(self, image: ImageInput) -> List[dict]:
+        with self._lock:
+            self.net.setInput(self.prepare(image))
+            out = self.net.forward()
+        return self.parse(out, self.labels, self.score_threshold)
+
+def bbox_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+# Detections scoring at least confirm_band[1] are returned as the local model
+# gives them, below confirm_band[0] they are dropped. A frame with detections
+# in between is sent to the remote backend, and those detections are kept only
+# if the remote one found something overlapping them (IoU >= iou_threshold;
+# labels are not compared, the two models name things differently).
+# min_interval_s rate-limits the remote calls, unsure detections in frames
+# that are not sent are dropped.
+class HybridBackend(DetectorBackend):
+    name = "hybrid"
+
+    def __init__(self, local: DetectorBackend, remote: DetectorBackend,
+                 confirm_band: Tuple[float, float] = (0.3, 0.6), iou_threshold: float = 0.3,
+                 min_interval_s: float = 0.0):
+        self.local = local
+        self.remote = remote
+        self.confirm_band = confirm_band
+        self.iou_threshold = iou_threshold
+        self.min_interval_s = min_interval_s
+        self.frames = 0
+        self.remote_calls = 0
+        self.confirmed = 0
+        self.rejected = 0
+        self.skipped = 0
+        self._last_remote = -float("inf")
+
+    def detect(self, image: ImageInput) -> List[dict]:
+        low, high = self.confirm_band
+        dets = self.local.detect(image)
+        self.frames += 1
+        sure = [d for d in dets if d['score'] >= high]
+        unsure = [d for d in dets if low <= d['score'] < high]
+        if not unsure:
+            return sure
+        now = time.monotonic()
+        if now - self._last_remote < self.min_interval_s:
+            self.skipped += len(unsure)
+            return sure
+        self._last_remote = now
+        self.remote_calls += 1
+        try:
+            remote = self.remote.detect(image)
+        except Exception as e:
+            logging.warning(f"remote confirmation failed, dropping {len(unsure)} detection(s): {e}")
+            self.skipped += len(unsure)
+            return sure
+        kept = [d for d in unsure
+                if any(bbox_iou(d['bbox'], r['bbox']) >= self.iou_threshold for r in remote)]
+        self.confirmed += len(kept)
+        self.rejected += len(unsure) - len(kept)
+        return sure + kept
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "remote_calls": self.remote_calls,
+                "remote_rate": self.remote_calls / self.frames if self.frames else 0.0,
+                "confirmed": self.confirmed, "rejected": self.rejected, "skipped": self.skipped}
+
+    def close(self) -> None:
+        self.local.close()
+        self.remote.close()
+
+# kind: "cloud", "local" or "hybrid"; local_kwargs go to OpenCVDNNBackend
+def make_detector(kind: str = "cloud", model=None, **local_kwargs) -> DetectorBackend:
+    if kind == "cloud":
+        return CloudVisionBackend()
+    if model is None:
+        raise ValueError(f"detector {kind!r} needs a model file")
+    local = OpenCVDNNBackend(model, **local_kwargs)
+    if kind == "local":
+        return local
+    if kind == "hybrid":
+        return HybridBackend(local, CloudVisionBackend())
+    raise ValueError(f"unknown detector backend: {kind}")
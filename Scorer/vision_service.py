@@ -0,0 +1,198 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Optional, Sequence, Tuple
+
+import numpy as np
+from google.api_core import exceptions, retry as retries
+from google.cloud import vision
+
+from Scorer.detect_objects import _image_content, _object_list
+
+# Long-lived Cloud Vision detection service.
+# Each worker thread owns one ImageAnnotatorClient for its whole life, so the
+# channel, auth and TLS setup happen once per worker instead of once per image.
+# Images submitted within batch_window_s of the first waiting one are sent
+# together in a single batch_annotate_images request (at most max_batch, the
+# API limit is 16); submit() returns a Future per image. metrics() reports
+# batch sizes and submit-to-result latency percentiles.
+# Requests retry on UNAVAILABLE / DEADLINE_EXCEEDED for at most timeout_s in
+# total (the client's default retry can keep a worker busy for minutes).
+
+MAX_BATCH = 16  # images per batch_annotate_images request allowed by the API
+
+def _default_features():
+    return [vision.Feature(type_=vision.Feature.Type.OBJECT_LOCALIZATION)]
+
+def _bounded_retry(timeout_s: float) -> retries.Retry:
+    return retries.Retry(initial=0.1, maximum=1.0, multiplier=2.0, timeout=timeout_s,
+                         predicate=retries.if_exception_type(exceptions.ServiceUnavailable,
+                                                             exceptions.DeadlineExceeded))
+
+class VisionService:
+    def __init__(self, pool_size: int = 2, max_batch: int = MAX_BATCH, batch_window_s: float = 0.02,
+                 timeout_s: float = 10.0, client_factory: Optional[Callable[[], object]] = None,
+                 features: Optional[Sequence[vision.Feature]] = None, latency_window: int = 1024):
+        if not 1 <= max_batch <= MAX_BATCH:
+            raise ValueError(f"max_batch must be in [1, {MAX_BATCH}]")
+        self.max_batch = max_batch
+        self.batch_window_s = batch_window_s
+        self.timeout_s = timeout_s
+        self.retry = _bounded_retry(timeout_s)
+        self.client_factory = client_factory or vision.ImageAnnotatorClient
+        self.features = list(features) if features is not None else _default_features()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.clients_created = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._batch_sizes: Deque[int] = deque(maxlen=latency_window)
+        self._queue: Deque[Tuple[bytes, Future, float]] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker, name=f"vision-{i}", daemon=True)
+                         for i in range(max(1, pool_size))]
+        for t in self._threads:
+            t.start()
+
+    # image: encoded bytes, a file path or a Frame; the future resolves to vision_detect's list
+    def submit(self, image) -> Future:
+        content = _image_content(image)
+        fut: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("VisionService is closed")
+            self.submitted += 1
+            self._queue.append((content, fut, time.monotonic()))
+            self._cond.notify()
+        return fut
+
+    def detect(self, image, timeout: Optional[float] = None) -> list:
+        return self.submit(image).result(timeout)
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def latency_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> dict:
+        lat = np.array(self._latencies) if self._latencies else np.zeros(1)
+        return {f"p{p:g}_ms": float(np.percentile(lat, p) * 1e3) for p in percentiles}
+
+    def metrics(self) -> dict:
+        sizes = np.array(self._batch_sizes) if self._batch_sizes else np.zeros(1)
+        return {
+            "depth": len(self._queue),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "batch_mean": float(sizes.mean()),
+            "clients": self.clients_created,
+            **self.latency_percentiles(),
+        }
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # wait=True lets the workers finish what is queued, otherwise it is cancelled
+    def close(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._closed = True
+            pending = [] if wait else list(self._queue)
+            if not wait:
+                self._queue.clear()
+            self._cond.notify_all()
+        for _, fut, _ in pending:
+            fut.cancel()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            # let images arriving within the window join the first one's request
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = self._queue[0][2] + self.batch_window_s - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                if not self._queue:
+                    return []  # another worker took them
+            n = min(self.max_batch, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+        # futures cancelled while queued are not sent
+        return [item for item in batch if item[1].set_running_or_notify_cancel()]
+
+    def _worker(self) -> None:
+        client = None
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            try:
+                if client is None:
+                    client = self.client_factory()
+                    with self._cond:
+                        self.clients_created += 1
+                results = self._annotate(client, batch)
+            except Exception as e:
+                logging.warning(f"vision batch of {len(batch)} failed: {e}")
+                results = [e] * len(batch)
+            now = time.monotonic()
+            with self._cond:
+                self.batches += 1
+                self._batch_sizes.append(len(batch))
+                for (_, _, t0), r in zip(batch, results):
+                    if isinstance(r, Exception):
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+                        self._latencies.append(now - t0)
+            for (_, fut, _), r in zip(batch, results):
+                if isinstance(r, Exception):
+                    fut.set_exception(r)
+                else:
+                    fut.set_result(r)
+
+    def _annotate(self, client, batch) -> list:
+        requests = [vision.AnnotateImageRequest(image=vision.Image(content=content), features=self.features)
+                    for content, _, _ in batch]
+        response = client.batch_annotate_images(requests=requests, timeout=self.timeout_s, retry=self.retry)
+        results = []
+        for r in response.responses:
+            if r.error.message:
+                results.append(RuntimeError(f"vision error: {r.error.message}"))
+            else:
+                results.append(_object_list(r.localized_object_annotations))
+        return results
+
+_default_service: Optional[VisionService] = None
+_default_lock = threading.Lock()
+
+# shared service used by vision_detect; a closed one is replaced by a new one
+def default_vision_service() -> VisionService:
+    global _default_service
+    with _default_lock:
+        if _default_service is None or _default_service.closed:
+            _default_service = VisionService()
+        return _default_service
+
+# close the shared service at process exit and forget it; returns its final
+# metrics, None if it was never created (nothing is started just to close it)
+def shutdown_default_vision_service(timeout: Optional[float] = None) -> Optional[dict]:
+    global _default_service
+    with _default_lock:
+        service, _default_service = _default_service, None
+    if service is None:
+        return None
+    service.close(timeout=timeout)
+    return service.metrics()
@@ -0,0 +1,216 @@
+import time
+import signal
+import asyncio
+import logging
+from typing import Optional, Sequence, Tuple
+
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D
+from map_snapshot import MapCheckpointer
+from tello_wrapper import TelloWrapper
+from frame import Frame, shutdown_default_archiver
+from drone_controller import (MyConfig, Scorer, Selector, Perception, _pose_tuple, _COMMAND_DELTAS,
+                              apply_perception, decide_move, integrate_move,
+                              init_spatial_map, enable_checkpoints, build_detector)
+
+# asyncio runtime for the agents and the drone.
+# Model and vision requests are coroutines on the SDKs' async clients, so any
+# number of them can be in flight on one thread. The djitellopy command path is
+# blocking UDP request/response: AsyncTello runs each command on a worker
+# thread (asyncio.to_thread), one command at a time. Frames come from the
+# background FrameReader, polled without blocking the loop.
+
+COMMAND_TIMEOUT_S = 15.0   # a move/turn the drone has not acknowledged by then is abandoned
+FRAME_TIMEOUT_S = 1.0      # wait for a frame newer than the last one perceived
+FRAME_POLL_S = 0.005
+
+class AsyncTello:
+    def __init__(self, tello: TelloWrapper, command_timeout_s: float = COMMAND_TIMEOUT_S):
+        self.tello = tello
+        self.command_timeout_s = command_timeout_s
+        self._lock = asyncio.Lock()
+        self._running: Optional[asyncio.Future] = None
+
+    # run tello.<name>(*args) on a worker thread; the drone takes one command at a time
+    async def command(self, name: str, *args, timeout: Optional[float] = None):
+        async with self._lock:
+            if self._running is not None and not self._running.done():
+                # a command that timed out or was cancelled is still running in its thread
+                await asyncio.wait({self._running})
+            self._running = asyncio.ensure_future(asyncio.to_thread(getattr(self.tello, name), *args))
+            # shield: cancelling the caller must not drop the thread's result on the floor
+            return await asyncio.wait_for(asyncio.shield(self._running), timeout)
+
+    async def move(self, name: str, value: int) -> Optional[Pose2D]:
+        # body-frame delta of the move, None if the drone did not move
+        ok, _ = await self.command(name, value, timeout=self.command_timeout_s)
+        return _COMMAND_DELTAS[name](value) if ok else None
+
+    async def connect(self) -> None:
+        await self.command("connect")
+
+    async def start_stream(self) -> None:
+        await self.command("start_stream")
+        await self.command("get_frame_reader", True)  # starts the capture thread
+
+    async def takeoff(self) -> bool:
+        return await self.command("takeoff")
+
+    async def is_battery_good(self) -> bool:
+        return await self.command("is_battery_good")
+
+    # next frame newer than after_id, None if none arrives within timeout
+    async def frame(self, after_id: Optional[int] = None, timeout: float = FRAME_TIMEOUT_S) -> Optional[Frame]:
+        fr = self.tello.get_frame_reader(background=True)
+        if fr is None:
+            return None
+        deadline = time.monotonic() + timeout
+        # poll the frame id and only read once a newer frame is there, so
+        # waiting does not count as duplicate reads
+        peek = getattr(fr, "latest_id", None)
+        while True:
+            frame_id = None if after_id is None or peek is None else peek()
+            if frame_id is None or frame_id > after_id:
+                frame = Frame.from_reader(fr)
+                if frame is not None and (after_id is None or frame.frame_id is None
+                                          or frame.frame_id > after_id):
+                    return frame
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(FRAME_POLL_S)
+
+    # let the command in progress finish, then stop the stream and land
+    async def shutdown(self) -> None:
+        async with self._lock:
+            if self._running is not None and not self._running.done():
+                await asyncio.wait({self._running})
+            await asyncio.to_thread(self.tello.stop_stream)
+            await asyncio.to_thread(self.tello.land)
+
+# MovementPipeline on the event loop: frame N's detection and LLM requests
+# run as tasks while move N is flown, each under its own deadline.
+class AsyncMovementPipeline:
+    def __init__(self, tello: AsyncTello, occupancy_grid: OccupancyGrid, value_map: ValueMap,
+                 score_agent: Scorer, select_agent: Selector,
+                 instruction: str = MyConfig.INSTRUCTION,
+                 detect_deadline_s: float = MyConfig.DETECT_DEADLINE_S,
+                 llm_deadline_s: float = MyConfig.LLM_DEADLINE_S):
+        self.tello = tello
+        self.occupancy_grid = occupancy_grid
+        self.value_map = value_map
+        self.score_agent = score_agent
+        self.select_agent = select_agent
+        self.instruction = instruction
+        self.detect_deadline_s = detect_deadline_s
+        self.llm_deadline_s = llm_deadline_s
+        self.last_frame_id: Optional[int] = None
+        self.tasks: Tuple[asyncio.Task, ...] = ()
+        self.stats = {"decisions": 0, "applied": 0, "late": 0,
+                      "no_frame": 0, "cancelled": 0}
+
+    async def step(self) -> Tuple[str, int]:
+        perception = await self.submit()
+        command = decide_move(self.occupancy_grid, self.value_map, self.select_agent)
+        try:
+            delta = await self.tello.move(*command)
+        except BaseException:
+            self.cancel()  # the drone may be anywhere, its frame cannot be placed
+            raise
+        if perception is not None and await self.collect(perception):
+            apply_perception(self.occupancy_grid, self.value_map, self.score_agent, perception)
+            self.stats["applied"] += 1
+        if delta is not None:
+            integrate_move(self.occupancy_grid, self.value_map, delta)
+        self.stats["decisions"] += 1
+        return command
+
+    async def submit(self) -> Optional[Perception]:
+        frame = await self.tello.frame(after_id=self.last_frame_id)
+        if frame is None:
+            self.stats["no_frame"] += 1
+            return None
+        self.last_frame_id = frame.frame_id
+        scorer = self.score_agent
+        self.tasks = (
+            asyncio.create_task(asyncio.wait_for(scorer.detect_objects_async(frame), self.detect_deadline_s)),
+            asyncio.create_task(asyncio.wait_for(scorer._call_llm_api_async(frame, self.instruction),
+                                                 self.llm_deadline_s)),
+        )
+        return Perception(frame, _pose_tuple(self.occupancy_grid), time.monotonic())
+
+    # both stages (each stops at its own deadline); False if the result must be dropped
+    async def collect(self, perception: Perception) -> bool:
+        results = await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = ()
+        for r in results:
+            if isinstance(r, asyncio.TimeoutError):
+                self.stats["late"] += 1
+            elif isinstance(r, BaseException):
+                logging.warning(f"perception of frame {perception.frame.frame_id} failed: {r!r}")
+        detections, llm_detections = (None if isinstance(r, BaseException) else r for r in results)
+        perception.detections, perception.llm_detections = detections, llm_detections
+        return detections is not None or llm_detections is not None
+
+    def cancel(self) -> None:
+        for task in self.tasks:
+            if task.cancel():
+                self.stats["cancelled"] += 1
+        self.tasks = ()
+
+    async def aclose(self) -> None:
+        tasks = self.tasks
+        self.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logging.info(f"async movement pipeline: {self.stats}")
+
+# fly until the battery runs low, max_cycles is reached or the task is cancelled;
+# always ends with the in-flight requests cancelled, the maps saved and the drone landed
+async def run(tello: AsyncTello, occupancy_grid: OccupancyGrid, value_map: ValueMap,
+              score_agent: Scorer, select_agent: Selector,
+              checkpointers: Sequence[MapCheckpointer] = (), max_cycles: Optional[int] = None) -> dict:
+    pipeline = AsyncMovementPipeline(tello, occupancy_grid, value_map, score_agent, select_agent)
+    await tello.connect()
+    await tello.start_stream()
+    cycle = 0
+    try:
+        if not await tello.takeoff():
+            logging.error("takeoff refused, not flying")
+            return pipeline.stats
+        while (max_cycles is None or cycle < max_cycles) and await tello.is_battery_good():
+            await pipeline.step()
+            cycle += 1
+            if cycle % MyConfig.CHECKPOINT_EVERY == 0:
+                for cp in checkpointers:
+                    cp.checkpoint()
+        return pipeline.stats
+    finally:
+        # each stage runs even if this task was cancelled (ctrl-c, SIGTERM);
+        # the drone lands before the maps are written to disk
+        await asyncio.shield(pipeline.aclose())
+        await asyncio.shield(tello.shutdown())
+        for cp in checkpointers:
+            try:
+                cp.checkpoint()
+            except Exception as e:
+                logging.error(f"final map checkpoint failed: {e}")
+
+async def main():
+    occupancy_grid, value_map = init_spatial_map(MyConfig.SNAPSHOT_DIR, MyConfig.RESUME_SNAPSHOT)
+    checkpointers = enable_checkpoints(MyConfig.SNAPSHOT_DIR, occupancy_grid, value_map, MyConfig.RESUME_SNAPSHOT)
+    tello = AsyncTello(TelloWrapper())
+    task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except (NotImplementedError, RuntimeError):
+        pass  # no signal handlers on this platform/thread, ctrl-c still cancels
+    score_agent = Scorer(detector=build_detector())
+    score_agent.attach_maps(occupancy_grid, value_map)
+    try:
+        await run(tello, occupancy_grid, value_map, score_agent, Selector(), checkpointers)
+    finally:
+        # the shared archiver belongs to the process, not to run()
+        metrics = await asyncio.to_thread(shutdown_default_archiver, 5.0)  # frames still queued for disk
+        if metrics is not None:
+            logging.info(f"frame archiver: {metrics}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
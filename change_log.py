@@ -0,0 +1,69 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+# Per-map change feed.
+# Every mutating map method records the box of cells it touched (or a pose
+# change) under a new version number. A consumer remembers the version it
+# last processed and asks for changes_since(version) to get only the dirty
+# regions instead of rescanning the whole map. The log is bounded: a consumer
+# that falls too far behind gets complete=False and has to rescan once.
+
+Box = Tuple[int, int, int, int]  # (y_min, y_max, x_min, x_max), inclusive
+
+@dataclass
+class ChangeSet:
+    version: int                     # version to pass to the next changes_since()
+    boxes: List[Box] = field(default_factory=list)
+    pose_changed: bool = False
+    complete: bool = True            # False: older entries were dropped, rescan
+
+    def __bool__(self) -> bool:
+        return bool(self.boxes) or self.pose_changed or not self.complete
+
+    # union of all dirty boxes, None if no cells changed
+    def bounds(self) -> Optional[Box]:
+        if not self.boxes:
+            return None
+        return (min(b[0] for b in self.boxes), max(b[1] for b in self.boxes),
+                min(b[2] for b in self.boxes), max(b[3] for b in self.boxes))
+
+    # (ty, tx) keys of the tile_size tiles the dirty boxes overlap
+    def tiles(self, tile_size: int) -> Set[Tuple[int, int]]:
+        T = tile_size
+        keys = set()
+        for y_min, y_max, x_min, x_max in self.boxes:
+            for ty in range(y_min // T, y_max // T + 1):
+                for tx in range(x_min // T, x_max // T + 1):
+                    keys.add((ty, tx))
+        return keys
+
+class ChangeLog:
+    def __init__(self, max_entries: int = 4096):
+        self.version = 0
+        self._entries: "deque[Tuple[int, Optional[Box]]]" = deque(maxlen=max_entries)
+
+    # box=None records a pose-only change
+    def record(self, box: Optional[Box] = None) -> int:
+        self.version += 1
+        self._entries.append((self.version, box))
+        return self.version
+
+    def changes_since(self, version: int) -> ChangeSet:
+        out = ChangeSet(version=self.version)
+        if version >= self.version:
+            return out
+        entries = self._entries
+        oldest = entries[0][0] if entries else self.version + 1
+        if version < oldest - 1:
+            out.complete = False
+        # entries are in version order: walk back until the requested version
+        for v, box in reversed(entries):
+            if v <= version:
+                break
+            if box is None:
+                out.pose_changed = True
+            else:
+                out.boxes.append(box)
+        out.boxes.reverse()
+        return out
@@ -4,15 +4,22 @@ from google import genai
 from dotenv import load_dotenv
 #from PIL import Image
 from tello_wrapper import TelloWrapper
+from frame import Frame, shutdown_default_archiver
+from upload_cache import UploadCache
+from decision_cache import DecisionCache
 from prompts import nav_prompt_vanilla
 import matplotlib.pyplot as plt
-import os, time, cv2
+import os, time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 # ===========================================================================
 # get api_key
 load_dotenv()
 api_key = os.getenv("GENAI_API_KEY")
 client = genai.Client(api_key=api_key)
+uploads = UploadCache(client)  # repeated images reuse their uploaded file
+upload_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload")  # background uploads
+decisions = DecisionCache()  # hover frames that look the same reuse the last answer
 # ===========================================================================
 # global variables
 gemini_model = "gemini-2.5-flash"
@@ -21,33 +28,36 @@ save_path = os.path.join(path, "frame")
 os.makedirs(save_path, exist_ok=True)
 img_num = 0
 # ===========================================================================
-def observe_surrounding(tello: TelloWrapper) -> str:
+# pipelined=True: each image is encoded/uploaded in the background while the
+# drone turns to the next heading, and the LLM call starts as soon as the last
+# upload is done; pipelined=False does the four turns first, then the uploads
+def observe_surrounding(tello: TelloWrapper, pipelined: bool = True) -> str:
     direction = {0: "front", 1: "right", 2: "rear", 3: "left"}
-    image_list = []
+    pending = []  # futures (pipelined) or frames, in direction order
     for i in range(4):
         tello.turn_cw(90)
-        fr = tello.get_frame_reader()
+        fr = tello.get_frame_reader(background=True)
         if fr is not None:
-            frame = fr.frame
-            image_name = f"{direction[i]}.png"
-            save_image_path = os.path.join(save_path, image_name)
-            if cv2.imwrite(save_image_path, frame):
-                image_list.append(save_image_path)
-    # open images and save for an upload
-    uploaded_files = []
-    for path in image_list:
-        f = client.files.upload(file=path)
-        uploaded_files.append(f)
+            frame = Frame.from_reader(fr)
+            if frame is not None:
+                # the disk copy is only for reference, gemini gets the bytes
+                frame.save_async(os.path.join(save_path, f"{direction[i]}.png"))
+                pending.append(upload_pool.submit(frame_part, frame) if pipelined else frame)
+    if pipelined:
+        image_parts = [fut.result() for fut in pending]
+    else:
+        image_parts = [frame_part(frame) for frame in pending]
 
     # ask gemini
-    parts = [*uploaded_files, nav_prompt_vanilla] # need to replace nav_target_desc with an actual instruction
+    parts = [*image_parts, nav_prompt_vanilla] # need to replace nav_target_desc with an actual instruction
     response = client.models.generate_content(
         model=gemini_model,
         contents=parts,
     )
     return response.text
 # ===========================================================================
-def util_LLM(file: genai.types.File, prompt: str = None) -> str:
+# file: an uploaded genai File or an inline Part (see frame_part)
+def util_LLM(file, prompt: str = None) -> str:
     parts = [file]
     if prompt is not None:
         parts.append(prompt)
@@ -58,19 +68,25 @@ def util_LLM(file: genai.types.File, prompt: str = None) -> str:
     )
     return response.text
 # ===========================================================================
-def take_pic() -> str:
+def take_pic() -> Frame:
     global img_num
-    fr = tello.get_frame_reader()
+    fr = tello.get_frame_reader(background=True)
     if fr is None:
         return
-    frame = fr.frame
-    image_path = os.path.join(save_path, f"frame{img_num}.png")
-    cv2.imwrite(image_path, frame)
+    frame = Frame.from_reader(fr)
+    if frame is None:
+        return
+    # written in the background, the frame itself is used from memory
+    frame.save_async(os.path.join(save_path, f"frame{img_num}.png"))
     img_num += 1 # prevent from overwriting the same file
-    return image_path
+    return frame
 # ===========================================================================
 def upload(path: str):
-    return client.files.upload(file=path)
+    return uploads.upload(path)
+# image part for gemini from an in-memory frame: small frames go inline,
+# larger ones are uploaded once per content
+def frame_part(frame: Frame):
+    return uploads.part(frame)
 # ===========================================================================
 def move_drone(tello: TelloWrapper, result:str, dist:int=0, degree:int=0):
     tello.keep_active()
@@ -132,14 +148,13 @@ if __name__ == "__main__":
     while flag and tello.is_battery_good():
         if not flag:
             break
-        path = take_pic()
+        frame = take_pic()
 
-        if path is None:
+        if frame is None:
             logging.error("Failed to capture frame")
             continue
 
-        my_file = upload(path)
-        out = util_LLM(my_file).strip(); parts = out.split()
+        out = decisions.get_or_call(frame, None, lambda: util_LLM(frame_part(frame))).strip(); parts = out.split()
         result = parts[0]
         if not parts:
             logging.error("Empty LLM response")
@@ -157,4 +172,7 @@ if __name__ == "__main__":
     
     tello.stop_stream()
     tello.land()
+    metrics = shutdown_default_archiver(timeout=5.0)  # frames still queued for disk
+    if metrics is not None:
+        logging.info(f"frame archiver: {metrics}")
     
\ No newline at end of file
@@ -0,0 +1,128 @@
+import time
+import hashlib
+import threading
+import cv2
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar, Union
+
+from frame import Frame
+
+# Cache of LLM answers for frames that look the same.
+# Frames are keyed by a 64-bit difference hash (dHash) of a tiny grayscale
+# thumbnail, which barely changes between hover frames (sensor noise,
+# exposure flicker) but changes once the view moves. A lookup matches any
+# cached frame for the same prompt within max_distance differing bits.
+# Entries expire after ttl_s so a long hover still gets fresh decisions.
+
+T = TypeVar("T")
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    # 1 bit per horizontally adjacent pixel pair of a (hash_size+1) x hash_size thumbnail
+    # (an INTER_AREA resize straight from full resolution costs ~2 ms, going
+    # through an 8x larger bilinear thumbnail first keeps it in the tens of us)
+    w, h = (hash_size + 1) * 8, hash_size * 8
+    if image.shape[1] > w and image.shape[0] > h:
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def prompt_key(prompt: Optional[str]) -> str:
+    return hashlib.blake2b((prompt or "").encode(), digest_size=8).hexdigest()
+
+@dataclass
+class _Entry:
+    phash: int
+    prompt: str
+    answer: object
+    created: float
+
+class DecisionCache:
+    def __init__(self, max_entries: int = 256, ttl_s: float = 30.0, max_distance: int = 6):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_distance = max_distance  # Hamming distance still counted as the same view
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_hash(image: Union[Frame, np.ndarray]) -> int:
+        return dhash(image.image if isinstance(image, Frame) else image)
+
+    def lookup(self, image: Union[Frame, np.ndarray], prompt: Optional[str] = None,
+               phash: Optional[int] = None):
+        # cached answer for a near-identical frame and the same prompt, else None
+        phash = self.image_hash(image) if phash is None else phash
+        key = prompt_key(prompt)
+        now = time.time()
+        with self._lock:
+            best_id, best_d = None, self.max_distance + 1
+            expired = []
+            for eid, e in self._entries.items():
+                if now - e.created > self.ttl_s:
+                    expired.append(eid)
+                    continue
+                if e.prompt != key:
+                    continue
+                d = (e.phash ^ phash).bit_count()
+                if d < best_d:
+                    best_id, best_d = eid, d
+            for eid in expired:
+                del self._entries[eid]
+                self.evicted += 1
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id].answer
+
+    def store(self, image: Union[Frame, np.ndarray], prompt: Optional[str], answer,
+              phash: Optional[int] = None) -> None:
+        phash = self.image_hash(image) if phash is None else phash
+        with self._lock:
+            self._entries[self._next_id] = _Entry(phash, prompt_key(prompt), answer, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    # cached answer, or call() and remember its result
+    def get_or_call(self, image: Union[Frame, np.ndarray], prompt: Optional[str],
+                    call: Callable[[], T]) -> T:
+        phash = self.image_hash(image)
+        answer = self.lookup(image, prompt, phash=phash)
+        if answer is None:
+            answer = call()
+            self.store(image, prompt, answer, phash=phash)
+        return answer
+
+    # same for a coroutine (the lookup itself is a few hundred microseconds, run inline)
+    async def get_or_call_async(self, image: Union[Frame, np.ndarray], prompt: Optional[str],
+                                call: Callable[[], Awaitable[T]]) -> T:
+        phash = self.image_hash(image)
+        answer = self.lookup(image, prompt, phash=phash)
+        if answer is None:
+            answer = await call()
+            self.store(image, prompt, answer, phash=phash)
+        return answer
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evicted": self.evicted, "hit_rate": self.hits / total if total else 0.0}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,151 @@
+import math
+import cv2
+import numpy as np
+from typing import Optional
+
+from occupancy_map import OccupancyGrid, Cell
+from tiled_grid import TiledArray
+from tello_wrapper import MOVEMENT_MIN, MOVEMENT_MAX, cap_distance
+
+# Distance (in cells) from every cell to the nearest OBSTACLE cell, truncated
+# at max_dist_m. Kept in a layer next to the OccupancyGrid and repaired
+# locally: the field registers as a region listener, and when cells in an
+# updated box flip to or from OBSTACLE only the cells within max_dist_m of
+# them are recomputed (exact Euclidean transform, cv2.distanceTransform).
+# After writing grid cells directly, call update_region() for the changed box.
+#
+# Headings follow the ValueMap convention: North (+y) = 0, clockwise positive.
+
+class ObstacleDistanceField:
+    def __init__(self, om: OccupancyGrid, max_dist_m: float = 2.0,
+                 radius_m: float = 0.2, attach: bool = True):
+        self.om = om
+        self.radius_m = radius_m                    # drone radius used for inflation
+        self.D = max(1, int(math.ceil(max_dist_m / om.cell_size)))  # truncation in cells
+        shape = (om.map_size_N, om.map_size_N)
+        if om.storage == "tiled":
+            self.dist = TiledArray(shape, np.float32, fill=self.D, tile_size=om.tile_size)
+        else:
+            self.dist = np.full(shape, self.D, dtype=np.float32)
+        self.rebuild()
+        if attach:
+            om.add_region_listener(self.update_region)
+
+    def detach(self) -> None:
+        self.om.remove_region_listener(self.update_region)
+
+    # ------------------------------------------------------------------
+    # updates
+    def rebuild(self) -> None:
+        # full transform, only needed once when the field is created
+        if self.om.growable:
+            self.dist.tiles.clear()
+            bounds = self.om.grid.allocated_bounds()
+            if bounds is None:
+                return
+            self._recompute(*bounds)
+        else:
+            N = self.om.map_size_N
+            self._recompute(0, N - 1, 0, N - 1)
+
+    def update_region(self, y_min: int, y_max: int, x_min: int, x_max: int) -> None:
+        box = self._clip(y_min, y_max, x_min, x_max)
+        if box is None:
+            return
+        y_min, y_max, x_min, x_max = box
+        ys, xs = slice(y_min, y_max + 1), slice(x_min, x_max + 1)
+        # an obstacle cell is exactly the cell at distance 0
+        changed = (self.om.grid[ys, xs] == Cell.OBSTACLE) != (self.dist[ys, xs] == 0)
+        cy, cx = np.nonzero(changed)
+        if cy.size == 0:
+            return
+        D = self.D
+        self._recompute(int(cy.min()) + y_min - D, int(cy.max()) + y_min + D,
+                        int(cx.min()) + x_min - D, int(cx.max()) + x_min + D)
+
+    # ------------------------------------------------------------------
+    # queries
+    def distance_m(self, cx: int, cy: int) -> float:
+        # clearance of a cell in metres (max_dist_m when nothing is closer)
+        if not self.om.in_bounds(cx, cy):
+            return 0.0
+        return float(self.dist[cy, cx]) * self.om.cell_size
+
+    def inflated(self, y_min: int, y_max: int, x_min: int, x_max: int,
+                 radius_m: Optional[float] = None) -> np.ndarray:
+        # bool block, True where a drone of radius_m centred on the cell would
+        # touch an obstacle
+        r = (self.radius_m if radius_m is None else radius_m) / self.om.cell_size
+        return self.dist[y_min:y_max + 1, x_min:x_max + 1] <= r
+
+    def is_safe(self, cx: int, cy: int, radius_m: Optional[float] = None) -> bool:
+        r = self.radius_m if radius_m is None else radius_m
+        return self.distance_m(cx, cy) > r
+
+    def max_safe_travel(self, x: float, y: float, heading: float,
+                        max_m: float = MOVEMENT_MAX / 100,
+                        radius_m: Optional[float] = None) -> float:
+        # how far (metres) the drone can fly from cell (x, y) along heading
+        # keeping radius_m clearance; marches by the stored clearance
+        # (sphere tracing), so open space costs a handful of lookups
+        cs = self.om.cell_size
+        r = (self.radius_m if radius_m is None else radius_m) / cs
+        limit = max_m / cs
+        sin_h, cos_h = math.sin(heading), math.cos(heading)
+        t = reach = 0.0  # reach: distance known to be safe so far
+        while True:
+            cx, cy = int(round(x + t * sin_h)), int(round(y + t * cos_h))
+            if not self.om.in_bounds(cx, cy):
+                return min(reach, t) * cs
+            clearance = float(self.dist[cy, cx]) - r
+            if clearance <= 0:
+                return min(reach, t) * cs
+            # every point within `clearance` of this one keeps radius r free
+            reach = t + clearance
+            if reach >= limit:
+                return limit * cs
+            t = min(limit, t + max(clearance, 0.5))
+
+    def safe_distance_cm(self, distance_cm: int, bearing: float = 0.0,
+                         radius_m: Optional[float] = None) -> int:
+        # clip a move from the current pose (bearing relative to the heading:
+        # 0 forward, pi/2 right, pi backward, -pi/2 left) to the safe travel
+        # distance. A move with room for what cap_distance() will actually fly
+        # is returned unchanged; one an obstacle cuts short is clipped, and 0
+        # when the clipped move is below MOVEMENT_MIN, since cap_distance()
+        # would round it back up.
+        flown = cap_distance(int(distance_cm))
+        p = self.om.curr_point
+        safe = self.max_safe_travel(p.x, p.y, p.yaw + bearing,
+                                    max_m=flown / 100, radius_m=radius_m)
+        clipped = int(safe * 100)
+        if clipped >= flown:
+            return int(distance_cm)
+        return min(int(distance_cm), clipped) if clipped >= MOVEMENT_MIN else 0
+
+    # ------------------------------------------------------------------
+    # internals
+    def _clip(self, y_min: int, y_max: int, x_min: int, x_max: int):
+        if self.om.growable:
+            return y_min, y_max, x_min, x_max
+        N = self.om.map_size_N
+        y_min, x_min = max(0, y_min), max(0, x_min)
+        y_max, x_max = min(N - 1, y_max), min(N - 1, x_max)
+        if y_min > y_max or x_min > x_max:
+            return None
+        return y_min, y_max, x_min, x_max
+
+    def _recompute(self, y_min: int, y_max: int, x_min: int, x_max: int) -> None:
+        # exact distances for the box, from obstacles up to D cells around it
+        box = self._clip(y_min, y_max, x_min, x_max)
+        if box is None:
+            return
+        y_min, y_max, x_min, x_max = box
+        D = self.D
+        src = self._clip(y_min - D, y_max + D, x_min - D, x_max + D)
+        sy0, sy1, sx0, sx1 = src
+        free = (self.om.grid[sy0:sy1 + 1, sx0:sx1 + 1] != Cell.OBSTACLE).astype(np.uint8)
+        dt = cv2.distanceTransform(free, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        np.minimum(dt, D, out=dt)
+        self.dist[y_min:y_max + 1, x_min:x_max + 1] = \
+            dt[y_min - sy0:y_max - sy0 + 1, x_min - sx0:x_max - sx0 + 1]
@@ -1,12 +1,22 @@
-import os, cv2, time, logging
-from concurrent.futures import ThreadPoolExecutor
+import os, time, math, logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
 import threading
-from typing import Tuple, Optional
+import numpy as np
+from dataclasses import dataclass
+from typing import Tuple, Optional, List, Sequence
 from dotenv import load_dotenv
 from datetime import datetime
-from Scorer.detect_objects import vision_detect
-from occupancy_map import OccupancyGrid, ValueMap
-from tello_wrapper import TelloWrapper
+from Scorer.detect_objects import vision_detect_async, vision_async_client
+from Scorer.detector_backends import DetectorBackend, CloudVisionBackend, make_detector
+from Scorer.vision_service import shutdown_default_vision_service
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D, Cell
+from map_snapshot import MapCheckpointer, load_snapshot, snapshot_exists
+from path_planner import DStarLitePlanner, plan_commands
+from tello_wrapper import TelloWrapper, cap_distance
+from frame import Frame, shutdown_default_archiver
+from decision_cache import DecisionCache
+from object_detections import Detections
 from google import genai
 
 load_dotenv()
@@ -15,116 +25,512 @@ api_key = os.environ.get("GENAI_API_KEY")
 class Agent:
     def __init__(self):
         self.client = genai.Client(api_key=api_key)
+        self.aclient = self.client.aio  # asyncio surface of the same client (async_runtime.py)
         self.lock = threading.Lock()
         self.is_updating = False
 
+# detections as a Detections; dicts without a box (e.g. LLM answers) are skipped
+def to_detections(detections) -> Detections:
+    if isinstance(detections, Detections):
+        return detections
+    return Detections.from_dicts([d for d in detections or [] if d.get('bbox')])
+
+# per-column scores of one frame, left to right across the image
+@dataclass
+class YawScores:
+    bearings: np.ndarray  # radians from the heading to each column center, clockwise positive
+    ranges: np.ndarray    # metres to the nearest object in the column, NaN where nothing was seen
+    value: np.ndarray     # best detection score in the column, 0 where nothing was seen
+
 class Scorer(Agent):
-    def __init__(self, executor: ThreadPoolExecutor):
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None,
+                 detector: Optional[DetectorBackend] = None):
         super().__init__()
         self.executor = executor
+        self.detector = detector or CloudVisionBackend()
         self.llm_future = None
+        self.decisions = DecisionCache()  # answers for near-identical frames
+        self.vision_aclient = None        # created on first use, inside the event loop
+        self.occupancy_grid: Optional[OccupancyGrid] = None  # set by attach_maps
+        self.value_map: Optional[ValueMap] = None
+
+    # maps that measure_coordinate_and_store writes detections into
+    def attach_maps(self, occupancy_grid: OccupancyGrid, value_map: ValueMap) -> None:
+        self.occupancy_grid = occupancy_grid
+        self.value_map = value_map
 
-    def detect_objects(self, image_path):
-        return vision_detect(image_path)
+    # frame: a Frame, bytes or a path; which detector runs is MyConfig.DETECTOR
+    def detect_objects(self, frame):
+        return self.detector.detect(frame)
     
-    def _call_llm_api(self, image_path: str, instruction: str):
-        logging.info(f"LLM analyzing: {image_path}, instruction: {instruction}")
+    # detection and LLM requests for one frame, both in flight on the executor
+    def perceive_async(self, frame: Frame, instruction: str) -> Tuple[Future, Future]:
+        detect_future = self.executor.submit(self.detect_objects, frame)
+        self.llm_future = self.executor.submit(self._call_llm_api, frame, instruction)
+        return detect_future, self.llm_future
+
+    def _call_llm_api(self, frame: Frame, instruction: str):
+        return self.decisions.get_or_call(frame, instruction,
+                                          lambda: self._request_llm(frame, instruction))
+
+    def _request_llm(self, frame: Frame, instruction: str):
+        logging.info(f"LLM analyzing: frame {frame.frame_id}, instruction: {instruction}")
         # return [{"object": "person with umbrella", "bbox": [...], "score": 0.95}]
         return []
+
+    # asyncio versions: no thread per request, many frames can be in flight at once
+    # Cloud Vision goes through its async client; a local or hybrid backend
+    # runs its blocking detect() on a worker thread
+    async def detect_objects_async(self, frame):
+        if not isinstance(self.detector, CloudVisionBackend):
+            return await asyncio.to_thread(self.detector.detect, frame)
+        if self.vision_aclient is None:
+            self.vision_aclient = vision_async_client()
+        return await vision_detect_async(frame, self.vision_aclient)
+
+    async def _call_llm_api_async(self, frame: Frame, instruction: str):
+        return await self.decisions.get_or_call_async(frame, instruction,
+                                                      lambda: self._request_llm_async(frame, instruction))
+
+    async def _request_llm_async(self, frame: Frame, instruction: str):
+        # placeholder like _request_llm: no request is sent yet, it returns no
+        # detections. The real call belongs on self.aclient.models.generate_content
+        logging.info(f"LLM analyzing: frame {frame.frame_id}, instruction: {instruction}")
+        return []
     
-    def measure_coordinate_and_store(self, detections):
-        pass
-    def score_yaw_direction_in_image(self, ) -> Tuple[float, float]:
-        pass
+    # project every detection of one frame to a bearing and range from the
+    # drone (occupancy_grid.curr_point, i.e. the pose the frame was taken at)
+    # and fuse them all into the value map with one update_value_points call
+    # detections: a Detections or a list of {'object', 'score', 'bbox'} dicts
+    # returns the (cy, cx) cell of each detection
+    def measure_coordinate_and_store(self, detections) -> np.ndarray:
+        detections = to_detections(detections)
+        if self.occupancy_grid is None or self.value_map is None:
+            logging.warning("measure_coordinate_and_store: no maps attached, detections dropped")
+            return np.zeros((0, 2), dtype=np.int64)
+        if len(detections) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        bearings, ranges = project_detections(detections)
+        p = self.occupancy_grid.curr_point
+        return self.value_map.update_value_points(
+            bearings, ranges, detections.scores, origin=Pose2D(x=p.x, y=p.y, yaw=p.yaw),
+            radius_m=MyConfig.DETECTION_RADIUS_M, fov_deg=MyConfig.CAMERA_FOV_DEG)
+    # scores of n_bins image columns instead of one pair per frame: each column
+    # gets the best score and the nearest range among the detections covering it
+    # detections: a Detections or a list of dicts; None -> None (nothing perceived)
+    def score_yaw_direction_in_image(self, detections=None, n_bins: Optional[int] = None) -> Optional[YawScores]:
+        if detections is None:
+            return None
+        detections = to_detections(detections)
+        n_bins = MyConfig.YAW_BINS if n_bins is None else n_bins
+        focal = 0.5 / math.tan(math.radians(MyConfig.CAMERA_FOV_DEG) / 2.0)
+        u = (np.arange(n_bins) + 0.5) / n_bins
+        bearings = np.arctan((u - 0.5) / focal)
+        if len(detections) == 0:
+            return YawScores(bearings, np.full(n_bins, np.nan), np.zeros(n_bins))
+        _, ranges = project_detections(detections)
+        boxes = np.clip(detections.boxes, 0.0, 1.0)
+        # (detections, columns) coverage, reduced over detections
+        covers = (boxes[:, 0, None] <= u[None, :]) & (u[None, :] <= boxes[:, 2, None])
+        value = np.where(covers, detections.scores[:, None], 0.0).max(axis=0)
+        nearest = np.where(covers, ranges[:, None], np.inf).min(axis=0)
+        nearest[np.isinf(nearest)] = np.nan
+        return YawScores(bearings, nearest, value.astype(np.float64))
 
 class Selector(Agent):
     def __init__(self):
         super().__init__()
-    def select_detections(self, ):
-        pass
-    def select_free_points(self,):
-        pass
+        self.planner: Optional[DStarLitePlanner] = None
+        self._planner_version = 0
+        self.goal: Optional[Tuple[int, int]] = None  # (cx, cy) the drone is flying to
+    # detections worth acting on: score/label filter, then NMS
+    # (detections: a Detections or vision_detect's list of dicts)
+    def select_detections(self, detections, min_score: float = 0.5,
+                          labels: Optional[Sequence[str]] = None, iou_threshold: float = 0.5) -> Detections:
+        if not isinstance(detections, Detections):
+            detections = Detections.from_dicts(detections or [])
+        return detections.filter(min_score, labels).nms(iou_threshold)
+    # ranked free-space candidates (coords, values, confs) from the value map,
+    # within the range detections are projected to
+    # obstacles and visited cells come from occupancy_grid (the value map's own
+    # grid is never written); the drone's own cell is never a candidate, and
+    # neither is a cell with no value (nothing seen there worth flying to)
+    def select_free_points(self, value_map: ValueMap, pose: Pose2D, k: int = 5, min_spacing: float = 3.0,
+                           occupancy_grid: Optional[OccupancyGrid] = None):
+        here = (int(round(pose.y)), int(round(pose.x)))
+        coords, values, confs = value_map.find_top_k_points(
+            pose, k=k, max_range_m=MyConfig.MAX_DETECTION_RANGE_M / value_map.cell_size,
+            skip_cells=(Cell.OBSTACLE, Cell.VISITED), min_spacing=min_spacing, exclude=(here,),
+            skip_grid=None if occupancy_grid is None else occupancy_grid.grid)
+        keep = values > 0
+        return coords[keep], values[keep], confs[keep]
+    # the current goal is kept until it is reached, blocked, visited or no
+    # longer worth anything, so the planner repairs one search between cycles
+    def goal_is_valid(self, occupancy_grid: OccupancyGrid, value_map: ValueMap) -> bool:
+        if self.goal is None:
+            return False
+        cx, cy = self.goal
+        return occupancy_grid.grid[cy, cx] not in (Cell.OBSTACLE, Cell.VISITED) and value_map.value[cy, cx] > 0
+    # D* Lite planner over occupancy_grid, kept in sync through its change log
+    def planner_for(self, occupancy_grid: OccupancyGrid) -> DStarLitePlanner:
+        changes = occupancy_grid.changes_since(self._planner_version)
+        if self.planner is None or self.planner.om is not occupancy_grid or not changes.complete:
+            self.planner = DStarLitePlanner(occupancy_grid)
+        else:
+            for box in changes.boxes:
+                self.planner.update_region(*box)
+        self._planner_version = changes.version
+        return self.planner
+
+# Pinhole camera model for boxes normalized to the image size.
+# bearing: radians from the heading to the box center, clockwise positive
+# range: metres to the object, from the box height and the object's typical
+# height (MyConfig.OBJECT_HEIGHTS_M), clamped to MyConfig.MAX_DETECTION_RANGE_M.
+# Boxes cut off by the image border look smaller, so their range comes out long.
+def project_detections(detections: Detections, fov_deg: Optional[float] = None,
+                       aspect: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    fov_deg = MyConfig.CAMERA_FOV_DEG if fov_deg is None else fov_deg
+    aspect = MyConfig.IMAGE_ASPECT if aspect is None else aspect
+    focal = 0.5 / math.tan(math.radians(fov_deg) / 2.0)  # in image widths
+    boxes = detections.boxes.astype(np.float64)
+    u = (boxes[:, 0] + boxes[:, 2]) * 0.5 - 0.5
+    bearings = np.arctan(u / focal)
+    # one height lookup per distinct label, not per detection
+    ids, inverse = np.unique(detections.labels, return_inverse=True)
+    names = detections.table.names
+    heights = np.array([MyConfig.OBJECT_HEIGHTS_M.get(names[i].lower(), MyConfig.DEFAULT_OBJECT_HEIGHT_M)
+                        for i in ids], dtype=np.float64)[inverse.reshape(-1)]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-3) * aspect  # box height in image widths
+    depth = heights * focal / h
+    ranges = np.clip(depth / np.cos(bearings), MyConfig.CELL_SIZE, MyConfig.MAX_DETECTION_RANGE_M)
+    return bearings, ranges
 
 # You can modify the configuration of the spatial map here
 class MyConfig:
     WIDTH = 50
     HEIGHT = 50
     CELL_SIZE = 0.1
+    SNAPSHOT_DIR = "map_snapshot"  # maps are checkpointed here, set to None to disable
+    RESUME_SNAPSHOT = False        # True continues from the snapshot in SNAPSHOT_DIR instead of replacing it
+    CHECKPOINT_EVERY = 10          # control cycles between map checkpoints
+    FRAME_DIR = None               # set to a directory to keep every frame (written in the background)
+    INSTRUCTION = "Find a person holding an umbrella"
+    PIPELINED = True               # perceive the next frame while the drone is moving
+    DETECT_DEADLINE_S = 3.0        # per-stage deadlines, counted from when the frame was sent
+    LLM_DEADLINE_S = 8.0
+    SEARCH_TURN_DEG = 90           # turn used when there is no candidate point to fly to
+    DETECTOR = "cloud"             # "cloud", "local" (OpenCV DNN on CPU) or "hybrid"
+    DETECTOR_MODEL = None          # model file for "local" / "hybrid" (e.g. an SSD .onnx)
+    DETECTOR_LABELS = None         # label file, one class name per line
+    DETECTOR_INPUT_SIZE = (300, 300)
+    CAMERA_FOV_DEG = 82.0          # horizontal FOV of the Tello camera
+    IMAGE_ASPECT = 720 / 960       # frame height / width
+    OBJECT_HEIGHTS_M = {"person": 1.7, "umbrella": 1.0, "car": 1.5, "chair": 0.9, "dog": 0.6}
+    DEFAULT_OBJECT_HEIGHT_M = 1.0  # labels not in OBJECT_HEIGHTS_M
+    MAX_DETECTION_RANGE_M = 4.0
+    DETECTION_RADIUS_M = 0.2       # map footprint of one detection (its range is only approximate)
+    YAW_BINS = 32                  # image columns scored per frame
+
+# perception of one frame, tagged with the frame id and the map pose it was taken from
+@dataclass
+class Perception:
+    frame: Frame
+    pose: Tuple[float, float, float]  # occupancy_grid.curr_point (cells, cells, rad)
+    submitted: float                  # time.monotonic() when the requests went out
+    detect_future: Optional[Future] = None
+    llm_future: Optional[Future] = None
+    detections: Optional[list] = None
+    llm_detections: Optional[list] = None
+
+def _pose_tuple(occupancy_grid: OccupancyGrid) -> Tuple[float, float, float]:
+    p = occupancy_grid.curr_point
+    return (p.x, p.y, p.yaw)
+
+# body-frame delta (cm, cm, rad) of each TelloWrapper command, as update_drone_pos_and_ori expects
+_COMMAND_DELTAS = {
+    "move_forward": lambda v: Pose2D(x=0.0, y=float(cap_distance(v)), yaw=0.0),
+    "move_backward": lambda v: Pose2D(x=0.0, y=-float(cap_distance(v)), yaw=0.0),
+    "move_right": lambda v: Pose2D(x=float(cap_distance(v)), y=0.0, yaw=0.0),
+    "move_left": lambda v: Pose2D(x=-float(cap_distance(v)), y=0.0, yaw=0.0),
+    "turn_cw": lambda v: Pose2D(x=0.0, y=0.0, yaw=math.radians(v)),
+    "turn_ccw": lambda v: Pose2D(x=0.0, y=0.0, yaw=-math.radians(v)),
+}
+
+# map updates from one perception, cast from the map's current pose
+def apply_perception(occupancy_grid: OccupancyGrid, value_map: ValueMap,
+                     score_agent: Scorer, perception: Perception) -> None:
+    seen = [d for d in (perception.detections, perception.llm_detections) if d is not None]
+    points = [score_agent.measure_coordinate_and_store(detections) for detections in seen]
+    points = [p for p in points if p is not None and len(p)]
+    if not seen:
+        return
+    scores = score_agent.score_yaw_direction_in_image(Detections.merge([to_detections(d) for d in seen]))
+    if scores is None:
+        return
+    # Detections stay out of the occupancy log-odds on purpose: their range is
+    # guessed from the box height, rays would only be cast along the columns
+    # that hold an object, and the object is usually the target (or a person
+    # who moves), so an OBSTACLE there would keep the planner from approaching it.
+    # obstacles come from the occupancy grid, the value map's own grid is never written;
+    # the cells around each detected object already took its score above;
+    # the cone's max_range_m is counted in cells (like update_value_map), so
+    # it reaches as far as the detections are projected
+    value_map.update_value_map_bearings(scores.value, scores.bearings, fov_deg=MyConfig.CAMERA_FOV_DEG,
+                                        max_range_m=MyConfig.MAX_DETECTION_RANGE_M / value_map.cell_size,
+                                        skip_points=np.concatenate(points) if points else None,
+                                        skip_radius_m=MyConfig.DETECTION_RADIUS_M,
+                                        obstacle_grid=occupancy_grid.grid)
+
+# first command of a planned path to the selector's goal; the goal persists
+# across cycles (D* Lite repairs the same search as the drone moves and the
+# map changes) and a new one is only picked from the best reachable free
+# points in view once it is reached or invalid, a search turn when none is left
+def decide_move(occupancy_grid: OccupancyGrid, value_map: ValueMap,
+                select_agent: Selector) -> Tuple[str, int]:
+    planner = select_agent.planner_for(occupancy_grid)
+    if select_agent.goal_is_valid(occupancy_grid, value_map):
+        commands = plan_commands(planner, select_agent.goal)
+        if commands:
+            return commands[0]
+    # reached (closer than MOVEMENT_MIN), unreachable or invalid
+    select_agent.goal = None
+    pose = occupancy_grid.curr_point
+    coords, _, _ = select_agent.select_free_points(value_map, pose, occupancy_grid=occupancy_grid)
+    for cy, cx in coords:
+        goal = (int(cx), int(cy))
+        commands = plan_commands(planner, goal)
+        if commands:
+            select_agent.goal = goal
+            return commands[0]
+    return ("turn_cw", MyConfig.SEARCH_TURN_DEG)
+
+# run one (command, value) on the drone, None if it did not move
+def execute_move(tello: TelloWrapper, command: Tuple[str, int]) -> Optional[Pose2D]:
+    name, value = command
+    ok, _ = getattr(tello, name)(value)
+    return _COMMAND_DELTAS[name](value) if ok else None
+
+def integrate_move(occupancy_grid: OccupancyGrid, value_map: ValueMap, delta: Pose2D) -> None:
+    p = occupancy_grid.curr_point
+    prev_pos = Pose2D(x=p.x, y=p.y, yaw=p.yaw)
+    occupancy_grid.update_drone_pos_and_ori(delta)
+    p = occupancy_grid.curr_point
+    occupancy_grid.update_visited_in_occup_grid(Pose2D(x=p.x, y=p.y, yaw=p.yaw), prev_pos)
+    value_map.curr_point = Pose2D(x=p.x, y=p.y, yaw=p.yaw)
 
+# one serial control cycle: capture -> detect/LLM -> map update -> select -> move
 def predict_movement(
         tello: TelloWrapper, 
         occupancy_grid: OccupancyGrid, 
         value_map: ValueMap,
         score_agent: Scorer, 
         select_agent: Selector,
-    ):
+    ) -> Optional[Tuple[str, int]]:
 
-    image_path = get_image_from_drone(tello)
-    if image_path is None:
+    frame = get_image_from_drone(tello)
+    if frame is None:
         logging.warning("Failed to get image from drone")
-        return
-    # Execute Scorer Agent
-    detections = score_agent.detect_objects(image_path)
-    #instruction = "Find a person holding an umbrella"
-    score_agent.measure_coordinate_and_store(detections)
-    occup_score, value_score = score_agent.score_yaw_direction_in_image()
-
-    occupancy_grid.update_occup_map(occup_score)
-    value_map.update_value_map(value_score)
-    
-    # Execute Selector Agent
-    candidate_detections = select_agent.select_detections()
-    candidate_free_points = select_agent.select_free_points()
-    
-    # 이제 LLM 결과 필요할 때 가져오기 (여기서 블로킹)
-    #llm_detections = llm_future.result()
-    
-    point = value_map.find_optimal_point()
+        return None
+    perception = Perception(frame, _pose_tuple(occupancy_grid), time.monotonic())
+    detect_future, llm_future = score_agent.perceive_async(frame, MyConfig.INSTRUCTION)
+    perception.detections = detect_future.result()
+    perception.llm_detections = llm_future.result()
+    apply_perception(occupancy_grid, value_map, score_agent, perception)
+
+    command = decide_move(occupancy_grid, value_map, select_agent)
+    delta = execute_move(tello, command)
+    if delta is not None:
+        integrate_move(occupancy_grid, value_map, delta)
+    return command
+
+# Control loop with perception overlapped with actuation.
+# Each step sends frame N to the executor, decides move N from the map as it
+# is (perceptions up to N-1) and flies it while frame N is being perceived.
+# Frame N's results are applied before move N is integrated into the pose, so
+# they are cast from the pose the frame was taken at (nothing else moves the
+# map pose in between). A result is dropped when its stage misses its
+# deadline or when its frame is not newer than the last applied one.
+class MovementPipeline:
+    def __init__(self, tello: TelloWrapper, occupancy_grid: OccupancyGrid, value_map: ValueMap,
+                 score_agent: Scorer, select_agent: Selector,
+                 instruction: str = MyConfig.INSTRUCTION,
+                 detect_deadline_s: float = MyConfig.DETECT_DEADLINE_S,
+                 llm_deadline_s: float = MyConfig.LLM_DEADLINE_S):
+        self.tello = tello
+        self.occupancy_grid = occupancy_grid
+        self.value_map = value_map
+        self.score_agent = score_agent
+        self.select_agent = select_agent
+        self.instruction = instruction
+        self.detect_deadline_s = detect_deadline_s
+        self.llm_deadline_s = llm_deadline_s
+        self.inflight: Optional[Perception] = None
+        self.last_frame_id: Optional[int] = None
+        self.stats = {"decisions": 0, "applied": 0, "late": 0,
+                      "duplicates": 0, "cancelled": 0}
+
+    def step(self) -> Optional[Tuple[str, int]]:
+        self.inflight = self.submit()
+        command = decide_move(self.occupancy_grid, self.value_map, self.select_agent)
+        try:
+            delta = execute_move(self.tello, command)
+        except Exception:
+            self.cancel()  # the drone may be anywhere, its frame cannot be placed
+            raise
+        perception, self.inflight = self.inflight, None
+        if perception is not None and self.collect(perception):
+            apply_perception(self.occupancy_grid, self.value_map, self.score_agent, perception)
+            self.stats["applied"] += 1
+        if delta is not None:
+            integrate_move(self.occupancy_grid, self.value_map, delta)
+        self.stats["decisions"] += 1
+        return command
+
+    # capture the current frame and send its detection and LLM requests
+    def submit(self) -> Optional[Perception]:
+        frame = get_image_from_drone(self.tello)
+        if frame is None:
+            logging.warning("Failed to get image from drone")
+            return None
+        if frame.frame_id is not None and self.last_frame_id is not None \
+                and frame.frame_id <= self.last_frame_id:
+            # no new frame since the last one we perceived
+            self.stats["duplicates"] += 1
+            return None
+        self.last_frame_id = frame.frame_id
+        perception = Perception(frame, _pose_tuple(self.occupancy_grid), time.monotonic())
+        perception.detect_future, perception.llm_future = \
+            self.score_agent.perceive_async(frame, self.instruction)
+        return perception
+
+    # wait for both stages up to their deadlines; False if the result must be dropped
+    def collect(self, perception: Perception) -> bool:
+        perception.detections = self._result(perception.detect_future,
+                                             perception.submitted + self.detect_deadline_s)
+        perception.llm_detections = self._result(perception.llm_future,
+                                                 perception.submitted + self.llm_deadline_s)
+        return perception.detections is not None or perception.llm_detections is not None
 
-    #move_drone()
-    occupancy_grid.update_visited_in_occup_grid()
-    occupancy_grid.update_drone_pos_and_ori() 
+    def _result(self, future: Future, deadline: float):
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            future.cancel()
+            self.stats["late"] += 1
+            return None
 
-def get_image_from_drone(tello: TelloWrapper):
-    fr = tello.get_frame_reader()
+    def cancel(self) -> None:
+        if self.inflight is None:
+            return
+        for future in (self.inflight.detect_future, self.inflight.llm_future):
+            if future is not None and future.cancel():
+                self.stats["cancelled"] += 1
+        self.inflight = None
+
+    def close(self) -> None:
+        self.cancel()
+        logging.info(f"movement pipeline: {self.stats}")
+
+# latest camera frame, kept in memory; the disk copy (if any) is written in the background
+def get_image_from_drone(tello: TelloWrapper, frame_dir: Optional[str] = None) -> Optional[Frame]:
+    fr = tello.get_frame_reader(background=True)
     if fr is None:
         return None
-    frame = fr.frame
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    image_path = os.path.join('/FOV', f"frame_{ts}.png")
-    img_saved = cv2.imwrite(image_path, frame)
-    if not img_saved:
-        logging.warning("IMAGE NOT SAVED")
+    frame = Frame.from_reader(fr)
+    if frame is None:
         return None
-    return image_path
+    frame_dir = frame_dir or MyConfig.FRAME_DIR
+    if frame_dir is not None:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        frame.save_async(os.path.join(frame_dir, f"frame_{ts}.png"))
+    return frame
+
+# detector backend selected by MyConfig.DETECTOR
+def build_detector() -> DetectorBackend:
+    return make_detector(MyConfig.DETECTOR, MyConfig.DETECTOR_MODEL, labels=MyConfig.DETECTOR_LABELS,
+                         input_size=MyConfig.DETECTOR_INPUT_SIZE)
 
 def enable_agents(executor: ThreadPoolExecutor) -> Tuple[Scorer, Selector]:
-    score_agent = Scorer(executor)
-    select_agent = Selector(executor)
+    score_agent = Scorer(executor, build_detector())
+    select_agent = Selector()
     return score_agent, select_agent
 
-def init_spatial_map() -> Tuple[OccupancyGrid, ValueMap]:
+def init_spatial_map(snapshot_dir: Optional[str] = None, resume: bool = False) -> Tuple[OccupancyGrid, ValueMap]:
+    # resume from the last snapshot only when asked to: a map from another
+    # room or takeoff point would mark obstacles where there are none
+    if resume and snapshot_dir is not None:
+        if snapshot_exists(os.path.join(snapshot_dir, "occupancy")) \
+                and snapshot_exists(os.path.join(snapshot_dir, "value")):
+            occupancy_grid = load_snapshot(os.path.join(snapshot_dir, "occupancy"))
+            value_map = load_snapshot(os.path.join(snapshot_dir, "value"))
+            p = occupancy_grid.curr_point
+            logging.warning(f"RESUMING spatial map from {snapshot_dir} at cell ({p.x:.1f}, {p.y:.1f}), "
+                            f"yaw {math.degrees(p.yaw):.0f} deg; the drone must take off from that pose")
+            return occupancy_grid, value_map
+        logging.warning(f"No snapshot in {snapshot_dir} to resume, starting with empty maps")
     occupancy_grid = OccupancyGrid(MyConfig.WIDTH, MyConfig.HEIGHT, MyConfig.CELL_SIZE)
     value_map = ValueMap.from_occupancy(occupancy_grid)
     return occupancy_grid, value_map
 
+def enable_checkpoints(snapshot_dir: Optional[str], occupancy_grid: OccupancyGrid,
+                       value_map: ValueMap, resume: bool = False) -> List[MapCheckpointer]:
+    # a fresh run replaces whatever snapshot an earlier run left behind
+    if snapshot_dir is None:
+        return []
+    return [MapCheckpointer(occupancy_grid, os.path.join(snapshot_dir, "occupancy"), incremental=True,
+                            overwrite=not resume),
+            MapCheckpointer(value_map, os.path.join(snapshot_dir, "value"), incremental=True,
+                            overwrite=not resume)]
+
+# one shutdown step; a failure is logged so the remaining steps still run
+def _cleanup(what: str, fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        logging.error(f"shutdown: {what} failed: {e}")
+        return None
+
 def main():
     executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="LLM-Worker")
     
     tello = TelloWrapper()
-    occupancy_grid, value_map = init_spatial_map()
+    occupancy_grid, value_map = init_spatial_map(MyConfig.SNAPSHOT_DIR, MyConfig.RESUME_SNAPSHOT)
+    checkpointers = enable_checkpoints(MyConfig.SNAPSHOT_DIR, occupancy_grid, value_map, MyConfig.RESUME_SNAPSHOT)
     score_agent, select_agent = enable_agents(executor)
+    score_agent.attach_maps(occupancy_grid, value_map)
+
+    pipeline = MovementPipeline(tello, occupancy_grid, value_map, score_agent, select_agent) \
+        if MyConfig.PIPELINED else None
 
     tello.connect()
     tello.start_stream()
+    cycle = 0
     try:
         while tello.is_battery_good():
-            predict_movement(tello, occupancy_grid, value_map, score_agent, select_agent)
+            if pipeline is not None:
+                pipeline.step()
+            else:
+                predict_movement(tello, occupancy_grid, value_map, score_agent, select_agent)
+            cycle += 1
+            if cycle % MyConfig.CHECKPOINT_EVERY == 0:
+                for cp in checkpointers:
+                    cp.checkpoint()
     finally:
+        # land first: nothing below may keep the drone in the air or stop it landing
+        _cleanup("stop stream", tello.stop_stream)
+        _cleanup("land", tello.land)
+        if pipeline is not None:
+            _cleanup("movement pipeline", pipeline.close)
+        for cp in checkpointers:
+            _cleanup("map checkpoint", cp.checkpoint)
         logging.info("Shutting down executor...")
-        executor.shutdown(wait=True)  # 모든 LLM 작업 완료 대기
-        tello.stop_stream()
-        tello.land()
+        _cleanup("executor", executor.shutdown, wait=True)  # 모든 LLM 작업 완료 대기
+        metrics = _cleanup("vision service", shutdown_default_vision_service, timeout=5.0)
+        if metrics is not None:
+            logging.info(f"vision service: {metrics}")
+        metrics = _cleanup("frame archiver", shutdown_default_archiver, timeout=5.0)  # frames still queued for disk
+        if metrics is not None:
+            logging.info(f"frame archiver: {metrics}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,240 @@
+import os
+import time
+import threading
+import logging
+import cv2
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, Optional, Tuple, Union
+
+# One captured camera frame handed from capture to detection/LLM in memory.
+# The raw array is encoded only when someone asks for bytes, and each
+# (format, quality) encoding is cached, so Vision, Gemini and an optional disk
+# copy all share a single encode. Saving writes the cached bytes, either
+# inline or through a FrameArchiver (bounded queue + writer threads), so the
+# control loop never waits on the disk.
+
+JPEG_QUALITY = 90
+
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+class Frame:
+    def __init__(self, image: np.ndarray, frame_id: Optional[int] = None,
+                 timestamp: Optional[float] = None, copy: bool = False):
+        # copy=True when image is a reused buffer (e.g. a FrameReader ring slot)
+        self.image = image.copy() if copy else image
+        self.frame_id = frame_id
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.path: Optional[str] = None  # set once the frame was written to disk
+        self._encoded: Dict[Tuple[str, int], bytes] = {}
+        self._lock = threading.Lock()
+
+    # newest processed frame of a tello_wrapper.FrameReader, None if there is none
+    @classmethod
+    def from_reader(cls, fr) -> Optional["Frame"]:
+        latest = fr.latest() if getattr(fr, "background", False) else None
+        if latest is not None:
+            frame_id, ts, image = latest
+            return cls(image, frame_id=frame_id, timestamp=ts, copy=True)
+        image = fr.frame
+        if image is None:
+            return None
+        return cls(image)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+
+    def encode(self, fmt: str = ".jpg", quality: int = JPEG_QUALITY) -> bytes:
+        fmt = fmt.lower()
+        key = (fmt, quality if fmt in (".jpg", ".jpeg") else 0)
+        data = self._encoded.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            data = self._encoded.get(key)
+            if data is None:
+                params = [cv2.IMWRITE_JPEG_QUALITY, quality] if key[1] else []
+                ok, buf = cv2.imencode(fmt, self.image, params)
+                if not ok:
+                    raise ValueError(f"could not encode frame as {fmt}")
+                data = buf.tobytes()
+                self._encoded[key] = data
+        return data
+
+    @property
+    def jpeg(self) -> bytes:
+        return self.encode(".jpg")
+
+    @property
+    def png(self) -> bytes:
+        return self.encode(".png")
+
+    @staticmethod
+    def mime_type(fmt: str = ".jpg") -> str:
+        return MIME_TYPES[fmt.lower()]
+
+    # write the frame to path (format from the extension)
+    def save(self, path: str, quality: int = JPEG_QUALITY) -> str:
+        fmt = os.path.splitext(path)[1] or ".png"
+        data = self.encode(fmt, quality)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.path = path
+        return path
+
+    # queue the frame on an archiver (the shared default one if None);
+    # the future resolves to the path, or None if the write was dropped or failed
+    def save_async(self, path: str, archiver: Optional["FrameArchiver"] = None) -> Future:
+        return (archiver or default_archiver()).submit(self, path)
+
+# Writes frames to disk on a small pool of threads.
+# submit() never blocks: when max_queue frames are waiting, policy decides
+# which one is lost ("drop_oldest" evicts the oldest queued frame,
+# "drop_newest" rejects the new one). fmt/quality apply to paths without an
+# extension. metrics() reports queue depth, drops and write latency.
+class FrameArchiver:
+    POLICIES = ("drop_oldest", "drop_newest")
+
+    def __init__(self, max_queue: int = 16, workers: int = 1, fmt: str = ".jpg",
+                 quality: int = JPEG_QUALITY, policy: str = "drop_oldest",
+                 latency_window: int = 256):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown archiver policy: {policy}")
+        self.max_queue = max_queue
+        self.fmt = fmt
+        self.quality = quality
+        self.policy = policy
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._queue: Deque[Tuple[Frame, str, Future]] = deque()
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker, name=f"frame-archiver-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, frame: Union[Frame, np.ndarray], path: str) -> Future:
+        if not isinstance(frame, Frame):
+            frame = Frame(frame, copy=True)
+        if not os.path.splitext(path)[1]:
+            path += self.fmt
+        fut: Future = Future()
+        evicted = None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("FrameArchiver is closed")
+            self.submitted += 1
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    fut.set_result(None)
+                    return fut
+                evicted = self._queue.popleft()
+            self._queue.append((frame, path, fut))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify()
+        if evicted is not None:
+            evicted[2].set_result(None)
+        return fut
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def metrics(self) -> dict:
+        lat = np.array(self._latencies) if self._latencies else np.zeros(1)
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "write_ms_mean": float(lat.mean() * 1e3),
+            "write_ms_p95": float(np.percentile(lat, 95) * 1e3),
+            "write_ms_max": float(lat.max() * 1e3),
+        }
+
+    # wait until everything queued so far is written
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        if wait:
+            self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            pending = list(self._queue)
+            self._queue.clear()
+            self._cond.notify_all()
+        for _, _, fut in pending:
+            fut.set_result(None)
+        for t in self._threads:
+            t.join(timeout)
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                frame, path, fut = self._queue.popleft()
+                self._busy += 1
+            t0 = time.perf_counter()
+            result = None
+            try:
+                result = frame.save(path, self.quality)
+            except Exception as e:
+                logging.warning(f"failed to save frame to {path}: {e}")
+            dt = time.perf_counter() - t0
+            with self._cond:
+                self._busy -= 1
+                if result is None:
+                    self.failed += 1
+                else:
+                    self.written += 1
+                    self._latencies.append(dt)
+                self._cond.notify_all()
+            fut.set_result(result)
+
+_default_archiver: Optional[FrameArchiver] = None
+_default_lock = threading.Lock()
+
+# shared archiver used by Frame.save_async; a closed one is replaced by a new one
+def default_archiver() -> FrameArchiver:
+    global _default_archiver
+    with _default_lock:
+        if _default_archiver is None or _default_archiver.closed:
+            _default_archiver = FrameArchiver()
+        return _default_archiver
+
+# close the shared archiver at process exit (queued frames are written first)
+# and forget it; returns its final metrics, None if it was never created
+def shutdown_default_archiver(timeout: Optional[float] = None) -> Optional[dict]:
+    global _default_archiver
+    with _default_lock:
+        archiver, _default_archiver = _default_archiver, None
+    if archiver is None:
+        return None
+    archiver.close(timeout=timeout)
+    return archiver.metrics()
@@ -0,0 +1,254 @@
+import heapq
+import math
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from occupancy_map import OccupancyGrid, Cell
+
+# Incremental frontier index for an OccupancyGrid.
+#
+# A frontier cell is a known free cell (FREE or VISITED) with a 4-neighbour
+# that is UNKNOWN. Frontier cells are grouped into 8-connected clusters.
+# The index registers itself as a region listener on the map, so every
+# update_visited_in_occup_grid / update_visited_batch / update_occup_map call
+# only re-examines the box it touched. After writing grid cells directly,
+# call update_region() for the changed box.
+#
+# The controllers do not use the index yet: their OccupancyGrid has no
+# free-space sensing (the Tello has no depth sensor, and detections are kept
+# out of the occupancy log-odds), so every VISITED cell next to the unexplored
+# map is a frontier and the clusters only retrace the flown path. It becomes
+# useful once a range source feeds update_occup_map.
+
+Cell2D = Tuple[int, int]  # (cx, cy)
+
+@dataclass
+class FrontierCluster:
+    id: int
+    cells: Set[Cell2D] = field(default_factory=set)
+    sum_x: int = 0
+    sum_y: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.cells)
+
+    @property
+    def centroid(self) -> Tuple[float, float]:
+        # (cx, cy) in cell coordinates
+        return (self.sum_x / len(self.cells), self.sum_y / len(self.cells))
+
+class FrontierIndex:
+    def __init__(self, om: OccupancyGrid, bucket_size: int = 32, attach: bool = True):
+        self.om = om
+        self.bucket_size = bucket_size  # spatial hash cell for nearest() queries
+        self.cell_cluster: Dict[Cell2D, int] = {}
+        self.clusters: Dict[int, FrontierCluster] = {}
+        self._next_id = 0
+        self._by_size: List[Tuple[int, int]] = []           # (-size, id), lazy deletion
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}  # centroid bucket -> ids
+        self._bucket_of: Dict[int, Tuple[int, int]] = {}
+        # bucket bounding box (kx_min, kx_max, ky_min, ky_max), grown on insert
+        # and only shrunk by rebuild(): an upper bound that ends nearest()
+        self._extent: Optional[Tuple[int, int, int, int]] = None
+        self.rebuild()
+        if attach:
+            om.add_region_listener(self.update_region)
+
+    def detach(self) -> None:
+        self.om.remove_region_listener(self.update_region)
+
+    # ------------------------------------------------------------------
+    # updates
+    def rebuild(self) -> None:
+        # full scan, only needed once when the index is created
+        self.cell_cluster.clear()
+        self.clusters.clear()
+        self._by_size.clear()
+        self._buckets.clear()
+        self._bucket_of.clear()
+        self._extent = None
+        bounds = self._map_bounds()
+        if bounds is not None:
+            self.update_region(*bounds)
+
+    def update_region(self, y_min: int, y_max: int, x_min: int, x_max: int) -> None:
+        # frontier status can change one cell around the changed box
+        y_min, y_max, x_min, x_max = y_min - 1, y_max + 1, x_min - 1, x_max + 1
+        if not self.om.growable:
+            N = self.om.map_size_N
+            y_min, x_min = max(0, y_min), max(0, x_min)
+            y_max, x_max = min(N - 1, y_max), min(N - 1, x_max)
+            if y_min > y_max or x_min > x_max:
+                return
+        flags = self._frontier_flags(y_min, y_max, x_min, x_max)
+        fy, fx = np.nonzero(flags)
+        new_cells = set(zip((fx + x_min).tolist(), (fy + y_min).tolist()))
+
+        # clusters that touch the box (or its 1-cell ring) must be rebuilt
+        affected: Set[int] = set()
+        for cell, cid in self._cells_near(y_min - 1, y_max + 1, x_min - 1, x_max + 1):
+            affected.add(cid)
+        pool: Set[Cell2D] = set(new_cells)
+        for cid in affected:
+            for cell in self.clusters[cid].cells:
+                x, y = cell
+                inside = x_min <= x <= x_max and y_min <= y <= y_max
+                if not inside:
+                    pool.add(cell)
+            self._drop_cluster(cid)
+        self._label(pool)
+
+    # ------------------------------------------------------------------
+    # queries
+    def largest(self, min_size: int = 1) -> Optional[FrontierCluster]:
+        heap = self._by_size
+        while heap:
+            neg_size, cid = heap[0]
+            c = self.clusters.get(cid)
+            if c is None or c.size != -neg_size:
+                heapq.heappop(heap)  # stale entry
+                continue
+            return c if c.size >= min_size else None
+        return None
+
+    def nearest(self, x: float, y: float, min_size: int = 1) -> Optional[FrontierCluster]:
+        # cluster with the closest centroid to (x, y), searched ring by ring
+        # over the centroid buckets; once the rings have probed more keys than
+        # there are occupied buckets, the occupied buckets are scanned instead,
+        # so a query costs O(min(rings^2, buckets))
+        if not self.clusters:
+            return None
+        B = self.bucket_size
+        bx, by = int(math.floor(x / B)), int(math.floor(y / B))
+        kx_min, kx_max, ky_min, ky_max = self._extent
+        max_ring = max(bx - kx_min, kx_max - bx, by - ky_min, ky_max - by, 0)
+        best, best_d = None, math.inf
+        probes = 0
+        for ring in range(max_ring + 1):
+            probes += 8 * ring or 1
+            if probes > len(self._buckets):
+                return self._nearest_scan(x, y, min_size)
+            for key in self._ring(bx, by, ring):
+                best, best_d = self._closer(self._buckets.get(key, ()), x, y, min_size, best, best_d)
+            # anything in a farther ring is at least ring * B away
+            if best is not None and best_d <= ring * B:
+                break
+        return best
+
+    def _nearest_scan(self, x: float, y: float, min_size: int) -> Optional[FrontierCluster]:
+        best, best_d = None, math.inf
+        for members in self._buckets.values():
+            best, best_d = self._closer(members, x, y, min_size, best, best_d)
+        return best
+
+    def _closer(self, ids, x: float, y: float, min_size: int, best, best_d):
+        for cid in ids:
+            c = self.clusters[cid]
+            if c.size < min_size:
+                continue
+            cx, cy = c.centroid
+            d = math.hypot(cx - x, cy - y)
+            if d < best_d:
+                best, best_d = c, d
+        return best, best_d
+
+    def frontier_cells(self) -> List[Cell2D]:
+        return list(self.cell_cluster.keys())
+
+    # ------------------------------------------------------------------
+    # internals
+    def _map_bounds(self):
+        if not self.om.growable:
+            N = self.om.map_size_N
+            return (0, N - 1, 0, N - 1)
+        return self.om.grid.allocated_bounds()
+
+    def _read(self, y_min: int, y_max: int, x_min: int, x_max: int) -> np.ndarray:
+        # grid block with cells outside a dense map read as OBSTACLE
+        # (nothing to explore past the edge)
+        grid = self.om.grid
+        if self.om.growable:
+            return grid[y_min:y_max + 1, x_min:x_max + 1]
+        N = self.om.map_size_N
+        out = np.full((y_max - y_min + 1, x_max - x_min + 1), Cell.OBSTACLE, dtype=np.int8)
+        ya, yb = max(0, y_min), min(N - 1, y_max)
+        xa, xb = max(0, x_min), min(N - 1, x_max)
+        if ya <= yb and xa <= xb:
+            out[ya - y_min:yb - y_min + 1, xa - x_min:xb - x_min + 1] = grid[ya:yb + 1, xa:xb + 1]
+        return out
+
+    def _frontier_flags(self, y_min: int, y_max: int, x_min: int, x_max: int) -> np.ndarray:
+        g = self._read(y_min - 1, y_max + 1, x_min - 1, x_max + 1)
+        known_free = (g == Cell.FREE) | (g == Cell.VISITED)
+        unknown = g == Cell.UNKNOWN
+        near_unknown = unknown[:-2, 1:-1] | unknown[2:, 1:-1] | unknown[1:-1, :-2] | unknown[1:-1, 2:]
+        return known_free[1:-1, 1:-1] & near_unknown
+
+    def _cells_near(self, y_min: int, y_max: int, x_min: int, x_max: int):
+        # frontier cells (and their cluster) inside the box
+        area = (y_max - y_min + 1) * (x_max - x_min + 1)
+        if area <= len(self.cell_cluster):
+            get = self.cell_cluster.get
+            for y in range(y_min, y_max + 1):
+                for x in range(x_min, x_max + 1):
+                    cid = get((x, y))
+                    if cid is not None:
+                        yield (x, y), cid
+        else:
+            for (x, y), cid in list(self.cell_cluster.items()):
+                if x_min <= x <= x_max and y_min <= y <= y_max:
+                    yield (x, y), cid
+
+    def _drop_cluster(self, cid: int) -> None:
+        c = self.clusters.pop(cid)
+        for cell in c.cells:
+            del self.cell_cluster[cell]
+        key = self._bucket_of.pop(cid)
+        members = self._buckets[key]
+        members.discard(cid)
+        if not members:
+            del self._buckets[key]
+
+    def _label(self, pool: Set[Cell2D]) -> None:
+        # 8-connected components of pool become new clusters
+        while pool:
+            seed = pool.pop()
+            c = FrontierCluster(id=self._next_id)
+            self._next_id += 1
+            stack = [seed]
+            while stack:
+                cell = stack.pop()
+                c.cells.add(cell)
+                c.sum_x += cell[0]
+                c.sum_y += cell[1]
+                self.cell_cluster[cell] = c.id
+                x, y = cell
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        n = (x + dx, y + dy)
+                        if n in pool:
+                            pool.discard(n)
+                            stack.append(n)
+            self.clusters[c.id] = c
+            heapq.heappush(self._by_size, (-c.size, c.id))
+            cx, cy = c.centroid
+            key = (int(math.floor(cx / self.bucket_size)), int(math.floor(cy / self.bucket_size)))
+            self._buckets.setdefault(key, set()).add(c.id)
+            self._bucket_of[c.id] = key
+            e = self._extent
+            self._extent = (key[0], key[0], key[1], key[1]) if e is None else \
+                (min(e[0], key[0]), max(e[1], key[0]), min(e[2], key[1]), max(e[3], key[1]))
+
+    @staticmethod
+    def _ring(bx: int, by: int, r: int):
+        if r == 0:
+            yield (bx, by)
+            return
+        for i in range(-r, r + 1):
+            yield (bx + i, by - r)
+            yield (bx + i, by + r)
+        for j in range(-r + 1, r):
+            yield (bx - r, by + j)
+            yield (bx + r, by + j)
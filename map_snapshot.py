@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import logging
+import numpy as np
+from typing import Dict, Optional, Union
+
+from tiled_grid import TiledArray
+from change_log import ChangeSet
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D
+
+# On-disk snapshot of an OccupancyGrid/ValueMap
+#
+# <path>/meta.json        map parameters, pose and per-layer layout
+# <path>/<layer>.npy      dense layers (np.lib.format, opened with np.memmap)
+# <path>/<layer>.tiles    tiled layers, tiles stacked as (num_tiles, T, T);
+#                         the tile keys are listed in meta.json in file order
+#
+# load_snapshot() maps the files instead of reading them, so resuming a
+# mission costs a few milliseconds whatever the map size. MapCheckpointer
+# keeps a snapshot up to date and only rewrites tiles that changed.
+
+SNAPSHOT_VERSION = 1
+MAP_CLASSES = {"OccupancyGrid": OccupancyGrid, "ValueMap": ValueMap}
+MapType = Union[OccupancyGrid, ValueMap]
+
+def snapshot_exists(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+def _map_meta(om: MapType) -> dict:
+    return {
+        "version": SNAPSHOT_VERSION,
+        "kind": type(om).__name__,
+        "W": om.W,
+        "H": om.H,
+        "cell_size": om.cell_size,
+        "initial_xy": [om.initial_x, om.initial_y],
+        "storage": om.storage,
+        "tile_size": om.tile_size,
+        "map_size_N": om.map_size_N,
+        "initial_sector": om.initial_sector,
+        "pose": {"x": om.curr_point.x, "y": om.curr_point.y, "yaw": om.curr_point.yaw},
+        "saved_at": time.time(),
+        "layers": {},
+    }
+
+def _write_meta(path: str, meta: dict) -> None:
+    # write then rename so a crash never leaves a half-written meta.json
+    tmp = os.path.join(path, "meta.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, "meta.json"))
+
+def _read_meta(path: str) -> dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version: {meta.get('version')}")
+    return meta
+
+def _tiles_memmap(filename: str, dtype, n_tiles: int, tile_size: int, mode: str):
+    if n_tiles == 0:
+        return None
+    return np.memmap(filename, dtype=dtype, mode=mode, shape=(n_tiles, tile_size, tile_size))
+
+def save_snapshot(om: MapType, path: str) -> None:
+    # write a full snapshot of om to the directory path
+    os.makedirs(path, exist_ok=True)
+    meta = _map_meta(om)
+    for name, (dtype, fill) in om.LAYERS.items():
+        layer = getattr(om, name)
+        entry = {"dtype": np.dtype(dtype).str, "fill": float(fill)}
+        if isinstance(layer, TiledArray):
+            keys = list(layer.tiles.keys())
+            entry["file"] = f"{name}.tiles"
+            entry["keys"] = [list(k) for k in keys]
+            with open(os.path.join(path, entry["file"]), "wb") as f:
+                for k in keys:
+                    f.write(np.ascontiguousarray(layer.tiles[k]).tobytes())
+        else:
+            entry["file"] = f"{name}.npy"
+            mm = np.lib.format.open_memmap(os.path.join(path, entry["file"]), mode="w+",
+                                           dtype=layer.dtype, shape=layer.shape)
+            mm[:] = layer
+            mm.flush()
+            del mm
+        meta["layers"][name] = entry
+    _write_meta(path, meta)
+
+def load_snapshot(path: str, mode: str = "c") -> MapType:
+    # reopen a snapshot without copying the layers
+    # mode: "c" copy-on-write (default, the files change only on checkpoint),
+    #       "r+" write-through, "r" read-only
+    meta = _read_meta(path)
+    cls = MAP_CLASSES[meta["kind"]]
+    N = meta["map_size_N"]
+    T = meta["tile_size"]
+    layers = {}
+    for name, entry in meta["layers"].items():
+        filename = os.path.join(path, entry["file"])
+        dtype = np.dtype(entry["dtype"])
+        if meta["storage"] == "tiled":
+            arr = TiledArray((N, N), dtype, fill=entry["fill"], tile_size=T)
+            mm = _tiles_memmap(filename, dtype, len(entry["keys"]), T, mode)
+            for i, (ty, tx) in enumerate(entry["keys"]):
+                arr.tiles[(ty, tx)] = mm[i]
+            layers[name] = arr
+        else:
+            layers[name] = np.load(filename, mmap_mode=mode)
+    om = cls(meta["W"], meta["H"], meta["cell_size"], tuple(meta["initial_xy"]),
+             storage=meta["storage"], tile_size=T, layers=layers)
+    om.initial_sector = meta["initial_sector"]
+    pose = meta["pose"]
+    om.curr_point = Pose2D(x=pose["x"], y=pose["y"], yaw=pose["yaw"])
+    return om
+
+# Keeps a snapshot of one map up to date.
+# checkpoint() compares the map with the snapshot tile by tile and writes
+# only the tiles that differ, plus the pose/metadata.
+# incremental=True only compares the tiles the map's change log marked dirty
+# since the last checkpoint; cells written directly into a layer must then be
+# reported with om.mark_dirty().
+class MapCheckpointer:
+    def __init__(self, om: MapType, path: str, tile_size: int = 64, incremental: bool = False,
+                 overwrite: bool = False):
+        self.om = om
+        self.path = path
+        self.tile_size = tile_size  # diff granularity for dense layers
+        self.incremental = incremental
+        self.tiles_written = 0
+        self.last_checkpoint = None
+        # change-log version the files match; unknown for a snapshot that was
+        # already on disk, so the first checkpoint then diffs everything;
+        # overwrite=True replaces a snapshot left by an earlier, unrelated run
+        self._version = None
+        if overwrite or not snapshot_exists(path):
+            save_snapshot(om, path)
+            self._version = om.version
+        self._meta = _read_meta(path)
+        self._files: Dict[str, Optional[np.ndarray]] = {}
+        for name, entry in self._meta["layers"].items():
+            self._files[name] = self._open_layer(name, entry)
+
+    def _open_layer(self, name: str, entry: dict):
+        filename = os.path.join(self.path, entry["file"])
+        if "keys" in entry:
+            return _tiles_memmap(filename, np.dtype(entry["dtype"]), len(entry["keys"]),
+                                 self._meta["tile_size"], "r+")
+        return np.load(filename, mmap_mode="r+")
+
+    def checkpoint(self) -> int:
+        # returns the number of tiles written
+        written = 0
+        dirty = None
+        if self.incremental and self._version is not None:
+            changes = self.om.changes_since(self._version)
+            if changes.complete:
+                dirty = changes
+        self._version = self.om.version
+        for name in self.om.LAYERS:
+            layer = getattr(self.om, name)
+            if isinstance(layer, TiledArray):
+                written += self._checkpoint_tiled(name, layer, dirty)
+            else:
+                written += self._checkpoint_dense(name, layer, dirty)
+        meta = self._meta
+        meta["pose"] = {"x": self.om.curr_point.x, "y": self.om.curr_point.y, "yaw": self.om.curr_point.yaw}
+        meta["saved_at"] = time.time()
+        _write_meta(self.path, meta)
+        self.tiles_written += written
+        self.last_checkpoint = meta["saved_at"]
+        logging.info(f"checkpoint {self.path}: {written} tiles written")
+        return written
+
+    def _checkpoint_dense(self, name: str, layer: np.ndarray,
+                          dirty: Optional[ChangeSet] = None) -> int:
+        mm = self._files[name]
+        if mm is layer or (isinstance(layer, np.memmap) and layer.filename == mm.filename
+                           and layer.mode == "r+"):
+            # write-through map: the page cache already holds the changes
+            mm.flush()
+            return 0
+        T = self.tile_size
+        N0, N1 = layer.shape
+        if dirty is not None:
+            tiles = dirty.tiles(T)
+            candidates = [(ty, tx) for ty, tx in tiles if 0 <= ty * T < N0 and 0 <= tx * T < N1]
+        else:
+            ny, nx = -(-N0 // T), -(-N1 // T)
+            diff = np.zeros((ny * T, nx * T), dtype=bool)
+            diff[:N0, :N1] = layer != mm
+            changed = diff.reshape(ny, T, nx, T).any(axis=(1, 3))
+            candidates = list(zip(*np.nonzero(changed)))
+        written = 0
+        for ty, tx in candidates:
+            ys, xs = slice(ty * T, (ty + 1) * T), slice(tx * T, (tx + 1) * T)
+            if dirty is not None and np.array_equal(mm[ys, xs], layer[ys, xs]):
+                continue
+            mm[ys, xs] = layer[ys, xs]
+            written += 1
+        if written:
+            mm.flush()
+        return written
+
+    def _checkpoint_tiled(self, name: str, layer: TiledArray,
+                          dirty: Optional[ChangeSet] = None) -> int:
+        entry = self._meta["layers"][name]
+        mm = self._files[name]
+        index = {tuple(k): i for i, k in enumerate(entry["keys"])}
+        written = 0
+        new_keys = []
+        tiles = layer.tiles.items()
+        if dirty is not None:
+            keys = dirty.tiles(layer.tile_size)
+            tiles = [(k, layer.tiles[k]) for k in keys if k in layer.tiles]
+        for key, tile in tiles:
+            i = index.get(key)
+            if i is None:
+                new_keys.append(key)
+            elif not np.array_equal(mm[i], tile):
+                mm[i] = tile
+                written += 1
+        if mm is not None:
+            mm.flush()
+        if new_keys:
+            # append new tiles at the end of the file and remap it
+            filename = os.path.join(self.path, entry["file"])
+            with open(filename, "ab") as f:
+                for key in new_keys:
+                    f.write(np.ascontiguousarray(layer.tiles[key]).tobytes())
+            entry["keys"].extend(list(k) for k in new_keys)
+            self._files[name] = self._open_layer(name, entry)
+            written += len(new_keys)
+        return written
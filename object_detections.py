@@ -1,3 +1,212 @@
-from google.cloud import vision
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Struct-of-arrays container for object detections.
+# boxes  (N, 4) float32  [x_min, y_min, x_max, y_max], normalized to [0, 1]
+# scores (N,)   float32
+# labels (N,)   int32    ids interned in a LabelTable (shared LABELS by default)
+# frames (N,)   int64    frame id each detection came from, -1 if unknown
+# Filtering, IoU, NMS and merging work on the arrays; to_dicts() gives the
+# list-of-dicts format of vision_detect back.
+
+class LabelTable:
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        label = self._ids.get(name)
+        if label is None:
+            with self._lock:
+                label = self._ids.get(name)
+                if label is None:
+                    label = len(self.names)
+                    self.names.append(name)
+                    self._ids[name] = label
+        return label
+
+    def intern_many(self, names: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.intern(n) for n in names), dtype=np.int32)
+
+    # ids of names already known; unknown names match nothing
+    def lookup(self, names: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._ids.get(n, -1) for n in names), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+LABELS = LabelTable()
+
+# pairwise IoU between (N, 4) and (M, 4) boxes -> (N, M)
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
 
 class Detections:
+    __slots__ = ("boxes", "scores", "labels", "frames", "table")
+
+    def __init__(self, boxes: np.ndarray, scores: np.ndarray, labels: np.ndarray,
+                 frames: Optional[np.ndarray] = None, table: LabelTable = LABELS):
+        # arrays already of the right dtype are kept as they are (no copy)
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        n = self.scores.size
+        if frames is None or np.ndim(frames) == 0:
+            self.frames = np.full(n, -1 if frames is None else frames, dtype=np.int64)
+        else:
+            self.frames = np.asarray(frames, dtype=np.int64).reshape(-1)
+        self.table = table
+        if not (self.boxes.shape[0] == self.labels.size == n):
+            raise ValueError("boxes, scores and labels must have the same length")
+
+    @classmethod
+    def empty(cls, table: LabelTable = LABELS) -> "Detections":
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32), table=table)
+
+    # from vision_detect's [{'object', 'score', 'bbox'}, ...]
+    @classmethod
+    def from_dicts(cls, dets: Sequence[dict], frame_id: int = -1, table: LabelTable = LABELS) -> "Detections":
+        if not dets:
+            return cls.empty(table)
+        boxes = np.array([d['bbox'] for d in dets], dtype=np.float32)
+        scores = np.fromiter((d['score'] for d in dets), dtype=np.float32, count=len(dets))
+        return cls(boxes, scores, table.intern_many(d['object'] for d in dets), frame_id, table)
+
+    # from an AnnotateImageResponse (or its localized_object_annotations).
+    # Reads the raw protobuf messages underneath the proto-plus wrappers and
+    # fills the arrays in one pass, no per-object dicts or wrapper objects.
+    @classmethod
+    def from_vision_response(cls, response, frame_id: int = -1, table: LabelTable = LABELS) -> "Detections":
+        if hasattr(type(response), "pb"):
+            response = type(response).pb(response)
+        anns = getattr(response, "localized_object_annotations", response)
+        anns = [type(a).pb(a) if hasattr(type(a), "pb") else a for a in anns]
+        n = len(anns)
+        if n == 0:
+            return cls.empty(table)
+        if all(len(a.bounding_poly.normalized_vertices) == 4 for a in anns):
+            xy = np.fromiter((c for a in anns for v in a.bounding_poly.normalized_vertices for c in (v.x, v.y)),
+                             dtype=np.float32, count=n * 8).reshape(n, 4, 2)
+            boxes = np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=1)
+        else:
+            boxes = np.zeros((n, 4), dtype=np.float32)
+            for i, a in enumerate(anns):
+                vs = a.bounding_poly.normalized_vertices
+                if len(vs):
+                    xs, ys = [v.x for v in vs], [v.y for v in vs]
+                    boxes[i] = (min(xs), min(ys), max(xs), max(ys))
+        scores = np.fromiter((a.score for a in anns), dtype=np.float32, count=n)
+        return cls(boxes, scores, table.intern_many(a.name for a in anns), frame_id, table)
+
+    # from OpenCV's (1, 1, N, 7) DetectionOutput; boxes and scores are views of out
+    # (boxes are not clipped, see clipped())
+    @classmethod
+    def from_detection_output(cls, out: np.ndarray, labels: Sequence[str] = (), frame_id: int = -1,
+                              table: LabelTable = LABELS) -> "Detections":
+        rows = np.asarray(out, dtype=np.float32).reshape(-1, 7)
+        class_ids = rows[:, 1].astype(np.int32)
+        names = [labels[c] if 0 <= c < len(labels) else str(c) for c in range(int(class_ids.max(initial=-1)) + 1)]
+        lut = table.intern_many(names) if names else np.zeros(0, np.int32)
+        ids = lut[class_ids] if lut.size else class_ids
+        return cls(rows[:, 3:7], rows[:, 2], ids, frame_id, table)
+
+    def to_dicts(self) -> List[dict]:
+        names = self.table.names
+        return [{'object': names[l], 'score': float(s), 'bbox': [float(v) for v in b]}
+                for b, s, l in zip(self.boxes, self.scores, self.labels)]
+
+    def label_names(self) -> List[str]:
+        return [self.table.names[l] for l in self.labels]
+
+    def __len__(self) -> int:
+        return self.scores.size
+
+    def __getitem__(self, index) -> "Detections":
+        return Detections(self.boxes[index], self.scores[index], self.labels[index],
+                          self.frames[index], self.table)
+
+    def __repr__(self) -> str:
+        return f"Detections({len(self)}, labels={sorted(set(self.label_names()))})"
+
+    @property
+    def areas(self) -> np.ndarray:
+        return (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+
+    @property
+    def centers(self) -> np.ndarray:
+        return np.stack([(self.boxes[:, 0] + self.boxes[:, 2]) * 0.5,
+                         (self.boxes[:, 1] + self.boxes[:, 3]) * 0.5], axis=1)
+
+    def clipped(self) -> "Detections":
+        return Detections(np.clip(self.boxes, 0.0, 1.0), self.scores, self.labels, self.frames, self.table)
+
+    def filter(self, min_score: Optional[float] = None,
+               labels: Optional[Sequence[Union[str, int]]] = None) -> "Detections":
+        keep = np.ones(len(self), dtype=bool)
+        if min_score is not None:
+            keep &= self.scores >= min_score
+        if labels is not None:
+            ids = [l for l in labels if not isinstance(l, str)]
+            names = [l for l in labels if isinstance(l, str)]
+            ids = np.concatenate([np.asarray(ids, dtype=np.int32), self.table.lookup(names)])
+            keep &= np.isin(self.labels, ids)
+        return self[keep]
+
+    # IoU of every box here with every box in other (default: with itself)
+    def iou(self, other: Optional["Detections"] = None) -> np.ndarray:
+        return box_iou(self.boxes, (other if other is not None else self).boxes)
+
+    # indices kept by greedy non-max suppression, highest score first;
+    # per_label=True only suppresses boxes that share a label
+    def nms_indices(self, iou_threshold: float = 0.5, per_label: bool = True) -> np.ndarray:
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=np.intp)
+        boxes = self.boxes
+        if per_label:
+            # shift each label to its own region so different labels never overlap
+            boxes = boxes + (self.labels.astype(np.float32) * 2.0)[:, None]
+        x0, y0, x1, y1 = (np.ascontiguousarray(boxes[:, k]) for k in range(4))
+        areas = (x1 - x0) * (y1 - y0)
+        order = np.argsort(-self.scores, kind="stable")
+        keep = []
+        while order.size:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            iw = np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest])
+            ih = np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest])
+            inter = np.maximum(iw, 0) * np.maximum(ih, 0)
+            union = areas[i] + areas[rest] - inter
+            # same as box_iou <= threshold, without dividing
+            order = rest[inter <= iou_threshold * union]
+        return np.asarray(keep, dtype=np.intp)
+
+    def nms(self, iou_threshold: float = 0.5, per_label: bool = True) -> "Detections":
+        return self[self.nms_indices(iou_threshold, per_label)]
+
+    # concatenate detections (e.g. from several frames); with iou_threshold the
+    # same object seen in several frames is kept once, at its best score
+    @classmethod
+    def merge(cls, parts: Sequence["Detections"], iou_threshold: Optional[float] = None,
+              table: Optional[LabelTable] = None) -> "Detections":
+        parts = [p for p in parts if p is not None]
+        if table is None:  # an empty LabelTable is falsy but still a valid target
+            table = parts[0].table if parts else LABELS
+        if not parts:
+            return cls.empty(table)
+        labels = [p.labels if p.table is table else table.intern_many(p.label_names()) for p in parts]
+        merged = cls(np.concatenate([p.boxes for p in parts]), np.concatenate([p.scores for p in parts]),
+                     np.concatenate(labels), np.concatenate([p.frames for p in parts]), table)
+        return merged.nms(iou_threshold) if iou_threshold is not None else merged
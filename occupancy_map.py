@@ -2,8 +2,11 @@ import numpy as np
 import math
 import logging
 from enum import IntEnum
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Callable, Hashable, Sequence
+from tiled_grid import TiledArray
+from change_log import ChangeLog, ChangeSet
 
 class Cell(IntEnum):
     UNKNOWN = 0
@@ -25,10 +28,82 @@ def wrap_angle_rad(a: float) -> float:
         a -= 2*math.pi
     return a
 
+def wrap_angle_array(a: np.ndarray) -> np.ndarray:
+    # vectorized wrap_angle_rad, same repeated +-2π steps so results match bit for bit
+    a = np.array(a, dtype=np.float64)
+    while True:
+        m = a <= -math.pi
+        if not m.any():
+            break
+        a[m] += 2*math.pi
+    while True:
+        m = a >= math.pi
+        if not m.any():
+            break
+        a[m] -= 2*math.pi
+    return a
+
+# cell offsets (relative to the drone's cell) inside a FOV cone
+# and the angle_confidence weight of each one
+@dataclass
+class FovStencil:
+    dy: np.ndarray
+    dx: np.ndarray
+    theta: np.ndarray
+    weight: np.ndarray
+
+# small LRU cache for FOV stencils with hit/miss counters
+class StencilCache:
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, FovStencil]" = OrderedDict()
+    def get(self, key: Hashable, build: Callable[[], FovStencil]) -> FovStencil:
+        stencil = self._entries.get(key)
+        if stencil is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return stencil
+        self.misses += 1
+        stencil = build()
+        self._entries[key] = stencil
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return stencil
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+    def __len__(self) -> int:
+        return len(self._entries)
+
 class OccupancyGrid:
+    # per-cell layers: attribute name -> (dtype, fill value)
+    LAYERS = {"grid": (np.int8, Cell.UNKNOWN),
+              "log_odds": (np.float32, 0.0)}
+    # log-odds occupancy model used by update_occup_map
+    L_FREE = -0.4       # added to cells a beam passes through
+    L_OCC = 0.85        # added to the cell a beam ends on
+    L_MIN = -4.0        # clamping keeps the map able to change its mind
+    L_MAX = 4.0
+    L_FREE_THRESH = -1.0  # log_odds <= this -> FREE
+    L_OCC_THRESH = 1.0    # log_odds >= this -> OBSTACLE
+    RAY_STEP = 0.5        # beam sampling step in cells
     # create a static-sized 2d map
+    # storage="tiled" keeps the layers in on-demand tiles (see tiled_grid.py):
+    # memory follows the explored area and the map can grow past map_size_N
+    # layers: prebuilt arrays to use instead of allocating (e.g. from a snapshot)
     def __init__(self, W:int, H:int, cell_size: float, 
-                 initial_xy: Tuple[float, float] = (0.0, 0.0)):
+                 initial_xy: Tuple[float, float] = (0.0, 0.0),
+                 storage: str = "dense", tile_size: int = 64,
+                 layers: Optional[dict] = None):
+        if storage not in ("dense", "tiled"):
+            raise ValueError(f"unknown storage mode: {storage}")
+        self.storage = storage
+        self.tile_size = tile_size
+        self._preset_layers = dict(layers or {})
+        self.growable = storage == "tiled"
         self.W = W
         self.H = H
         self.cell_size = cell_size
@@ -37,14 +112,61 @@ class OccupancyGrid:
         self.center_offset = self.map_size_N // 2
         self.initial_sector = "N"
         self.curr_point = Pose2D(x=float(self.center_offset), y=float(self.center_offset), yaw=0.0)
-        self.grid = np.full((self.map_size_N, self.map_size_N), Cell.UNKNOWN, dtype=np.int8)
+        self._pending_cells = []
+        self._region_listeners = []
+        self.changes = ChangeLog()
+        self.grid = self._new_layer("grid")
+        self.log_odds = self._new_layer("log_odds")
+    # fn(y_min, y_max, x_min, x_max) is called (inclusive bounds) after the
+    # update methods change cells of the grid in that box; value-only updates
+    # are recorded in the change log without calling the listeners
+    def add_region_listener(self, fn: Callable[[int, int, int, int], None]) -> None:
+        self._region_listeners.append(fn)
+    def remove_region_listener(self, fn: Callable[[int, int, int, int], None]) -> None:
+        self._region_listeners.remove(fn)
+    def _notify_region(self, y_min: int, y_max: int, x_min: int, x_max: int) -> None:
+        self.changes.record((y_min, y_max, x_min, x_max))
+        for fn in self._region_listeners:
+            fn(y_min, y_max, x_min, x_max)
+    # report cells written directly into a layer (e.g. om.grid[y, x] = ...)
+    # so listeners and the change log see them too
+    def mark_dirty(self, y_min: int, y_max: int, x_min: int, x_max: int) -> None:
+        self._notify_region(y_min, y_max, x_min, x_max)
+    # change feed: bumped by every mutating method (see change_log.py)
+    @property
+    def version(self) -> int:
+        return self.changes.version
+    def changes_since(self, version: int) -> ChangeSet:
+        return self.changes.changes_since(version)
+    # Cell view of the map; cells touched by update_occup_map are re-derived
+    # from log_odds the first time the grid is read afterwards
+    @property
+    def grid(self):
+        if self._pending_cells:
+            self._sync_grid()
+        return self._grid
+    @grid.setter
+    def grid(self, value):
+        self._grid = value
+    # allocate one map layer (see LAYERS) in the configured storage mode
+    def _new_layer(self, name: str):
+        if name in self._preset_layers:
+            return self._preset_layers.pop(name)
+        dtype, fill = self.LAYERS[name]
+        shape = (self.map_size_N, self.map_size_N)
+        if self.storage == "tiled":
+            return TiledArray(shape, dtype, fill=fill, tile_size=self.tile_size)
+        return np.full(shape, fill, dtype=dtype)
+    # whether a cell can be stored (always true for a growable map)
+    def in_bounds(self, cx: int, cy: int) -> bool:
+        return self.growable or (0 <= cx < self.map_size_N and 0 <= cy < self.map_size_N)
     # coordinate transforms
     # args x, y are in CELL coordinates (not world cm)
     def world_to_cells(self, x: float, y:float) -> Optional[Tuple[int, int]]:
         # x, y are already cell coordinates from curr_point
         cx = int(round(x))
         cy = int(round(y))
-        if 0 <= cx < self.map_size_N and 0 <= cy < self.map_size_N:
+        if self.in_bounds(cx, cy):
             return (cx, cy)
         return None
     def cells_to_world(self, cx: int, cy: int) -> Tuple[float, float]:
@@ -67,9 +189,11 @@ class OccupancyGrid:
             12:"W",
             13:"WNW", 14:"NW", 15:"NNW"
         }
+        return sec_dict[self.sector_index(yaw)]
+    # index (0~15) of the 22.5 deg sector used by determine_sec
+    def sector_index(self, yaw: float) -> int:
         yaw_deg = self.rad_to_deg(yaw) % 360
-        idx = math.floor((yaw_deg + 11.25) / 22.5) % 16
-        return sec_dict[idx]
+        return math.floor((yaw_deg + 11.25) / 22.5) % 16
     # update visited area in 2D occupancy map
     def update_visited_in_occup_grid(self, point: Pose2D, prev_pos: Pose2D) -> None:
         start_point = self.world_to_cells(prev_pos.x, prev_pos.y)
@@ -86,8 +210,8 @@ class OccupancyGrid:
         x, y = x0, y0 
         # loop from start to end point
         while True:
-            if self.grid[y][x] != Cell.OBSTACLE: # will be changed to == Cell.FREE
-                self.grid[y][x] = Cell.VISITED
+            if self.grid[y, x] != Cell.OBSTACLE: # will be changed to == Cell.FREE
+                self.grid[y, x] = Cell.VISITED
             if x == x1 and y == y1:
                 break
             e2 = 2*err 
@@ -99,7 +223,81 @@ class OccupancyGrid:
             if e2 < dx:
                 err += dx 
                 y += y_update
+        self._notify_region(min(y0, y1), max(y0, y1), min(x0, x1), max(x0, x1))
         
+    # batched update_visited_in_occup_grid for many segments at once
+    # starts, ends: (M, 2) arrays of (x, y) cell coordinates, or lists of Pose2D
+    # width_m > 0 marks the corridor swept by a drone of that width
+    # OBSTACLE cells are never overwritten
+    def update_visited_batch(self, starts, ends, width_m: float = 0.0) -> None:
+        p0 = self._as_cell_points(starts)
+        p1 = self._as_cell_points(ends)
+        if not self.growable:
+            # same rule as the single-segment version: skip segments leaving the map
+            N = self.map_size_N
+            ok = np.all((p0 >= 0) & (p0 < N) & (p1 >= 0) & (p1 < N), axis=1)
+            p0, p1 = p0[ok], p1[ok]
+        if p0.shape[0] == 0:
+            return
+        # closed-form Bresenham: step k of a segment moves k cells along the
+        # major axis and (2*k*minor + major - 1) // (2*major) along the other,
+        # the same cells (ties included) as the loop in update_visited_in_occup_grid
+        d = p1 - p0
+        adx, ady = np.abs(d[:, 0]), np.abs(d[:, 1])
+        steps = np.maximum(adx, ady)
+        counts = steps + 1
+        seg = np.repeat(np.arange(p0.shape[0]), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        major = np.maximum(steps, 1)[seg]
+        x_major = (adx >= ady)[seg]
+        minor = np.where(x_major, ady[seg], adx[seg])
+        off = (2 * k * minor + major - 1) // (2 * major)
+        xs = p0[seg, 0] + np.sign(d[seg, 0]) * np.where(x_major, k, off)
+        ys = p0[seg, 1] + np.sign(d[seg, 1]) * np.where(x_major, off, k)
+
+        r = width_m / 2.0 / self.cell_size
+        if r >= 0.5:
+            oy, ox = self._disk_offsets(r)
+            ys = (ys[:, None] + oy[None, :]).reshape(-1)
+            xs = (xs[:, None] + ox[None, :]).reshape(-1)
+            if not self.growable:
+                inside = (ys >= 0) & (ys < self.map_size_N) & (xs >= 0) & (xs < self.map_size_N)
+                ys, xs = ys[inside], xs[inside]
+        ys, xs = self._unique_cells(ys, xs)
+        keep = self.grid[ys, xs] != Cell.OBSTACLE
+        self.grid[ys[keep], xs[keep]] = Cell.VISITED
+        if ys.size:
+            self._notify_region(int(ys.min()), int(ys.max()), int(xs.min()), int(xs.max()))
+    # unique (y, x) cells; uses a bounding-box mask when it is small enough
+    # (no sort), otherwise falls back to np.unique on packed keys
+    def _unique_cells(self, ys: np.ndarray, xs: np.ndarray):
+        if ys.size == 0:
+            return ys, xs
+        y0, x0 = int(ys.min()), int(xs.min())
+        h, w = int(ys.max()) - y0 + 1, int(xs.max()) - x0 + 1
+        if h * w <= max(4 * ys.size, 1 << 16):
+            mask = np.zeros(h * w, dtype=bool)
+            mask[(ys - y0) * w + (xs - x0)] = True
+            uy, ux = np.divmod(np.flatnonzero(mask), w)
+            return uy + y0, ux + x0
+        keys = np.unique(ys * (1 << 32) + (xs + (1 << 31)))
+        return keys >> 32, (keys & 0xFFFFFFFF) - (1 << 31)
+    # mark a whole flown path (consecutive poses) as visited
+    def update_visited_path(self, poses, width_m: float = 0.0) -> None:
+        pts = self._as_cell_points(poses)
+        if pts.shape[0] >= 2:
+            self.update_visited_batch(pts[:-1], pts[1:], width_m)
+    # poses or (x, y) pairs in cell coordinates -> (M, 2) int array of cells
+    def _as_cell_points(self, points) -> np.ndarray:
+        if len(points) and isinstance(points[0], Pose2D):
+            points = [(p.x, p.y) for p in points]
+        return np.rint(np.asarray(points, dtype=np.float64).reshape(-1, 2)).astype(np.int64)
+    # (dy, dx) offsets of the cells within radius r (in cells) of the origin
+    def _disk_offsets(self, r: float):
+        R = int(math.ceil(r))
+        oy, ox = np.mgrid[-R:R + 1, -R:R + 1]
+        inside = oy * oy + ox * ox <= r * r
+        return oy[inside], ox[inside]
     # update drone's current position and orientation in occupancy map
     def update_drone_pos_and_ori(self, point: Optional[Pose2D] = None):
         # return format = [(x, y, yaw), sector]
@@ -113,10 +311,12 @@ class OccupancyGrid:
         dy_m = point.y * 0.01  # cm to meters
         
         # Rotate delta movement by current yaw to get world coordinates
+        # body frame: x = right, y = forward; yaw is North(+y)=0, clockwise
+        # positive like update_occup_map and ValueMap, so turn_cw adds to it
         cos_yaw = math.cos(self.curr_point.yaw)
         sin_yaw = math.sin(self.curr_point.yaw)
-        dx_world = dx_m * cos_yaw - dy_m * sin_yaw
-        dy_world = dx_m * sin_yaw + dy_m * cos_yaw
+        dx_world = dx_m * cos_yaw + dy_m * sin_yaw
+        dy_world = -dx_m * sin_yaw + dy_m * cos_yaw
         
         # Convert to cells
         dx_cell = dx_world / self.cell_size
@@ -129,9 +329,11 @@ class OccupancyGrid:
         # Update yaw (already in radians)
         self.curr_point.yaw = wrap_angle_rad(self.curr_point.yaw + point.yaw)
         
-        # Clamp x, y to map bounds
-        self.curr_point.x = min(max(self.curr_point.x, 0.0), self.map_size_N - 1.0)
-        self.curr_point.y = min(max(self.curr_point.y, 0.0), self.map_size_N - 1.0)
+        # Clamp x, y to map bounds (a growable map extends instead)
+        if not self.growable:
+            self.curr_point.x = min(max(self.curr_point.x, 0.0), self.map_size_N - 1.0)
+            self.curr_point.y = min(max(self.curr_point.y, 0.0), self.map_size_N - 1.0)
+        self.changes.record(None)  # pose-only entry in the change log
         
         # Identify sector
         sector = self.determine_sec(self.curr_point.yaw)
@@ -140,21 +342,103 @@ class OccupancyGrid:
     # get drone's current position in map
     def get_curr_pos_in_map(self):
         return self.curr_point
-    # update occup_map
-    def update_occup_map(self):
-        # mark cells as FREE, OBSTACLE
-        pass
+    # update occup_map from one scan
+    # ranges: distance in metres along each beam (scalar or array)
+    # bearings: radians relative to the heading, clockwise positive;
+    #           None spreads the beams evenly across fov_deg
+    # beams at or beyond max_range_m saw nothing: free all the way, no endpoint
+    def update_occup_map(self, ranges, bearings=None, fov_deg: float = 82.0,
+                         max_range_m: float = 4.0) -> None:
+        ranges = np.atleast_1d(np.asarray(ranges, dtype=np.float64))
+        if bearings is None:
+            half = math.radians(fov_deg) / 2.0
+            bearings = np.linspace(-half, half, ranges.size) if ranges.size > 1 else np.zeros(1)
+        bearings = np.atleast_1d(np.asarray(bearings, dtype=np.float64))
+        ranges, bearings = np.broadcast_arrays(ranges, bearings)
+        if ranges.size == 0:
+            return
+
+        max_r = max_range_m / self.cell_size
+        r_cells = np.minimum(ranges / self.cell_size, max_r)
+        hit = ranges < max_range_m
+        angle = self.curr_point.yaw + bearings
+        sin_a, cos_a = np.sin(angle), np.cos(angle)
+        ox, oy = self.curr_point.x, self.curr_point.y
+
+        # sample every beam at RAY_STEP in one (beams x samples) array
+        t = np.arange(0.0, float(r_cells.max()) + self.RAY_STEP, self.RAY_STEP)
+        along = t[None, :] < r_cells[:, None]
+        fx = np.rint(ox + t[None, :] * sin_a[:, None])[along].astype(np.int64)
+        fy = np.rint(oy + t[None, :] * cos_a[:, None])[along].astype(np.int64)
+        hx = np.rint(ox + r_cells[hit] * sin_a[hit]).astype(np.int64)
+        hy = np.rint(oy + r_cells[hit] * cos_a[hit]).astype(np.int64)
+
+        # dedupe on a local window mask instead of sorting the samples
+        y0 = int(math.floor(oy - max_r)) - 1
+        x0 = int(math.floor(ox - max_r)) - 1
+        size = int(2 * max_r) + 4
+        hit_mask = np.zeros((size, size), dtype=bool)
+        hit_mask[hy - y0, hx - x0] = True
+        free_mask = np.zeros((size, size), dtype=bool)
+        free_mask[fy - y0, fx - x0] = True
+        # a cell that ends a beam in this scan is not also cleared by it
+        free_mask &= ~hit_mask
+        if not self.growable:
+            self._clip_window(hit_mask, y0, x0)
+            self._clip_window(free_mask, y0, x0)
+        fy, fx = np.divmod(np.flatnonzero(free_mask), size)
+        hy, hx = np.divmod(np.flatnonzero(hit_mask), size)
+        self._add_log_odds(fy + y0, fx + x0, self.L_FREE)
+        self._add_log_odds(hy + y0, hx + x0, self.L_OCC)
+        if fy.size or hy.size:
+            ys = np.concatenate([fy, hy]) + y0
+            xs = np.concatenate([fx, hx]) + x0
+            self._notify_region(int(ys.min()), int(ys.max()), int(xs.min()), int(xs.max()))
+    # clear the part of a window mask (top-left at y0, x0) outside the map
+    def _clip_window(self, mask: np.ndarray, y0: int, x0: int) -> None:
+        N = self.map_size_N
+        mask[:max(0, -y0), :] = False
+        mask[:, :max(0, -x0)] = False
+        mask[max(0, N - y0):, :] = False
+        mask[:, max(0, N - x0):] = False
+    def _add_log_odds(self, ys: np.ndarray, xs: np.ndarray, delta: float) -> None:
+        if ys.size == 0:
+            return
+        lo = self.log_odds[ys, xs] + np.float32(delta)
+        self.log_odds[ys, xs] = np.clip(lo, self.L_MIN, self.L_MAX)
+        self._pending_cells.append((ys, xs))
+        if len(self._pending_cells) > 64:
+            self._sync_grid()
+    # re-derive Cell values for cells whose log-odds changed
+    def _sync_grid(self) -> None:
+        pending, self._pending_cells = self._pending_cells, []
+        ys = np.concatenate([p[0] for p in pending])
+        xs = np.concatenate([p[1] for p in pending])
+        lo = self.log_odds[ys, xs]
+        cur = self._grid[ys, xs]
+        new = np.full(ys.shape, Cell.UNKNOWN, dtype=np.int8)
+        new[lo <= self.L_FREE_THRESH] = Cell.FREE
+        new[cur == Cell.VISITED] = Cell.VISITED
+        new[lo >= self.L_OCC_THRESH] = Cell.OBSTACLE
+        self._grid[ys, xs] = new
 
 class ValueMap(OccupancyGrid):
+    LAYERS = {**OccupancyGrid.LAYERS,
+              "value": (np.float32, 0.0),
+              "conf": (np.float32, 0.0),
+              "n": (np.int32, 0)}
     def __init__(self, W:int, H:int, cell_size: float, 
-                 initial_xy: Tuple[float, float] = (0.0, 0.0)):
-        super().__init__(W, H, cell_size, initial_xy)
-        self.value = np.zeros((self.map_size_N, self.map_size_N), dtype=np.float32)
-        self.conf = np.zeros((self.map_size_N, self.map_size_N), dtype=np.float32)
-        self.n = np.zeros((self.map_size_N, self.map_size_N), dtype=np.int32)
+                 initial_xy: Tuple[float, float] = (0.0, 0.0),
+                 storage: str = "dense", tile_size: int = 64,
+                 layers: Optional[dict] = None):
+        super().__init__(W, H, cell_size, initial_xy, storage, tile_size, layers)
+        self.value = self._new_layer("value")
+        self.conf = self._new_layer("conf")
+        self.n = self._new_layer("n")
+        self.stencils = StencilCache()
     @classmethod
     def from_occupancy(cls, om: "OccupancyGrid") -> "ValueMap":
-        vm = cls(om.W, om.H, om.cell_size)
+        vm = cls(om.W, om.H, om.cell_size, storage=om.storage, tile_size=om.tile_size)
         return vm
     # define confidence value based on FOV 
     # theta = 0 -> cos(0) -> 1 highest trust value
@@ -167,8 +451,217 @@ class ValueMap(OccupancyGrid):
         if t >= 1.0:
             return 0.0
         return (math.cos(t * (math.pi / 2.0)) ** 2)
+    # same as angle_confidence but over an array of angles
+    def angle_confidence_array(self, theta: np.ndarray, fov_rad: float) -> np.ndarray:
+        half = fov_rad / 2.0
+        if half <= 1e-9:
+            return np.zeros(np.shape(theta), dtype=np.float64)
+        t = np.abs(theta) / half
+        conf = np.cos(t * (math.pi / 2.0)) ** 2
+        conf[t >= 1.0] = 0.0
+        return conf
+    # window (y_min, y_max, x_min, x_max) of cells within r_cells of the drone
+    def _range_window(self, r_cells: int) -> Tuple[int, int, int, int]:
+        if self.growable:
+            cx, cy = int(self.curr_point.x), int(self.curr_point.y)
+            return cy - r_cells, cy + r_cells, cx - r_cells, cx + r_cells
+        x_min = max(0, int(self.curr_point.x) - r_cells)
+        x_max = min(self.map_size_N - 1, int(self.curr_point.x) + r_cells)
+        y_min = max(0, int(self.curr_point.y) - r_cells)
+        y_max = min(self.map_size_N - 1, int(self.curr_point.y) + r_cells)
+        return y_min, y_max, x_min, x_max
+    # mask of the FOV cone over a grid of cell offsets (dx, dy) from the drone
+    # returns (mask, theta) where theta is the absolute angle to the heading
+    def _fov_mask(self, dx: np.ndarray, dy: np.ndarray, yaw: float, r_cells: int, half_fov: float):
+        DX, DY = np.meshgrid(dx, dy)
+        dist = np.hypot(DX, DY)
+        # North=0, East=90, South=180, West=270 (see _update_value_map_loop)
+        angle = np.arctan2(DX, DY)
+        theta = np.abs(wrap_angle_array(angle - yaw))
+        return (dist <= r_cells) & (theta <= half_fov), theta
+    # cells inside the FOV cone around curr_point, in row-major order
+    # returns (ys, xs, theta)
+    def _fov_cells(self, max_range_m: int, fov_deg: float):
+        r_cells = math.ceil(max_range_m)
+        y_min, y_max, x_min, x_max = self._range_window(r_cells)
+        dx = (np.arange(x_min, x_max + 1) + 0.5) - (self.curr_point.x + 0.5)
+        dy = (np.arange(y_min, y_max + 1) + 0.5) - (self.curr_point.y + 0.5)
+        mask, theta = self._fov_mask(dx, dy, self.curr_point.yaw, r_cells, math.radians(fov_deg) / 2.0)
+        iy, ix = np.nonzero(mask)
+        return iy + y_min, ix + x_min, theta[iy, ix]
+    # FOV stencil for the drone's current sector, cached in self.stencils
+    # geometry is evaluated at the sector's center yaw with the drone at its cell
+    # origin, so it is exact only when the pose sits on those values
+    def _fov_stencil(self, max_range_m: int, fov_deg: float) -> FovStencil:
+        sector = self.sector_index(self.curr_point.yaw)
+        key = (sector, float(fov_deg), float(max_range_m), float(self.cell_size))
+        def build() -> FovStencil:
+            r_cells = math.ceil(max_range_m)
+            offsets = np.arange(-r_cells, r_cells + 1)
+            yaw = wrap_angle_rad(math.radians(sector * 22.5))
+            mask, theta = self._fov_mask(offsets.astype(np.float64), offsets.astype(np.float64),
+                                         yaw, r_cells, math.radians(fov_deg) / 2.0)
+            iy, ix = np.nonzero(mask)
+            theta = theta[iy, ix]
+            weight = self.angle_confidence_array(theta, math.radians(fov_deg))
+            return FovStencil(dy=offsets[iy], dx=offsets[ix], theta=theta, weight=weight)
+        return self.stencils.get(key, build)
+    # cells of the cached stencil placed at the drone's cell, clipped to the map
+    # returns (ys, xs, weight)
+    def _stencil_cells(self, max_range_m: int, fov_deg: float):
+        st = self._fov_stencil(max_range_m, fov_deg)
+        ys = st.dy + int(self.curr_point.y)
+        xs = st.dx + int(self.curr_point.x)
+        if self.growable:
+            return ys, xs, st.weight
+        inside = (ys >= 0) & (ys < self.map_size_N) & (xs >= 0) & (xs < self.map_size_N)
+        if inside.all():
+            return ys, xs, st.weight
+        return ys[inside], xs[inside], st.weight[inside]
+    # fuse one observation into value/conf/n for the given cells
+    # value_score may be a scalar or one score per cell
+    def _fuse_cells(self, ys: np.ndarray, xs: np.ndarray, c_curr: np.ndarray, value_score) -> None:
+        if ys.size == 0:
+            return
+        value_score = np.broadcast_to(np.asarray(value_score, dtype=np.float64), ys.shape)
+        n_new = self.n[ys, xs] + 1
+        c_prev = self.conf[ys, xs].astype(np.float64)
+        v_prev = self.value[ys, xs].astype(np.float64)
+
+        v_new = value_score * c_curr
+        c_new = c_curr.copy()
+        seen = c_prev > 1e-9
+        if seen.any():
+            n_s, c_s, vp_s, cp_s = n_new[seen], c_curr[seen], v_prev[seen], c_prev[seen]
+            v_new[seen] = ((((n_s - 1) / n_s) * vp_s) + ((1 / n_s) * value_score[seen])) * c_s
+            c_new[seen] = (c_s*c_s + cp_s*cp_s) / (c_s + cp_s)
+        self.n[ys, xs] = n_new
+        self.value[ys, xs] = v_new
+        self.conf[ys, xs] = c_new
+        # value/conf only: the checkpoints see it in the change log, the grid
+        # listeners (frontiers, distance field) have nothing to redo
+        self.changes.record((int(ys.min()), int(ys.max()), int(xs.min()), int(xs.max())))
     def update_value_map(self, value_score: float, pose: Pose2D, fov_deg: float = 82.0, 
+                         max_range_m: int = 4, use_obstacle_mask:bool = True,
+                         use_stencil: bool = False, obstacle_grid=None) -> None:
+        # batched version of _update_value_map_loop, results are identical
+        # use_stencil=True reuses the cached sector geometry (yaw snapped to 22.5 deg)
+        # obstacle_grid: grid the obstacle mask reads (e.g. the OccupancyGrid's
+        # grid, the value map's own grid is not written by the controllers)
+        fov_rad = math.radians(fov_deg)
+        cx0 = int(pose.x * 0.01 / self.cell_size + int(self.curr_point.x) + 1e-9)
+        cy0 = int(pose.y * 0.01 / self.cell_size + int(self.curr_point.y) + 1e-9)
+        if not self.growable and not (0 <= cx0 <= self.map_size_N and 0 <= cy0 <= self.map_size_N):
+            logging.warning("waypoint is larger than the map size")
+            return None
+
+        if use_stencil:
+            ys, xs, c_curr = self._stencil_cells(max_range_m, fov_deg)
+        else:
+            ys, xs, theta = self._fov_cells(max_range_m, fov_deg)
+            c_curr = self.angle_confidence_array(theta, fov_rad)
+        if use_obstacle_mask:
+            grid = self.grid if obstacle_grid is None else obstacle_grid
+            keep = grid[ys, xs] != Cell.OBSTACLE
+            ys, xs, c_curr = ys[keep], xs[keep], c_curr[keep]
+        self._fuse_cells(ys, xs, c_curr, value_score)
+        return None
+    
+    # update_value_map with one score per bearing instead of one per frame
+    # value_scores: scores across the image, left to right
+    # bearings: radians relative to the heading (clockwise positive, ascending)
+    #           of each score; None spreads them evenly across fov_deg
+    # each cell in the cone takes the score interpolated at its own bearing,
+    # a constant vector gives exactly update_value_map
+    def update_value_map_bearings(self, value_scores, bearings=None, fov_deg: float = 82.0,
+                                  max_range_m: int = 4, use_obstacle_mask: bool = True,
+                                  use_stencil: bool = False, skip_points=None,
+                                  skip_radius_m: float = 0.0, obstacle_grid=None) -> None:
+        # obstacle_grid: as in update_value_map
+        # skip_points: (cy, cx) cells already fused by update_value_points for
+        # the same frame; the cells within skip_radius_m of them are left out so
+        # a detection is counted once, at its point, and not again by the cone
+        value_scores = np.atleast_1d(np.asarray(value_scores, dtype=np.float64))
+        if value_scores.size == 0:
+            return None
+        fov_rad = math.radians(fov_deg)
+        if bearings is None:
+            half = fov_rad / 2.0
+            bearings = np.linspace(-half, half, value_scores.size) if value_scores.size > 1 else np.zeros(1)
+        bearings = np.atleast_1d(np.asarray(bearings, dtype=np.float64))
+
+        if use_stencil:
+            ys, xs, c_curr = self._stencil_cells(max_range_m, fov_deg)
+        else:
+            ys, xs, theta = self._fov_cells(max_range_m, fov_deg)
+            c_curr = self.angle_confidence_array(theta, fov_rad)
+        if use_obstacle_mask:
+            grid = self.grid if obstacle_grid is None else obstacle_grid
+            keep = grid[ys, xs] != Cell.OBSTACLE
+            ys, xs, c_curr = ys[keep], xs[keep], c_curr[keep]
+        if skip_points is not None and len(skip_points):
+            pts = np.asarray(skip_points, dtype=np.int64).reshape(-1, 2)
+            r = skip_radius_m / self.cell_size
+            d2 = (ys[:, None] - pts[None, :, 0]) ** 2 + (xs[:, None] - pts[None, :, 1]) ** 2
+            keep = ~np.any(d2 <= r * r, axis=1)  # same footprint as _disk_offsets
+            ys, xs, c_curr = ys[keep], xs[keep], c_curr[keep]
+        # signed bearing of every cell, same geometry as _fov_mask
+        angle = np.arctan2((xs + 0.5) - (self.curr_point.x + 0.5), (ys + 0.5) - (self.curr_point.y + 0.5))
+        signed = wrap_angle_array(angle - self.curr_point.yaw)
+        self._fuse_cells(ys, xs, c_curr, np.interp(signed, bearings, value_scores))
+        return None
+
+    # fuse point observations (e.g. detected objects) in one batch
+    # bearings: radians relative to the heading, clockwise positive
+    # ranges: metres from origin (default curr_point) along each bearing
+    # confs: trust in each point, default angle_confidence of its bearing
+    # every point covers the cells within radius_m of it; a cell covered by
+    # several points takes the highest scoring one, so it is fused once
+    # returns the (cy, cx) cell of each point, clipped points included
+    def update_value_points(self, bearings, ranges, scores, confs=None,
+                            origin: Optional[Pose2D] = None, radius_m: float = 0.0,
+                            fov_deg: float = 82.0, use_obstacle_mask: bool = False) -> np.ndarray:
+        bearings, ranges, scores = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(bearings, dtype=np.float64)),
+            np.atleast_1d(np.asarray(ranges, dtype=np.float64)),
+            np.atleast_1d(np.asarray(scores, dtype=np.float64)))
+        if confs is None:
+            confs = self.angle_confidence_array(bearings, math.radians(fov_deg))
+        confs = np.broadcast_to(np.asarray(confs, dtype=np.float64), bearings.shape)
+        p = origin if origin is not None else self.curr_point
+        angle = p.yaw + bearings
+        r = ranges / self.cell_size
+        cx = np.rint(p.x + r * np.sin(angle)).astype(np.int64)
+        cy = np.rint(p.y + r * np.cos(angle)).astype(np.int64)
+        points = np.stack([cy, cx], axis=1)
+        if cx.size == 0:
+            return points
+
+        oy, ox = self._disk_offsets(radius_m / self.cell_size)
+        ys = (cy[:, None] + oy[None, :]).ravel()
+        xs = (cx[:, None] + ox[None, :]).ravel()
+        point = np.repeat(np.arange(cx.size), oy.size)
+        keep = np.ones(ys.shape, dtype=bool)
+        if not self.growable:
+            keep &= (ys >= 0) & (ys < self.map_size_N) & (xs >= 0) & (xs < self.map_size_N)
+        if use_obstacle_mask:
+            keep[keep] = self.grid[ys[keep], xs[keep]] != Cell.OBSTACLE
+        ys, xs, point = ys[keep], xs[keep], point[keep]
+        if ys.size == 0:
+            return points
+
+        # highest score first, then the first entry of every cell wins
+        order = np.argsort(-scores[point], kind="stable")
+        ys, xs, point = ys[order], xs[order], point[order]
+        width = int(xs.max() - xs.min()) + 1
+        _, first = np.unique((ys - ys.min()) * width + (xs - xs.min()), return_index=True)
+        ys, xs, point = ys[first], xs[first], point[first]
+        self._fuse_cells(ys, xs, confs[point], scores[point])
+        return points
+
+    def _update_value_map_loop(self, value_score: float, pose: Pose2D, fov_deg: float = 82.0, 
                          max_range_m: int = 4, use_obstacle_mask:bool = True) -> None:
+        # reference per-cell implementation, kept for tests and benchmarks
         fov_rad = math.radians(fov_deg)
         half_fov = fov_rad / 2.0
         cx0 = int(pose.x * 0.01 / self.cell_size + int(self.curr_point.x) + 1e-9)
@@ -215,35 +708,81 @@ class ValueMap(OccupancyGrid):
                     self.conf[cy, cx] = c_new
         return None
     
-    def find_optimal_point(self, pose: Pose2D, max_range_m: int = 4, fov_deg: float = 82.0):
-        cx0 = int(pose.x * 0.01 / self.cell_size + int(self.curr_point.x) + 1e-9)
-        cy0 = int(pose.y * 0.01 / self.cell_size + int(self.curr_point.y) + 1e-9)
-        r_cells = math.ceil(max_range_m)
-        x_min = max(0, int(self.curr_point.x) - r_cells)
-        x_max = min(self.map_size_N - 1, int(self.curr_point.x) + r_cells)
-        y_min = max(0, int(self.curr_point.y) - r_cells)
-        y_max = min(self.map_size_N - 1, int(self.curr_point.y) + r_cells)
-
-        max_value = -1
+    def find_optimal_point(self, pose: Pose2D, max_range_m: int = 4, fov_deg: float = 82.0,
+                           use_stencil: bool = False):
+        if use_stencil:
+            ys, xs, _ = self._stencil_cells(max_range_m, fov_deg)
+        else:
+            ys, xs, _ = self._fov_cells(max_range_m, fov_deg)
         point = (self.center_offset, self.center_offset)
-        fov_rad = math.radians(fov_deg)
-        half_fov = fov_rad / 2
-        for cy in range(y_min, y_max+1):
-            for cx in range(x_min, x_max+1):
-                dx = (cx + 0.5) - (self.curr_point.x + 0.5)
-                dy = (cy + 0.5) - (self.curr_point.y + 0.5)
-                dist = math.hypot(dx, dy)
-                if dist > r_cells:
-                    continue
-                angle = math.atan2(dx, dy)  # North=0, East=90, South=180, West=270
-                theta = abs(wrap_angle_rad(angle - self.curr_point.yaw))
-                if theta > half_fov:
-                    continue
-                if self.value[cy, cx] > max_value:
-                    max_value = self.value[cy, cx]
-                    point = (cy, cx)
+        if ys.size == 0:
+            return point
+        values = self.value[ys, xs]
+        # argmax keeps the first maximum in row-major order, like the old cell scan
+        best = int(np.argmax(values))
+        if values[best] > -1:
+            point = (int(ys[best]), int(xs[best]))
         return point
 
+    # ranked candidate cells inside the FOV cone
+    # returns (coords, values, confs): coords is (k, 2) of (cy, cx), sorted by value (desc)
+    # skip_cells are looked up in skip_grid (default self.grid), e.g. the
+    # OccupancyGrid the drone's moves and scans are written to
+    # exclude: (cy, cx) cells never returned, e.g. the drone's own cell
+    def find_top_k_points(self, pose: Pose2D, k: int = 5, max_range_m: int = 4, fov_deg: float = 82.0,
+                          skip_cells: Sequence[Cell] = (), min_conf: float = 0.0,
+                          min_spacing: float = 0.0, use_stencil: bool = False,
+                          skip_grid=None, exclude: Sequence[Tuple[int, int]] = ()):
+        if use_stencil:
+            ys, xs, _ = self._stencil_cells(max_range_m, fov_deg)
+        else:
+            ys, xs, _ = self._fov_cells(max_range_m, fov_deg)
+        if skip_cells:
+            grid = self.grid if skip_grid is None else skip_grid
+            keep = ~np.isin(grid[ys, xs], np.asarray(skip_cells, dtype=np.int8))
+            ys, xs = ys[keep], xs[keep]
+        for cy, cx in exclude:
+            keep = (ys != cy) | (xs != cx)
+            ys, xs = ys[keep], xs[keep]
+        values = self.value[ys, xs]
+        confs = self.conf[ys, xs]
+        if min_conf > 0.0:
+            keep = confs >= min_conf
+            ys, xs, values, confs = ys[keep], xs[keep], values[keep], confs[keep]
+
+        m = values.size
+        if k <= 0 or m == 0:
+            idx = np.zeros(0, dtype=np.intp)
+        elif min_spacing <= 0.0:
+            idx = np.arange(m) if m <= k else np.argpartition(-values, k - 1)[:k]
+            idx = idx[np.argsort(-values[idx], kind="stable")]
+        else:
+            idx = self._spaced_top_k(ys, xs, values, k, min_spacing)
+        coords = np.stack([ys[idx], xs[idx]], axis=1)
+        return coords, values[idx], confs[idx]
+    # greedy best-first pick with a minimum distance (in cells) between picks
+    # starts from a small argpartition pool and only widens it when it runs dry
+    def _spaced_top_k(self, ys: np.ndarray, xs: np.ndarray, values: np.ndarray,
+                      k: int, min_spacing: float) -> np.ndarray:
+        m = values.size
+        pool_size = min(m, 8 * k)
+        min_sq = min_spacing * min_spacing
+        while True:
+            pool = np.arange(m) if pool_size >= m else np.argpartition(-values, pool_size - 1)[:pool_size]
+            pool = pool[np.argsort(-values[pool], kind="stable")]
+            picked = []
+            for i in pool:
+                if picked:
+                    d2 = (ys[picked] - ys[i]) ** 2 + (xs[picked] - xs[i]) ** 2
+                    if (d2 < min_sq).any():
+                        continue
+                picked.append(i)
+                if len(picked) == k:
+                    break
+            if len(picked) == k or pool_size >= m:
+                return np.asarray(picked, dtype=np.intp)
+            pool_size = min(m, pool_size * 4)
+
 def initialize_occup_map(width=50, height=50, cell_size=0.1):
     occup_map = OccupancyGrid(width, height, cell_size)
     return occup_map
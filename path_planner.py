@@ -0,0 +1,371 @@
+import math
+import heapq
+import logging
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from occupancy_map import OccupancyGrid, Cell, wrap_angle_rad
+from tello_wrapper import MOVEMENT_MIN, MOVEMENT_MAX
+
+# Incremental grid path planning (D* Lite) over an OccupancyGrid.
+#
+# Cells are (cx, cy) in map cell coordinates, like world_to_cells().
+# OBSTACLE cells are blocked, everything else (including UNKNOWN) is
+# traversable. The search runs from the goal towards the drone, so when the
+# drone moves or a few cells change only the affected part of the search is
+# repaired: call update_cells() with the changed cells, then plan() again.
+# That repair needs a fixed goal: a new goal re-roots the search and costs a
+# fresh (heuristic-guided) search from it. The obstacle window is kept across
+# goals, so a goal change never re-reads the map, as long as every change was
+# reported through update_cells()/update_region().
+#
+# Headings follow the ValueMap convention: North (+y) = 0, clockwise positive,
+# so turn_cw increases the yaw.
+
+# integer step costs (10 straight, 14 diagonal) keep the D* Lite keys exact;
+# with float costs rounding noise breaks key ties and stops repairs early
+INF = float("inf")
+STRAIGHT, DIAGONAL = 10, 14
+NEIGHBORS = [(1, 0, STRAIGHT), (-1, 0, STRAIGHT), (0, 1, STRAIGHT), (0, -1, STRAIGHT),
+             (1, 1, DIAGONAL), (1, -1, DIAGONAL), (-1, 1, DIAGONAL), (-1, -1, DIAGONAL)]
+
+Cell2D = Tuple[int, int]
+
+class DStarLitePlanner:
+    def __init__(self, om: OccupancyGrid, margin: int = 100, max_expansions: int = 2_000_000):
+        self.om = om
+        self.margin = margin  # search margin around start/goal on a growable map
+        self.max_expansions = max_expansions
+        self.goal: Optional[Cell2D] = None
+        self.start: Optional[Cell2D] = None
+        self.expansions = 0   # nodes expanded by the last plan()
+        self.window_builds = 0  # times the obstacle window was read from the map
+        self._reset()
+
+    # ------------------------------------------------------------------
+    # public API
+    def plan(self, start: Cell2D, goal: Cell2D) -> Optional[List[Cell2D]]:
+        # shortest 8-connected path start -> goal (both included), None if unreachable
+        start, goal = (int(start[0]), int(start[1])), (int(goal[0]), int(goal[1]))
+        if goal != self.goal or not self._inside(start):
+            if not (self._blocked and self._inside(start) and self._inside(goal)):
+                self._set_window(start, goal)
+                self.window_builds += 1
+            self._reset_search()
+            self.goal = goal
+            self.start = start
+            self._s_start = self._s_last = self._index(start)
+            self._s_goal = self._index(goal)
+            self._rhs[self._s_goal] = 0
+            self._push(self._s_goal)
+        elif start != self.start:
+            s = self._index(start)
+            self._km += self._h(self._s_last, s)
+            self._s_start = self._s_last = s
+            self.start = start
+        if self._blocked[self._s_start] or self._blocked[self._s_goal]:
+            return None
+        self.expansions = 0
+        self._compute()
+        return self._extract_path()
+
+    def update_cells(self, cells: Iterable[Cell2D]) -> None:
+        # report cells whose occupancy changed since the last plan()
+        if self.goal is None:
+            return
+        grid = self.om.grid
+        touched = set()
+        for cx, cy in cells:
+            if not self._inside((cx, cy)):
+                continue
+            s = self._index((cx, cy))
+            self._blocked[s] = int(grid[cy, cx] == Cell.OBSTACLE)
+            touched.add(s)
+            for d, _, _ in self._nbrs:
+                touched.add(s + d)
+        for s in touched:
+            if not self._border(s):
+                self._update_vertex(s)
+
+    def update_region(self, y_min: int, y_max: int, x_min: int, x_max: int) -> None:
+        # update_cells for a changed box of the map (a ChangeSet box), only
+        # passing the cells whose blocked state actually flipped
+        if self.goal is None:
+            return
+        bx_min, bx_max, by_min, by_max = self._bounds
+        y0, y1 = max(y_min, by_min), min(y_max, by_max)
+        x0, x1 = max(x_min, bx_min), min(x_max, bx_max)
+        if y0 > y1 or x0 > x1:
+            return
+        blocked = np.frombuffer(self._blocked, dtype=np.uint8).reshape(self._H, self._W)
+        old = blocked[y0 - by_min + 1:y1 - by_min + 2, x0 - bx_min + 1:x1 - bx_min + 2] != 0
+        new = self.om.grid[y0:y1 + 1, x0:x1 + 1] == Cell.OBSTACLE
+        iy, ix = np.nonzero(old != new)
+        if iy.size:
+            self.update_cells(zip((ix + x0).tolist(), (iy + y0).tolist()))
+
+    # ------------------------------------------------------------------
+    # D* Lite internals
+    # nodes are flat indices into a window of the map with a one-cell blocked
+    # border, so neighbour lookups need no bounds checks
+    def _reset(self) -> None:
+        self._blocked = bytearray()
+        self._bounds = (0, -1, 0, -1)
+        self._reset_search()
+
+    def _reset_search(self) -> None:
+        self._g: Dict[int, float] = {}
+        self._rhs: Dict[int, float] = {}
+        self._open: Dict[int, Tuple[float, float]] = {}
+        self._heap: List[Tuple[Tuple[float, float], int]] = []
+        self._km = 0
+        self.goal = None
+
+    def _set_window(self, start: Cell2D, goal: Cell2D) -> None:
+        if self.om.growable:
+            m = self.margin
+            x_min, x_max = min(start[0], goal[0]) - m, max(start[0], goal[0]) + m
+            y_min, y_max = min(start[1], goal[1]) - m, max(start[1], goal[1]) + m
+        else:
+            x_min, x_max, y_min, y_max = 0, self.om.map_size_N - 1, 0, self.om.map_size_N - 1
+        self._bounds = (x_min, x_max, y_min, y_max)
+        W = x_max - x_min + 3
+        H = y_max - y_min + 3
+        blocked = np.ones((H, W), dtype=np.uint8)
+        window = self.om.grid[y_min:y_max + 1, x_min:x_max + 1]
+        blocked[1:-1, 1:-1] = window == Cell.OBSTACLE
+        self._blocked = bytearray(blocked.tobytes())
+        self._W, self._H = W, H
+        # (index offset, dx, dy) and the two cells a diagonal move cuts past
+        self._nbrs = [(dy * W + dx, dx, dy) for dx, dy, _ in NEIGHBORS]
+        self._moves = [(dy * W + dx, step, dx if dy else 0, dy * W if dx else 0)
+                       for dx, dy, step in NEIGHBORS]
+
+    def _inside(self, u: Cell2D) -> bool:
+        x_min, x_max, y_min, y_max = self._bounds
+        return x_min <= u[0] <= x_max and y_min <= u[1] <= y_max
+
+    def _border(self, s: int) -> bool:
+        y, x = divmod(s, self._W)
+        return x == 0 or y == 0 or x == self._W - 1 or y == self._H - 1
+
+    def _index(self, u: Cell2D) -> int:
+        return (u[1] - self._bounds[2] + 1) * self._W + (u[0] - self._bounds[0] + 1)
+
+    def _cell(self, s: int) -> Cell2D:
+        y, x = divmod(s, self._W)
+        return (x + self._bounds[0] - 1, y + self._bounds[2] - 1)
+
+    def _h(self, a: int, b: int) -> float:
+        # octile distance, consistent with the 8-connected costs
+        ay, ax = divmod(a, self._W)
+        by, bx = divmod(b, self._W)
+        dx, dy = abs(ax - bx), abs(ay - by)
+        return STRAIGHT * max(dx, dy) + (DIAGONAL - STRAIGHT) * min(dx, dy)
+
+    def _cost(self, s: int, move) -> float:
+        d, step, cx, cy = move
+        blocked = self._blocked
+        if blocked[s] or blocked[s + d]:
+            return INF
+        # no corner cutting past an obstacle on a diagonal move
+        if cx and (blocked[s + cx] or blocked[s + cy]):
+            return INF
+        return step
+
+    def _key(self, s: int) -> Tuple[float, float]:
+        m = min(self._g.get(s, INF), self._rhs.get(s, INF))
+        return (m + self._h(self._s_start, s) + self._km, m)
+
+    def _push(self, s: int) -> None:
+        k = self._key(s)
+        self._open[s] = k
+        heapq.heappush(self._heap, (k, s))
+
+    def _top(self):
+        # drop heap entries that were superseded or removed (lazy deletion)
+        heap = self._heap
+        while heap and self._open.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _update_vertex(self, s: int) -> None:
+        if s != self._s_goal:
+            best = INF
+            g = self._g
+            blocked = self._blocked
+            if not blocked[s]:
+                for d, step, cx, cy in self._moves:
+                    gs = g.get(s + d, INF)
+                    if gs + step < best and not blocked[s + d] \
+                            and not (cx and (blocked[s + cx] or blocked[s + cy])):
+                        best = gs + step
+            self._rhs[s] = best
+        if self._g.get(s, INF) != self._rhs.get(s, INF):
+            self._push(s)
+        else:
+            self._open.pop(s, None)
+
+    def _compute(self) -> None:
+        g, rhs = self._g, self._rhs
+        blocked = self._blocked
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            k_old, u = top
+            s_start = self._s_start
+            if not (k_old < self._key(s_start) or rhs.get(s_start, INF) != g.get(s_start, INF)):
+                break
+            self.expansions += 1
+            if self.expansions > self.max_expansions:
+                logging.warning("path planner: expansion limit reached")
+                break
+            k_new = self._key(u)
+            if k_old < k_new:
+                self._push(u)
+                continue
+            heapq.heappop(self._heap)
+            del self._open[u]
+            if g.get(u, INF) > rhs.get(u, INF):
+                g[u] = rhs[u]
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+            for d, _, _ in self._nbrs:
+                if not blocked[u + d]:
+                    self._update_vertex(u + d)
+
+    def _extract_path(self) -> Optional[List[Cell2D]]:
+        g = self._g
+        s = self._s_start
+        if g.get(s, INF) == INF:
+            return None
+        path = [s]
+        limit = 4 * (self._W + self._H)
+        while s != self._s_goal:
+            best, nxt = INF, None
+            for move in self._moves:
+                c = self._cost(s, move) + g.get(s + move[0], INF)
+                if c < best:
+                    best, nxt = c, s + move[0]
+            if nxt is None or len(path) > limit:
+                return None
+            path.append(nxt)
+            s = nxt
+        return [self._cell(s) for s in path]
+
+# ----------------------------------------------------------------------
+# path -> drone commands
+
+def _line_cells(a: Cell2D, b: Cell2D) -> List[Cell2D]:
+    # every cell the segment between the centres of a and b passes through
+    # (supercover); where it crosses exactly at a cell corner both side cells
+    # are included, like the planner's no-corner-cutting rule
+    x, y = a
+    nx, ny = abs(b[0] - a[0]), abs(b[1] - a[1])
+    sx, sy = (1 if b[0] > a[0] else -1), (1 if b[1] > a[1] else -1)
+    cells = [(x, y)]
+    ix = iy = 0
+    while ix < nx or iy < ny:
+        # which cell border comes first: (ix + 0.5) / nx vs (iy + 0.5) / ny
+        d = (1 + 2 * ix) * ny - (1 + 2 * iy) * nx
+        if d == 0:
+            cells.append((x + sx, y))
+            cells.append((x, y + sy))
+            x, y, ix, iy = x + sx, y + sy, ix + 1, iy + 1
+        elif d < 0:
+            x, ix = x + sx, ix + 1
+        else:
+            y, iy = y + sy, iy + 1
+        cells.append((x, y))
+    return cells
+
+def line_is_free(om: OccupancyGrid, a: Cell2D, b: Cell2D) -> bool:
+    # True if the straight segment a -> b crosses no OBSTACLE cell
+    grid = om.grid
+    for cx, cy in _line_cells(a, b):
+        if not om.in_bounds(cx, cy) or grid[cy, cx] == Cell.OBSTACLE:
+            return False
+    return True
+
+def simplify_path(om: OccupancyGrid, path: List[Cell2D]) -> List[Cell2D]:
+    # keep only the waypoints needed to fly straight legs around obstacles
+    if len(path) <= 2:
+        return list(path)
+    out = [path[0]]
+    i = 0
+    while i < len(path) - 1:
+        j = i + 1
+        # extend the leg as far as the line of sight allows
+        while j + 1 < len(path) and line_is_free(om, path[i], path[j + 1]):
+            j += 1
+        out.append(path[j])
+        i = j
+    return out
+
+def _split_distance(dist_cm: int) -> List[int]:
+    # equal chunks no longer than MOVEMENT_MAX; a distance of at least
+    # MOVEMENT_MIN keeps every chunk at or above it (MOVEMENT_MAX >= 2 * MOVEMENT_MIN)
+    if dist_cm <= 0:
+        return []
+    k = -(-dist_cm // MOVEMENT_MAX)
+    base, extra = divmod(dist_cm, k)
+    return [base + 1 if i < extra else base for i in range(k)]
+
+def path_to_commands(path: List[Cell2D], yaw: float, cell_size: float,
+                     allow_strafe: bool = True, om: Optional[OccupancyGrid] = None) -> List[Tuple[str, int]]:
+    # waypoints -> [(command, value)] for TelloWrapper (cm / degrees)
+    # with allow_strafe a leg at exactly +-90/180 deg is flown sideways/backwards
+    # instead of turning first
+    # The drone cannot fly less than MOVEMENT_MIN: a shorter leg is dropped and
+    # the next leg starts from where the drone actually is. With om a waypoint
+    # is only dropped when the line past it is free; otherwise the leg is
+    # stretched to MOVEMENT_MIN if that is free, or the commands stop there
+    # (the caller replans from the new pose).
+    commands: List[Tuple[str, int]] = []
+    if not path:
+        return commands
+    x, y = float(path[0][0]), float(path[0][1])
+    for k in range(1, len(path)):
+        bx, by = path[k]
+        dx, dy = bx - x, by - y
+        dist_cm = int(round(math.hypot(dx, dy) * cell_size * 100))
+        if dist_cm <= 0:
+            continue
+        if dist_cm < MOVEMENT_MIN:
+            here = (int(round(x)), int(round(y)))
+            if k + 1 == len(path) or om is None or line_is_free(om, here, path[k + 1]):
+                continue  # carried into the next leg; the goal is within MOVEMENT_MIN
+            scale = MOVEMENT_MIN / (math.hypot(dx, dy) * cell_size * 100)
+            dx, dy = dx * scale, dy * scale
+            if not line_is_free(om, here, (int(round(x + dx)), int(round(y + dy)))):
+                break
+            dist_cm = MOVEMENT_MIN
+        heading = math.atan2(dx, dy)
+        turn = int(round(math.degrees(wrap_angle_rad(heading - yaw))))
+        move = "move_forward"
+        if allow_strafe and turn in (90, -90, 180, -180):
+            move = {90: "move_right", -90: "move_left", 180: "move_backward", -180: "move_backward"}[turn]
+        elif turn != 0:
+            commands.append(("turn_cw", turn) if turn > 0 else ("turn_ccw", -turn))
+            yaw = wrap_angle_rad(yaw + math.radians(turn))
+        for d in _split_distance(dist_cm):
+            # merge with the previous move in the same direction when it fits
+            if commands and commands[-1][0] == move and commands[-1][1] + d <= MOVEMENT_MAX:
+                commands[-1] = (move, commands[-1][1] + d)
+            else:
+                commands.append((move, d))
+        x, y = x + dx, y + dy
+    return commands
+
+def plan_commands(planner: DStarLitePlanner, goal: Cell2D,
+                  allow_strafe: bool = True) -> Optional[List[Tuple[str, int]]]:
+    # plan from the drone's current cell to goal and compress into commands
+    om = planner.om
+    cp = om.curr_point
+    start = (int(round(cp.x)), int(round(cp.y)))
+    path = planner.plan(start, goal)
+    if path is None:
+        return None
+    return path_to_commands(simplify_path(om, path), cp.yaw, om.cell_size, allow_strafe, om)
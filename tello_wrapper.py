@@ -1,6 +1,7 @@
 import time, cv2
+import threading
 import numpy as np
-from typing import Tuple
+from typing import Tuple, Optional
 from djitellopy import Tello
 
 #from .abs.robot_wrapper import RobotWrapper -> will need if multiple drones used
@@ -45,18 +46,173 @@ def sharpen_image(img):
     sharpened = cv2.filter2D(img, -1, kernel)
     return sharpened
 
+# adjust_exposure + sharpen_image as one reusable pipeline
+# The contrast/brightness step is a 256-entry lookup table (built by running
+# convertScaleAbs on every pixel value once, so results match bit for bit),
+# the kernel is built once and every stage writes
+# into buffers that are kept between calls. scale < 1 downsizes the frame first.
+# The returned image is the pipeline's own buffer: it is overwritten by the next
+# call from the same thread, pass out= (or copy) to keep it.
+class Preprocessor:
+    SHARPEN_KERNEL = np.array([[0, -1, 0],
+                               [-1, 5, -1],
+                               [0, -1, 0]], dtype=np.float32)
+
+    def __init__(self, alpha: float = 1.3, beta: float = -30, sharpen: bool = True,
+                 scale: float = 1.0, interpolation: int = cv2.INTER_AREA):
+        self.alpha = alpha
+        self.beta = beta
+        self.sharpen = sharpen
+        self.scale = scale
+        self.interpolation = interpolation
+        self.lut = self.exposure_lut(alpha, beta)
+        # scratch buffers per thread: the capture thread and a .frame read on
+        # the caller's thread may run the same Preprocessor at once
+        self._local = threading.local()
+
+    @staticmethod
+    def exposure_lut(alpha: float, beta: float) -> np.ndarray:
+        return cv2.convertScaleAbs(np.arange(256, dtype=np.uint8), alpha=alpha, beta=beta).reshape(256)
+
+    def output_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        if self.scale == 1.0:
+            return tuple(shape)
+        h, w = shape[:2]
+        return (max(1, int(round(h * self.scale))), max(1, int(round(w * self.scale)))) + tuple(shape[2:])
+
+    def _buffer(self, name: str, shape, dtype=np.uint8) -> np.ndarray:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=dtype)
+            buffers[name] = buf
+        return buf
+
+    def __call__(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        shape = self.output_shape(frame.shape)
+        if out is None:
+            out = self._buffer("out", shape)
+        src = frame
+        if self.scale != 1.0:
+            src = self._buffer("small", shape)
+            cv2.resize(frame, (shape[1], shape[0]), dst=src, interpolation=self.interpolation)
+        if not self.sharpen:
+            cv2.LUT(src, self.lut, dst=out)
+            return out
+        exposed = self._buffer("exposed", shape)
+        cv2.LUT(src, self.lut, dst=exposed)
+        cv2.filter2D(exposed, -1, self.SHARPEN_KERNEL, dst=out)
+        return out
+
 # Tello 원본 카메라 영상 → 보기 좋게 강화된 영상
+# background=False: every read of .frame processes the current raw frame
+# background=True: a capture thread processes each new raw frame once into a
+# ring of preallocated buffers; .frame / latest() return the newest buffer
+# without copying or waiting. A returned array stays valid until buffer_size-1
+# newer frames were captured, copy it to keep it longer.
 class FrameReader:
-    def __init__(self, fr):
+    def __init__(self, fr, background: bool = False, buffer_size: int = 4,
+                 alpha: float = 1.3, beta: float = -30, poll_interval: float = 0.005,
+                 preprocessor: Optional[Preprocessor] = None):
         # Initialize the video capture
         self.fr = fr
+        self.alpha = alpha
+        self.beta = beta
+        self.preprocessor = preprocessor or Preprocessor(alpha=alpha, beta=beta)
+        self.background = background
+        self.buffer_size = max(2, buffer_size)
+        self.poll_interval = poll_interval
+        # counters (background mode)
+        self.captured = 0     # raw frames processed into the ring
+        self.dropped = 0      # frames overwritten as latest before anyone read them
+        self.duplicates = 0   # reads that returned a frame id that was already read
+        self._slots = []
+        self._stamps = [0.0] * self.buffer_size
+        self._latest = None   # (frame_id, timestamp, slot index), swapped atomically
+        self._last_read_id = 0
+        self._stop = threading.Event()
+        self._thread = None
+        if background:
+            self.start()
 
     @property
     def frame(self):
-        # Read a frame from the video capture
-        frame = self.fr.frame
-        frame = adjust_exposure(frame, alpha=1.3, beta=-30)
-        return sharpen_image(frame)
+        if not self.background:
+            # Read a frame from the video capture
+            frame = self.fr.frame
+            return self._process_new(frame)
+        latest = self.latest()
+        if latest is None:
+            # nothing captured yet: process the current raw frame once here
+            frame = self.fr.frame
+            return None if frame is None else self._process_new(frame)
+        return latest[2]
+
+    # processed copy the caller owns
+    def _process_new(self, frame: np.ndarray) -> np.ndarray:
+        pre = self.preprocessor
+        return pre(frame, out=np.empty(pre.output_shape(frame.shape), dtype=np.uint8))
+
+    # (frame_id, timestamp, frame) of the newest processed frame, None before the first one
+    def latest(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        latest = self._latest
+        if latest is None:
+            return None
+        frame_id, ts, i = latest
+        if frame_id == self._last_read_id:
+            self.duplicates += 1
+        self._last_read_id = frame_id
+        return frame_id, ts, self._slots[i]
+
+    # id of the newest processed frame without reading it (not counted as a
+    # duplicate), None before the first one
+    def latest_id(self) -> Optional[int]:
+        latest = self._latest
+        return None if latest is None else latest[0]
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.background = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._capture_loop, name="FrameReader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _capture_loop(self) -> None:
+        last_raw = None
+        frame_id = 0
+        while not self._stop.is_set():
+            raw = self.fr.frame
+            # djitellopy replaces the array on every decoded frame
+            if raw is None or raw is last_raw:
+                self._stop.wait(self.poll_interval)
+                continue
+            last_raw = raw
+            frame_id += 1
+            slot = self._process_into_slot(raw, frame_id)
+            prev = self._latest
+            if prev is not None and prev[0] != self._last_read_id:
+                self.dropped += 1
+            self._latest = (frame_id, self._stamps[slot], slot)
+            self.captured += 1
+
+    def _process_into_slot(self, raw: np.ndarray, frame_id: int) -> int:
+        shape = self.preprocessor.output_shape(raw.shape)
+        if not self._slots or self._slots[0].shape != shape:
+            # (re)allocate when the stream resolution changes
+            self._slots = [np.empty(shape, dtype=np.uint8) for _ in range(self.buffer_size)]
+        slot = frame_id % self.buffer_size
+        self.preprocessor(raw, out=self._slots[slot])
+        self._stamps[slot] = time.time()
+        return slot
 
 # 드론 거리 범위내로 유지
 def cap_distance(distance):
@@ -72,6 +228,7 @@ class TelloWrapper():
         self.drone = Tello()
         self.active_count = 0
         self.stream_on = False
+        self.frame_reader = None
     '''
     keep_active() 가 여러 번 호출될 때, 
     20번에 한 번만 실제로 "command" 를 보내겠다는 뜻.   
@@ -100,12 +257,20 @@ class TelloWrapper():
 
     def stop_stream(self):
         self.stream_on = False
+        if self.frame_reader is not None:
+            self.frame_reader.stop()
+            self.frame_reader = None
         self.drone.streamoff()
     
-    def get_frame_reader(self):
+    # background=True shares one capturing FrameReader between all callers
+    def get_frame_reader(self, background: bool = False):
         if not self.stream_on:
             return None
-        return FrameReader(self.drone.get_frame_read())
+        if not background:
+            return FrameReader(self.drone.get_frame_read())
+        if self.frame_reader is None:
+            self.frame_reader = FrameReader(self.drone.get_frame_read(), background=True)
+        return self.frame_reader
 
     def move_forward(self, distance: int) -> Tuple[bool, bool]:
         self.drone.move_forward(cap_distance(distance))
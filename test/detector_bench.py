@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: detector backends (latency percentiles and throughput)
+local OpenCV DNN with the preallocated blob vs blobFromImage per frame, and
+the hybrid mode against a remote stub with Cloud Vision-like latency
+"""
+import sys
+import os
+import time
+import numpy as np
+import cv2
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Scorer.detector_backends import OpenCVDNNBackend, HybridBackend
+from test_detector_backends import tiny_ssd_onnx, StubRemote, DETS, LABELS
+
+FRAME_SHAPE = (720, 960, 3)
+REPEAT = 100
+REMOTE_LATENCY_S = 0.15
+
+def measure(fn, frames):
+    fn(frames[0])  # warm up
+    lat = []
+    t0 = time.perf_counter()
+    for f in frames:
+        t = time.perf_counter()
+        fn(f)
+        lat.append(time.perf_counter() - t)
+    total = time.perf_counter() - t0
+    lat = np.array(lat) * 1e3
+    return np.percentile(lat, 50), np.percentile(lat, 95), len(frames) / total
+
+def row(name, stats):
+    p50, p95, fps = stats
+    print(f"{name:>40} {p50:9.2f} {p95:9.2f} {fps:9.1f}")
+
+def run_benchmark():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8) for _ in range(REPEAT)]
+    print(f"{'backend':>40} {'p50 ms':>9} {'p95 ms':>9} {'frames/s':>9}")
+    for size in ((300, 300), (416, 416)):
+        model = tiny_ssd_onnx(DETS, size=size)
+        backend = OpenCVDNNBackend(model, input_size=size, labels=LABELS)
+        net = cv2.dnn.readNetFromONNX(np.frombuffer(model, dtype=np.uint8))
+        def per_frame_blob(img):
+            net.setInput(cv2.dnn.blobFromImage(img, 1 / 127.5, size, (127.5, 127.5, 127.5), swapRB=True))
+            return net.forward()
+        row(f"blobFromImage + forward {size[0]}x{size[1]}", measure(per_frame_blob, frames))
+        row(f"OpenCVDNNBackend {size[0]}x{size[1]}", measure(backend.detect, frames))
+        row(f"  prepare() only {size[0]}x{size[1]}", measure(backend.prepare, frames))
+
+    # remote-only vs hybrid, the remote stub sleeps like a Cloud Vision round-trip
+    few = frames[:20]
+    remote = StubRemote([[0.5, 0.5, 0.9, 0.9]], latency=REMOTE_LATENCY_S)
+    row(f"remote only ({REMOTE_LATENCY_S * 1e3:.0f} ms stub)", measure(remote.detect, few))
+    sure = OpenCVDNNBackend(tiny_ssd_onnx(DETS[:1]), labels=LABELS)
+    unsure = OpenCVDNNBackend(tiny_ssd_onnx(DETS), labels=LABELS)
+    hybrid = HybridBackend(sure, remote)
+    row("hybrid, confident frames", measure(hybrid.detect, frames))
+    hybrid = HybridBackend(unsure, remote, min_interval_s=0.5)
+    row("hybrid, unsure frames, 1 confirm/0.5 s", measure(hybrid.detect, few))
+    print(f"hybrid remote calls: {hybrid.stats()}")
+
+if __name__ == "__main__":
+    run_benchmark()
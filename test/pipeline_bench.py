@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: decision latency of the control loops against stub drones and
+stub perception (serial vs pipelined MovementPipeline, AsyncMovementPipeline,
+the 360 deg survey) and the cost of a background FrameReader read
+"""
+import sys
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GENAI_API_KEY", "test-key")
+from drone_controller import MovementPipeline, Selector, predict_movement
+from async_runtime import AsyncTello, AsyncMovementPipeline
+from tello_wrapper import FrameReader
+import test_predict_pipeline as sync_stubs
+import test_async_runtime as async_stubs
+import test_observe_pipeline as survey_stubs
+from test_frame_reader import FakeFrameRead
+
+DECISIONS = 6
+
+def sync_decision(pipelined):
+    executor = ThreadPoolExecutor(max_workers=2)
+    om, vm = sync_stubs.make_maps()
+    scorer = sync_stubs.StubScorer(executor)
+    scorer.decisions.max_distance = -1  # every frame is a new view
+    tello = sync_stubs.StubTello()
+    pipeline = MovementPipeline(tello, om, vm, scorer, Selector()) if pipelined else None
+    t0 = time.perf_counter()
+    for _ in range(DECISIONS):
+        if pipeline is not None:
+            pipeline.step()
+        else:
+            predict_movement(tello, om, vm, scorer, Selector())
+    dt = (time.perf_counter() - t0) / DECISIONS
+    executor.shutdown(wait=True)
+    return dt
+
+async def async_decision():
+    om, vm = async_stubs.make_maps()
+    pipeline = AsyncMovementPipeline(AsyncTello(async_stubs.StubTello()), om, vm,
+                                     async_stubs.StubScorer(), Selector())
+    t0 = time.perf_counter()
+    for _ in range(DECISIONS):
+        await pipeline.step()
+    return (time.perf_counter() - t0) / DECISIONS
+
+async def concurrent_llm_calls(n=200):
+    scorer = async_stubs.StubScorer()
+    tello = AsyncTello(async_stubs.StubTello())
+    frames = [await tello.frame() for _ in range(n)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(scorer._call_llm_api_async(f, "nav") for f in frames))
+    return time.perf_counter() - t0
+
+def survey(pipelined):
+    t0 = time.perf_counter()
+    survey_stubs.run_survey(pipelined=pipelined)
+    return time.perf_counter() - t0
+
+def frame_read(n=10000):
+    src = FakeFrameRead(fps=30.0)
+    fr = FrameReader(src, background=True)
+    time.sleep(0.2)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fr.frame
+    dt = (time.perf_counter() - t0) / n
+    fr.stop()
+    src.stop()
+    return dt
+
+def run_benchmark():
+    move, llm = sync_stubs.MOVE_S, sync_stubs.LLM_S
+    print(f"stub move {move * 1e3:.0f} ms, detection {sync_stubs.DETECT_S * 1e3:.0f} ms, LLM {llm * 1e3:.0f} ms")
+    serial, pipelined = sync_decision(False), sync_decision(True)
+    print(f"MovementPipeline per decision: serial {serial * 1e3:.0f} ms, pipelined {pipelined * 1e3:.0f} ms "
+          f"({pipelined / serial:.2f}x)")
+    print(f"AsyncMovementPipeline per decision: {asyncio.run(async_decision()) * 1e3:.0f} ms")
+    print(f"200 concurrent async LLM calls: {asyncio.run(concurrent_llm_calls()) * 1e3:.0f} ms")
+    rotation = 4 * survey_stubs.TURN_S
+    print(f"survey (rotation {rotation * 1e3:.0f} ms): sequential {survey(False) * 1e3:.0f} ms, "
+          f"pipelined {survey(True) * 1e3:.0f} ms")
+    print(f"background FrameReader read: {frame_read() * 1e6:.2f} us")
+
+if __name__ == "__main__":
+    run_benchmark()
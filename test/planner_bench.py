@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmark: D* Lite repair after small map changes vs planning from scratch
+(1000 x 1000 map, wall across the straight line to the goal)
+"""
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, Cell
+from path_planner import DStarLitePlanner
+
+def run_benchmark():
+    om = OccupancyGrid(50, 50, 0.1)
+    c = om.center_offset
+    goal = (c, c + 60)
+    om.grid[c + 20, c - 30:c + 30] = Cell.OBSTACLE
+    planner = DStarLitePlanner(om)
+    t0 = time.perf_counter()
+    path = planner.plan((c, c), goal)
+    print(f"initial plan on {om.map_size_N}^2: {(time.perf_counter() - t0) * 1e3:.2f} ms, "
+          f"{planner.expansions} expansions")
+    print(f"{'step':>4} {'repair(ms)':>11} {'expanded':>9} {'scratch(ms)':>12}")
+    for k in (10, 20, 30):
+        x, y = path[k + 10]
+        om.grid[y, x - 1:x + 2] = Cell.OBSTACLE
+        t0 = time.perf_counter()
+        planner.update_cells([(x - 1, y), (x, y), (x + 1, y)])
+        path = planner.plan(path[k], goal)
+        t_repair = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        DStarLitePlanner(om).plan(path[0], goal)
+        t_scratch = time.perf_counter() - t0
+        print(f"{k:4d} {t_repair * 1e3:11.2f} {planner.expansions:9d} {t_scratch * 1e3:12.2f}")
+
+if __name__ == "__main__":
+    run_benchmark()
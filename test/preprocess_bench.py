@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Preprocessor pipeline vs adjust_exposure + sharpen_image
+(per-frame time and memory allocated per frame, measured with tracemalloc)
+"""
+import sys
+import os
+import time
+import tracemalloc
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tello_wrapper import Preprocessor, adjust_exposure, sharpen_image
+
+FRAME_SHAPE = (720, 960, 3)
+REPEAT = 50
+
+def current_functions(frame):
+    return sharpen_image(adjust_exposure(frame, alpha=1.3, beta=-30))
+
+def measure(fn, frames):
+    fn(frames[0])  # warm up (buffers, kernels)
+    t0 = time.perf_counter()
+    for f in frames:
+        fn(f)
+    dt = (time.perf_counter() - t0) / len(frames)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    for f in frames[:10]:
+        fn(f)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt, peak - before
+
+def run_benchmark():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8) for _ in range(REPEAT)]
+    rows = [("adjust_exposure+sharpen_image", current_functions)]
+    for scale in (1.0, 0.5):
+        rows.append((f"Preprocessor(scale={scale})", Preprocessor(scale=scale)))
+    rows.append(("Preprocessor(sharpen=False)", Preprocessor(sharpen=False)))
+    print(f"{'pipeline':>32} {'ms/frame':>9} {'alloc peak (KB)':>16}")
+    for name, fn in rows:
+        dt, alloc = measure(fn, frames)
+        print(f"{name:>32} {dt * 1e3:9.3f} {alloc / 1024:16.1f}")
+    equal = np.array_equal(Preprocessor()(frames[0]), current_functions(frames[0]))
+    print(f"full-resolution output identical to the current functions: {equal}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,11 +1,15 @@
-import time, cv2, os
+import time, cv2, os, sys
 from threading import Thread
 from djitellopy import Tello
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frame import FrameArchiver
+
 # path info
 save_vid_path = "/Users/kiwi8/Desktop/FALL QUARTER 2025/Research (AICPS)"
 os.makedirs(save_vid_path, exist_ok=True)
 save_file = os.path.join(save_vid_path, "video.mp4")
+archiver = FrameArchiver(fmt=".png")  # pictures are written off the flight thread
 
 # connect to Tello
 tello = Tello()
@@ -25,8 +29,8 @@ def take_pic(frame_read=None):
     else:
         # RGB -> BGR
         frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        cv2.imwrite(pic_path, frame_bgr)
-        print("Picture saved to:", pic_path)
+        archiver.submit(frame_bgr, pic_path)
+        print("Picture queued for:", pic_path)
 
 def videoRecorder():
     # recording to ./video.avi
@@ -77,6 +81,7 @@ if battery >= 40 and option == 'y':
     finally:
         keepRecording = False
         recorder.join()
+        archiver.close()
         frame_read.stop()
         tello.streamoff()
         tello.end()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test file for the asyncio agent runtime (async_runtime.py)
+(stub drone and stub async perception, no network)
+"""
+import sys
+import os
+import time
+import asyncio
+import threading
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GENAI_API_KEY", "test-key")
+from async_runtime import AsyncTello, AsyncMovementPipeline, run
+from drone_controller import Scorer, Selector
+from occupancy_map import OccupancyGrid, ValueMap
+from frame import Frame, default_archiver
+from Scorer.detector_backends import DetectorBackend
+
+MOVE_S = 0.2
+DETECT_S = 0.1
+LLM_S = 0.2
+
+class StubReader:
+    background = True
+    def __init__(self):
+        self.n = 0
+    def latest(self):
+        self.n += 1
+        return self.n, time.time(), np.full((90, 120, 3), self.n % 256, dtype=np.uint8)
+
+class StubTello:
+    """Blocking command path like TelloWrapper, records overlap between commands"""
+    def __init__(self, battery_cycles=1000, fail_at=None):
+        self.reader = StubReader()
+        self.log = []
+        self.intervals = []  # (name, start, end) of each command
+        self.active = 0
+        self.max_active = 0
+        self.battery_cycles = battery_cycles
+        self.fail_at = fail_at
+        self.landed = False
+    def _run(self, name, seconds=0.0):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        t0 = time.perf_counter()
+        time.sleep(seconds)
+        self.log.append(name)
+        self.intervals.append((name, t0, time.perf_counter()))
+        self.active -= 1
+    def connect(self): self._run("connect")
+    def start_stream(self): self._run("start_stream")
+    def stop_stream(self): self._run("stop_stream")
+    def takeoff(self):
+        self._run("takeoff")
+        return True
+    def land(self):
+        self._run("land")
+        self.landed = True
+    def is_battery_good(self):
+        self.battery_cycles -= 1
+        return self.battery_cycles >= 0
+    def get_frame_reader(self, background=False):
+        return self.reader
+    def __getattr__(self, name):
+        if name.startswith(("move_", "turn_")):
+            def command(value):
+                if self.fail_at is not None and self.log.count("move") == self.fail_at:
+                    raise RuntimeError("no response from drone")
+                self._run("move", MOVE_S)
+                return True, False
+            return command
+        raise AttributeError(name)
+
+class StubScorer(Scorer):
+    def __init__(self, llm_s=LLM_S):
+        super().__init__()
+        self.llm_s = llm_s
+        self.decisions.max_distance = -1  # every frame is a new view
+        self.applied = []
+        self.cancelled = 0
+        self.llm_intervals = {}  # frame id -> (start, end) of each finished LLM call
+    async def detect_objects_async(self, frame):
+        await asyncio.sleep(DETECT_S)
+        return [{"object": "person", "frame": frame.frame_id}]
+    async def _request_llm_async(self, frame, instruction):
+        t0 = time.perf_counter()
+        try:
+            await asyncio.sleep(self.llm_s)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.llm_intervals[frame.frame_id] = (t0, time.perf_counter())
+        return [{"object": "umbrella", "frame": frame.frame_id}]
+    def measure_coordinate_and_store(self, detections):
+        self.applied.append(detections[0]["frame"])
+
+def overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+def make_maps():
+    om = OccupancyGrid(50, 50, 0.1)
+    return om, ValueMap.from_occupancy(om)
+
+def test_many_requests_one_thread():
+    """Hundreds of model calls in flight without a thread per request"""
+    async def main():
+        scorer = StubScorer()
+        tello = AsyncTello(StubTello())
+        frames = [await tello.frame() for _ in range(200)]
+        threads = threading.active_count()
+        results = await asyncio.gather(*(scorer._call_llm_api_async(f, "nav") for f in frames))
+        assert threading.active_count() == threads
+        return scorer, results
+    scorer, results = asyncio.run(main())
+    assert len(results) == 200 and len(scorer.llm_intervals) == 200
+    # every call was started before the first one finished
+    starts, ends = zip(*scorer.llm_intervals.values())
+    assert max(starts) < min(ends)
+
+def test_pipeline_overlaps_moves():
+    """Perception of frame N runs while move N is flown, commands never overlap"""
+    async def main(n):
+        om, vm = make_maps()
+        scorer = StubScorer()
+        tello = StubTello()
+        pipeline = AsyncMovementPipeline(AsyncTello(tello), om, vm, scorer, Selector())
+        for _ in range(n):
+            await pipeline.step()
+        return pipeline, scorer, tello
+    n = 5
+    pipeline, scorer, tello = asyncio.run(main(n))
+    assert pipeline.stats["applied"] == n and tello.max_active == 1
+    assert scorer.applied == [f for f in range(1, n + 1) for _ in range(2)]
+    moves = [(t0, t1) for name, t0, t1 in tello.intervals if name == "move"]
+    assert len(moves) == n
+    for frame_id, move in enumerate(moves, start=1):
+        assert overlaps(scorer.llm_intervals[frame_id], move)
+
+def test_stage_deadline_cancels():
+    """An LLM call past its deadline is cancelled, detections still land"""
+    async def main():
+        om, vm = make_maps()
+        scorer = StubScorer(llm_s=1.0)
+        pipeline = AsyncMovementPipeline(AsyncTello(StubTello()), om, vm, scorer, Selector(),
+                                         llm_deadline_s=0.3)
+        await pipeline.step()
+        return pipeline, scorer
+    pipeline, scorer = asyncio.run(main())
+    assert scorer.llm_intervals == {}  # the call never ran to its end
+    assert pipeline.stats["late"] == 1 and scorer.cancelled == 1 and scorer.applied == [1]
+
+def test_command_timeout_keeps_drone_serial():
+    """A timed-out command finishes in its thread before the next one starts"""
+    async def main():
+        tello = StubTello()
+        atello = AsyncTello(tello, command_timeout_s=0.05)
+        try:
+            await atello.move("move_forward", 50)
+            assert False, "the move should have timed out"
+        except asyncio.TimeoutError:
+            pass
+        await atello.takeoff()
+        return tello
+    tello = asyncio.run(main())
+    assert tello.log == ["move", "takeoff"] and tello.max_active == 1
+
+def test_async_detection_uses_backend():
+    """A local/hybrid backend answers the async path, off the event loop"""
+    started = threading.Barrier(4, timeout=5)
+    class LocalBackend(DetectorBackend):
+        def detect(self, image):
+            started.wait()  # raises unless all four calls run at once
+            time.sleep(DETECT_S)  # blocking, like a CPU model
+            return [{"object": "person", "score": 0.9, "bbox": [0, 0, 1, 1],
+                     "thread": threading.current_thread().name}]
+    scorer = Scorer(detector=LocalBackend())
+    frame = Frame(np.zeros((8, 8, 3), dtype=np.uint8))
+    async def main():
+        return await asyncio.gather(*(scorer.detect_objects_async(frame) for _ in range(4)))
+    results = asyncio.run(main())
+    assert all(r[0]["object"] == "person" for r in results)
+    assert all(r[0]["thread"] != threading.main_thread().name for r in results)
+    assert scorer.vision_aclient is None  # Cloud Vision never touched
+
+def test_frame_wait_reads_once():
+    """Waiting for a newer frame peeks at its id; only the new frame is read"""
+    from tello_wrapper import FrameReader
+    from test_frame_reader import FakeFrameRead
+    src = FakeFrameRead(fps=5.0, shape=(90, 120, 3))
+    fr = FrameReader(src, background=True)
+    while fr.latest_id() is None:
+        time.sleep(0.01)
+    class ReaderTello:
+        def get_frame_reader(self, background=False):
+            return fr
+    async def main():
+        tello = AsyncTello(ReaderTello())
+        first = await tello.frame()
+        second = await tello.frame(after_id=first.frame_id)
+        return first, second
+    first, second = asyncio.run(main())
+    fr.stop()
+    src.stop()
+    assert second.frame_id > first.frame_id
+    assert fr.duplicates == 0
+
+def test_structured_shutdown():
+    """Battery end, a failing move and cancellation all end with the drone landed"""
+    om, vm = make_maps()
+    tello = StubTello(battery_cycles=3)
+    archiver = default_archiver()
+    stats = asyncio.run(run(AsyncTello(tello), om, vm, StubScorer(), Selector()))
+    assert stats["decisions"] == 3 and tello.landed and tello.log[-2:] == ["stop_stream", "land"]
+    assert not archiver.closed  # run() leaves the process-wide archiver alone
+
+    tello = StubTello(fail_at=1)
+    try:
+        asyncio.run(run(AsyncTello(tello), om, vm, StubScorer(), Selector()))
+        assert False, "the failing move should propagate"
+    except RuntimeError:
+        pass
+    assert tello.landed
+
+    async def cancel_mid_flight(tello, scorer):
+        task = asyncio.create_task(run(AsyncTello(tello), om, vm, scorer, Selector()))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    tello, scorer = StubTello(), StubScorer(llm_s=5.0)
+    asyncio.run(cancel_mid_flight(tello, scorer))
+    assert tello.landed and scorer.cancelled >= 1 and tello.max_active == 1
+    assert scorer.llm_intervals == {}  # no LLM call was waited out
+
+if __name__ == "__main__":
+    test_many_requests_one_thread()
+    test_pipeline_overlaps_moves()
+    test_stage_deadline_cancels()
+    test_command_timeout_keeps_drone_serial()
+    test_async_detection_uses_backend()
+    test_frame_wait_reads_once()
+    test_structured_shutdown()
+    print("Test completed!")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test file for the map change feed (change_log.py) and incremental checkpoints
+"""
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D, Cell
+from change_log import ChangeLog
+from map_snapshot import MapCheckpointer, load_snapshot
+
+def test_versions_and_boxes():
+    """Every mutating method bumps the version and records what it touched"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    v0 = om.version
+    om.update_visited_in_occup_grid(Pose2D(c + 10, c + 5, 0.0), Pose2D(c, c, 0.0))
+    v1 = om.version
+    assert v1 == v0 + 1
+    cs = om.changes_since(v0)
+    assert cs.boxes == [(c, c + 5, c, c + 10)] and not cs.pose_changed and cs.complete
+    om.update_drone_pos_and_ori(Pose2D(0.0, 50.0, 0.0))
+    om.update_occup_map([1.0, 2.0, 4.5])
+    cs = om.changes_since(v1)
+    assert cs.pose_changed and len(cs.boxes) == 1 and cs.version == om.version
+    y_min, y_max, x_min, x_max = cs.bounds()
+    assert y_min <= c + 5 and y_max <= c + 5 + 45
+    assert not om.changes_since(om.version)
+    # direct writes are only seen when reported
+    om.grid[c - 100, c - 100] = Cell.OBSTACLE
+    om.mark_dirty(c - 100, c - 100, c - 100, c - 100)
+    assert om.changes_since(cs.version).tiles(64) == {((c - 100) // 64, (c - 100) // 64)}
+
+    vm = ValueMap(10, 10, 0.1)
+    calls = []
+    vm.add_region_listener(lambda *box: calls.append(box))
+    v = vm.version
+    vm.update_value_map(0.5, Pose2D(0.0, 0.0, 0.0))
+    cs = vm.changes_since(v)
+    ys, xs = np.nonzero(vm.conf > 0)
+    assert cs.boxes == [(ys.min(), ys.max(), xs.min(), xs.max())]
+    # the grid did not change, so the grid listeners are not woken up
+    vm.update_value_map_bearings(np.linspace(0, 1, 8))
+    vm.update_value_points([0.0], [0.3], [0.9])
+    assert calls == [] and vm.version == cs.version + 2
+    vm.update_visited_in_occup_grid(Pose2D(c + 3, c, 0.0), Pose2D(c, c, 0.0))
+    assert len(calls) == 1
+
+def test_bounded_log():
+    """A consumer that falls behind the bounded log is told to rescan"""
+    log = ChangeLog(max_entries=4)
+    for i in range(10):
+        log.record((i, i, i, i))
+    # versions 7..10 are kept
+    assert not log.changes_since(5).complete
+    cs = log.changes_since(7)
+    assert cs.complete and cs.boxes == [(7, 7, 7, 7), (8, 8, 8, 8), (9, 9, 9, 9)]
+    assert log.changes_since(6).complete
+
+def test_incremental_checkpoint():
+    """Checkpoints driven by the change log write the same files as full diffs"""
+    for storage in ("dense", "tiled"):
+        vm = ValueMap(50, 50, 0.05, storage=storage)
+        with tempfile.TemporaryDirectory() as full_dir, tempfile.TemporaryDirectory() as inc_dir:
+            full = MapCheckpointer(vm, full_dir)
+            inc = MapCheckpointer(vm, inc_dir, incremental=True)
+            rng = np.random.default_rng(0)
+            t_full = t_inc = 0.0
+            for i in range(10):
+                vm.update_drone_pos_and_ori(Pose2D(0.0, 30.0, rng.uniform(-1, 1)))
+                vm.update_occup_map(rng.uniform(0.5, 4.5, 10))
+                vm.update_value_map(0.7, Pose2D(0.0, 0.0, 0.0))
+                t0 = time.perf_counter()
+                n_full = full.checkpoint()
+                t1 = time.perf_counter()
+                n_inc = inc.checkpoint()
+                t2 = time.perf_counter()
+                assert n_full == n_inc
+                t_full += t1 - t0
+                t_inc += t2 - t1
+            a, b = load_snapshot(full_dir), load_snapshot(inc_dir)
+            for name in vm.LAYERS:
+                la, lb = getattr(a, name), getattr(b, name)
+                if hasattr(la, "to_dense"):
+                    la, lb = la.to_dense(), lb.to_dense()
+                assert np.array_equal(la, lb), name
+            print(f"{storage}: full diff {t_full / 10 * 1e3:.2f} ms, change log {t_inc / 10 * 1e3:.2f} ms per checkpoint")
+
+if __name__ == "__main__":
+    test_versions_and_boxes()
+    test_bounded_log()
+    test_incremental_checkpoint()
+    print("Test completed!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test file for the perceptual-hash LLM decision cache (decision_cache.py)
+"""
+import sys
+import os
+import time
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame import Frame
+from decision_cache import DecisionCache, dhash
+
+def scene(seed, shift=0):
+    rng = np.random.default_rng(seed)
+    img = np.zeros((720, 960, 3), dtype=np.uint8)
+    for _ in range(12):
+        x, y = rng.integers(0, 900), rng.integers(0, 660)
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(img, (int(x) + shift, int(y)), (int(x) + 120 + shift, int(y) + 90), color, -1)
+    return img
+
+def hover_noise(img, seed):
+    # sensor noise plus a small exposure change
+    noise = np.random.default_rng(seed).normal(0, 4, img.shape)
+    return np.clip(img * 1.03 + noise, 0, 255).astype(np.uint8)
+
+def test_dhash_distances():
+    """Hover frames hash close together, other views do not"""
+    a = scene(0)
+    h = dhash(a)
+    assert (h ^ dhash(hover_noise(a, 1))).bit_count() <= 4
+    assert (h ^ dhash(scene(1))).bit_count() > 12
+    assert (h ^ dhash(scene(0, shift=200))).bit_count() > 6
+
+def test_cache_hits_and_misses():
+    """Near-duplicates hit, other prompts and views miss, old entries expire"""
+    cache = DecisionCache(max_entries=3, ttl_s=0.2, max_distance=6)
+    calls = []
+    def llm(answer):
+        def call():
+            calls.append(answer)
+            return answer
+        return call
+    a = Frame(scene(0))
+    assert cache.get_or_call(a, "nav", llm("move_forward 50")) == "move_forward 50"
+    assert cache.get_or_call(hover_noise(a.image, 2), "nav", llm("x")) == "move_forward 50"
+    assert cache.get_or_call(a, "other prompt", llm("turn_cw 90")) == "turn_cw 90"
+    assert cache.get_or_call(scene(5), "nav", llm("hover")) == "hover"
+    assert calls == ["move_forward 50", "turn_cw 90", "hover"]
+    s = cache.stats()
+    assert s["hits"] == 1 and s["misses"] == 3 and s["entries"] == 3
+    # bounded: a fourth entry evicts the least recently used
+    cache.store(scene(6), "nav", "stop")
+    assert len(cache) == 3 and cache.stats()["evicted"] == 1
+    time.sleep(0.25)
+    assert cache.lookup(a, "nav") is None
+    assert len(cache) == 0
+
+def test_lookup_speed():
+    """A cached decision costs microseconds, not a model call"""
+    cache = DecisionCache(max_entries=256)
+    for i in range(256):
+        cache.store(scene(i), "nav", f"answer {i}")
+    frame = hover_noise(scene(100), 3)
+    n = 200
+    t0 = time.perf_counter()
+    for _ in range(n):
+        answer = cache.lookup(frame, "nav")
+    dt = (time.perf_counter() - t0) / n
+    print(f"lookup among 256 entries (incl. hashing a 960x720 frame): {dt * 1e6:.0f} us")
+    assert answer == "answer 100"
+
+if __name__ == "__main__":
+    test_dhash_distances()
+    test_cache_hits_and_misses()
+    test_lookup_speed()
+    print("Test completed!")
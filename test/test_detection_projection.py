@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test file for projecting detections into the value map
+(Scorer.measure_coordinate_and_store, ValueMap.update_value_points)
+"""
+import sys
+import os
+import math
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GENAI_API_KEY", "test")
+
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D
+from object_detections import Detections, LabelTable
+from drone_controller import Scorer, MyConfig, project_detections
+
+def make_scorer():
+    om = OccupancyGrid(50, 50, 0.1)
+    vm = ValueMap.from_occupancy(om)
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    return scorer, om, vm
+
+def person_at(u, range_m, score=0.9):
+    """Box centered at image column u for a person range_m ahead"""
+    focal = 0.5 / math.tan(math.radians(MyConfig.CAMERA_FOV_DEG) / 2.0)
+    bearing = math.atan((u - 0.5) / focal)
+    h = 1.7 * focal / (range_m * math.cos(bearing)) / MyConfig.IMAGE_ASPECT
+    return {"object": "Person", "score": score, "bbox": [u - 0.02, 0.5 - h / 2, u + 0.02, 0.5 + h / 2]}
+
+def test_bearing_and_range():
+    """A centered box lands straight ahead, right of center is clockwise"""
+    scorer, om, vm = make_scorer()
+    cx0, cy0 = int(om.curr_point.x), int(om.curr_point.y)
+    cells = scorer.measure_coordinate_and_store([person_at(0.5, 2.0)])
+    assert [tuple(c) for c in cells] == [(cy0 + 20, cx0)]  # yaw 0 is +y, 2 m = 20 cells
+    assert vm.n[cy0 + 20, cx0] == 1 and abs(vm.value[cy0 + 20, cx0] - 0.9) < 1e-6
+
+    bearings, ranges = project_detections(Detections.from_dicts([person_at(0.8, 3.0)], table=LabelTable()))
+    assert bearings[0] > 0 and abs(ranges[0] - 3.0) < 1e-6
+    # facing east, "ahead" is +x
+    om.curr_point = Pose2D(x=om.curr_point.x, y=om.curr_point.y, yaw=math.pi / 2)
+    cells = scorer.measure_coordinate_and_store([person_at(0.5, 1.0)])
+    assert tuple(cells[0]) == (cy0, cx0 + 10)
+
+def test_pose_comes_from_occupancy_grid():
+    """Detections are cast from occupancy_grid.curr_point, not the value map's copy"""
+    scorer, om, vm = make_scorer()
+    om.update_drone_pos_and_ori(Pose2D(x=0.0, y=100.0, yaw=0.0))  # 1 m ahead, value map not synced
+    cells = scorer.measure_coordinate_and_store([person_at(0.5, 1.0)])
+    assert tuple(cells[0]) == (int(om.curr_point.y) + 10, int(om.curr_point.x))
+    assert vm.curr_point.y != om.curr_point.y
+
+def test_matches_per_object_updates():
+    """One batched scatter equals one update per detection when they do not overlap"""
+    scorer, om, vm = make_scorer()
+    dets = [person_at(u, r, s) for u, r, s in ((0.1, 1.0, 0.5), (0.3, 2.5, 0.7), (0.6, 1.5, 0.8), (0.9, 3.5, 0.6))]
+    scorer.measure_coordinate_and_store(dets)
+    ref = ValueMap.from_occupancy(om)
+    table = LabelTable()
+    for d in dets:
+        b, r = project_detections(Detections.from_dicts([d], table=table))
+        ref.update_value_points(b, r, [d["score"]], radius_m=MyConfig.DETECTION_RADIUS_M)
+    assert np.array_equal(vm.n, ref.n) and np.allclose(vm.value, ref.value) and np.allclose(vm.conf, ref.conf)
+    assert vm.n.sum() == 4 * 13  # radius 2 cells -> 13 cells each
+
+def test_overlapping_detections_fuse_once():
+    """Cells covered by several detections are fused once, with the best score"""
+    scorer, om, vm = make_scorer()
+    scorer.measure_coordinate_and_store([person_at(0.5, 2.0, 0.4), person_at(0.5, 2.0, 0.9)])
+    assert vm.n.max() == 1 and abs(vm.value.max() - 0.9) < 1e-6
+    scorer.measure_coordinate_and_store([{"object": "person", "score": 0.9}])  # no bbox: skipped
+    scorer.measure_coordinate_and_store(Detections.empty())
+    assert vm.n.max() == 1
+    # off the map is clipped, not an error
+    far = vm.update_value_points([0.0], [100.0], [1.0])
+    assert far.shape == (1, 2) and vm.n.max() == 1
+
+def test_cost_flat_in_detections():
+    """Per-frame cost stays flat as the number of detections grows"""
+    rng = np.random.default_rng(0)
+    def frame(n):
+        return [person_at(float(u), float(r), float(s))
+                for u, r, s in zip(rng.uniform(0.05, 0.95, n), rng.uniform(0.5, 4.0, n), rng.uniform(0.3, 1.0, n))]
+    timings = {}
+    for n in (1, 10, 100, 500):
+        dets = Detections.from_dicts(frame(n), table=LabelTable())
+        scorer, _, _ = make_scorer()
+        t0 = time.perf_counter()
+        for _ in range(20):
+            scorer.measure_coordinate_and_store(dets)
+        timings[n] = (time.perf_counter() - t0) / 20
+    print("per frame: " + ", ".join(f"{n} dets {t * 1e3:.2f} ms" for n, t in timings.items()))
+
+    dets = Detections.from_dicts(frame(500), table=LabelTable())
+    scorer, om, vm = make_scorer()
+    t0 = time.perf_counter()
+    for i in range(len(dets)):
+        scorer.measure_coordinate_and_store(dets[i:i + 1])
+    t_loop = time.perf_counter() - t0
+    print(f"500 dets one at a time: {t_loop * 1e3:.1f} ms")
+    assert timings[500] < t_loop / 5
+    assert timings[500] < 20 * timings[1]
+
+if __name__ == "__main__":
+    test_bearing_and_range()
+    test_pose_comes_from_occupancy_grid()
+    test_matches_per_object_updates()
+    test_overlapping_detections_fuse_once()
+    test_cost_flat_in_detections()
+    print("Test completed!")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test file for the detector backends (Scorer/detector_backends.py), with a tiny
+SSD-style ONNX model written in memory (no model download, no network)
+"""
+import sys
+import os
+import time
+import tempfile
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame import Frame
+from Scorer.detector_backends import (DetectorBackend, OpenCVDNNBackend, HybridBackend,
+                                      bbox_iou, make_detector)
+
+# --- minimal ONNX writer (protobuf wire format), enough for a conv net ---
+def _varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+def _int(field, v):
+    return _varint(field << 3) + _varint(v)
+
+def _bytes(field, b):
+    b = b.encode() if isinstance(b, str) else b
+    return _varint(field << 3 | 2) + _varint(len(b)) + b
+
+def _tensor(name, arr):
+    arr = np.ascontiguousarray(arr, dtype=np.float32)
+    return b"".join(_int(1, d) for d in arr.shape) + _int(2, 1) + _bytes(8, name) + _bytes(9, arr.tobytes())
+
+def _ints_attr(name, vals):
+    return _bytes(1, name) + _int(20, 7) + b"".join(_int(8, v) for v in vals)
+
+def _node(op, inputs, outputs, attrs=()):
+    return (b"".join(_bytes(1, i) for i in inputs) + b"".join(_bytes(2, o) for o in outputs)
+            + _bytes(4, op) + b"".join(_bytes(5, a) for a in attrs))
+
+def _value_info(name, shape):
+    dims = b"".join(_bytes(1, _int(1, d)) for d in shape)
+    return _bytes(1, name) + _bytes(2, _bytes(1, _int(1, 1) + _bytes(2, dims)))
+
+def tiny_ssd_onnx(detections, size=(300, 300), width=16):
+    """Two strided convs (real compute) whose output is zeroed and added to a
+    fixed (1, 1, N, 7) DetectionOutput tensor"""
+    detections = np.asarray(detections, dtype=np.float32).reshape(1, 1, -1, 7)
+    rng = np.random.default_rng(0)
+    weights = {"w1": rng.normal(0, 0.1, (width, 3, 3, 3)),
+               "w2": rng.normal(0, 0.1, (2 * width, width, 3, 3)),
+               "w3": np.zeros((1, 2 * width, 1, 1)),
+               "dets": detections}
+    conv = [_ints_attr("strides", [2, 2]), _ints_attr("pads", [1, 1, 1, 1])]
+    nodes = [_node("Conv", ["x", "w1"], ["c1"], conv), _node("Relu", ["c1"], ["r1"]),
+             _node("Conv", ["r1", "w2"], ["c2"], conv), _node("Relu", ["c2"], ["r2"]),
+             _node("GlobalAveragePool", ["r2"], ["g"]), _node("Conv", ["g", "w3"], ["z"]),
+             _node("Add", ["z", "dets"], ["detection_out"])]
+    graph = b"".join(_bytes(1, n) for n in nodes) + _bytes(2, "tiny_ssd")
+    graph += b"".join(_bytes(5, _tensor(k, v)) for k, v in weights.items())
+    graph += _bytes(11, _value_info("x", [1, 3, size[1], size[0]]))
+    graph += _bytes(12, _value_info("detection_out", list(detections.shape)))
+    return _int(1, 8) + _bytes(2, "test") + _bytes(7, graph) + _bytes(8, _bytes(1, "") + _int(2, 13))
+
+DETS = [[0, 1, 0.9, 0.1, 0.2, 0.5, 0.6],     # sure
+        [0, 2, 0.45, 0.55, 0.5, 0.9, 0.95],  # unsure
+        [0, 1, 0.1, 0.0, 0.0, 0.2, 0.2],     # below threshold
+        [0, 7, 0.8, -0.1, 0.5, 0.3, 1.2]]    # out of range box, unknown label
+LABELS = ["background", "person", "umbrella"]
+
+class StubRemote(DetectorBackend):
+    def __init__(self, boxes, latency=0.0):
+        self.boxes = boxes
+        self.latency = latency
+        self.calls = 0
+    def detect(self, image):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [{"object": "Person", "score": 0.8, "bbox": b} for b in self.boxes]
+
+def test_blob_matches_blob_from_image():
+    """The preallocated blob equals cv2.dnn.blobFromImage and is reused"""
+    backend = OpenCVDNNBackend(tiny_ssd_onnx(DETS), input_size=(320, 240), labels=LABELS)
+    rng = np.random.default_rng(1)
+    blob_id = id(backend.blob)
+    for shape in ((720, 960, 3), (480, 640, 3)):
+        img = rng.integers(0, 256, shape, dtype=np.uint8)
+        blob = backend.prepare(img)
+        ref = cv2.dnn.blobFromImage(img, 1 / 127.5, (320, 240), (127.5, 127.5, 127.5), swapRB=True)
+        assert blob.shape == (1, 3, 240, 320) and id(blob) == blob_id
+        assert np.abs(blob - ref).max() < 1e-5
+
+def test_local_detections_format():
+    """Same output as vision_detect, from arrays, Frames, bytes and paths"""
+    backend = OpenCVDNNBackend(tiny_ssd_onnx(DETS), labels=LABELS, score_threshold=0.3)
+    img = np.full((360, 480, 3), 90, dtype=np.uint8)
+    dets = backend.detect(img)
+    assert [d["object"] for d in dets] == ["person", "umbrella", "7"]
+    assert abs(dets[0]["score"] - 0.9) < 1e-6
+    assert np.allclose(dets[0]["bbox"], [0.1, 0.2, 0.5, 0.6], atol=1e-6)
+    assert np.allclose(dets[2]["bbox"], [0.0, 0.5, 0.3, 1.0], atol=1e-6)  # clipped
+    frame = Frame(img)
+    assert backend.detect(frame) == dets
+    assert backend.detect(frame.jpeg) == dets
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "model.onnx")
+        with open(path, "wb") as f:
+            f.write(tiny_ssd_onnx(DETS))
+        labels = os.path.join(d, "labels.txt")
+        with open(labels, "w") as f:
+            f.write("\n".join(LABELS))
+        from_file = make_detector("local", path, labels=labels)
+        assert from_file.detect(img) == dets
+
+def test_hybrid_confirms_only_unsure():
+    """The remote service is called only for frames with unsure detections"""
+    local = OpenCVDNNBackend(tiny_ssd_onnx(DETS), labels=LABELS)
+    remote = StubRemote([[0.5, 0.5, 0.92, 0.9]])
+    hybrid = HybridBackend(local, remote, confirm_band=(0.3, 0.6))
+    dets = hybrid.detect(np.zeros((240, 320, 3), dtype=np.uint8))
+    assert [d["object"] for d in dets] == ["person", "7", "umbrella"]
+    assert remote.calls == 1 and hybrid.confirmed == 1
+
+    remote.boxes = [[0.0, 0.0, 0.1, 0.1]]  # nothing where the umbrella was
+    dets = hybrid.detect(np.zeros((240, 320, 3), dtype=np.uint8))
+    assert [d["object"] for d in dets] == ["person", "7"] and hybrid.rejected == 1
+
+    sure_only = HybridBackend(OpenCVDNNBackend(tiny_ssd_onnx(DETS[:1]), labels=LABELS), remote)
+    for _ in range(5):
+        assert [d["object"] for d in sure_only.detect(np.zeros((240, 320, 3), dtype=np.uint8))] == ["person"]
+    assert remote.calls == 2 and sure_only.stats()["remote_rate"] == 0.0
+
+    limited = HybridBackend(local, remote, min_interval_s=10.0)
+    for _ in range(3):
+        limited.detect(np.zeros((240, 320, 3), dtype=np.uint8))
+    assert limited.remote_calls == 1 and limited.skipped == 2
+
+def test_bbox_iou():
+    assert bbox_iou([0, 0, 1, 1], [0, 0, 1, 1]) == 1.0
+    assert bbox_iou([0, 0, 1, 1], [1, 1, 2, 2]) == 0.0
+    assert abs(bbox_iou([0, 0, 2, 1], [1, 0, 3, 1]) - 1 / 3) < 1e-12
+
+def test_backend_needs_detect():
+    class NoDetect(DetectorBackend):
+        pass
+    for cls in (DetectorBackend, NoDetect):
+        try:
+            cls()
+            assert False, f"{cls.__name__} has no detect() and should not instantiate"
+        except TypeError:
+            pass
+    assert StubRemote([]).detect(None) == []
+
+if __name__ == "__main__":
+    test_blob_matches_blob_from_image()
+    test_local_detections_format()
+    test_hybrid_confirms_only_unsure()
+    test_bbox_iou()
+    test_backend_needs_detect()
+    print("Test completed!")
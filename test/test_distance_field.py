@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test file for the obstacle distance field (distance_field.py)
+"""
+import sys
+import os
+import time
+import math
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, Pose2D, Cell
+from distance_field import ObstacleDistanceField
+
+def _brute_force(om, field, y0, y1, x0, x1):
+    """Truncated distance to the nearest obstacle for every cell of the box"""
+    oy, ox = np.nonzero(om.grid == Cell.OBSTACLE)
+    ys, xs = np.mgrid[y0:y1 + 1, x0:x1 + 1]
+    out = np.full(ys.shape, float(field.D))
+    for y, x in zip(oy, ox):
+        out = np.minimum(out, np.hypot(ys - y, xs - x))
+    return out
+
+def test_incremental_matches_full():
+    """Local repairs give the same field as a full transform"""
+    om = OccupancyGrid(10, 10, 0.1)
+    field = ObstacleDistanceField(om, max_dist_m=1.0)
+    c = om.center_offset
+    rng = np.random.default_rng(3)
+    for step in range(40):
+        om.curr_point = Pose2D(c + rng.uniform(-30, 30), c + rng.uniform(-30, 30), rng.uniform(-math.pi, math.pi))
+        om.update_occup_map(rng.uniform(0.3, 4.5, 15))
+    fresh = ObstacleDistanceField(om, max_dist_m=1.0, attach=False)
+    assert np.array_equal(field.dist, fresh.dist)
+    assert (field.dist == 0).sum() == (om.grid == Cell.OBSTACLE).sum() > 0
+    # removing an obstacle by hand, then reporting it
+    ys, xs = np.nonzero(om.grid == Cell.OBSTACLE)
+    om.grid[ys[0], xs[0]] = Cell.FREE
+    field.update_region(int(ys[0]), int(ys[0]), int(xs[0]), int(xs[0]))
+    fresh = ObstacleDistanceField(om, max_dist_m=1.0, attach=False)
+    assert np.array_equal(field.dist, fresh.dist)
+    box = (c - 40, c + 40, c - 40, c + 40)
+    assert np.allclose(field.dist[box[0]:box[1] + 1, box[2]:box[3] + 1], _brute_force(om, field, *box), atol=1e-3)
+
+def test_tiled_storage():
+    """A tiled map keeps the field in tiles, even past the nominal bounds"""
+    om = OccupancyGrid(5, 5, 0.1, storage="tiled")
+    field = ObstacleDistanceField(om, max_dist_m=1.0)
+    om.grid[-20, -20] = Cell.OBSTACLE
+    field.update_region(-20, -20, -20, -20)
+    assert field.dist[-20, -20] == 0
+    assert abs(field.dist[-20, -15] - 5) < 1e-6
+    assert field.dist[-20, 0] == field.D
+
+def test_safe_travel_and_inflation():
+    """Moves stop radius_m short of a wall"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    om.grid[c + 30, c - 10:c + 11] = Cell.OBSTACLE   # wall 3 m north
+    field = ObstacleDistanceField(om, max_dist_m=2.0, radius_m=0.2)
+    om.curr_point = Pose2D(float(c), float(c), 0.0)
+    north = field.max_safe_travel(c, c, 0.0)
+    assert 2.7 <= north <= 2.8 + 1e-9
+    assert field.max_safe_travel(c, c, math.pi) == 3.0   # nothing behind, capped at MOVEMENT_MAX
+    assert 270 <= field.safe_distance_cm(300) <= 280
+    assert field.safe_distance_cm(100) == 100
+    assert field.safe_distance_cm(300, bearing=math.pi / 2) == 300
+    # short waypoints in open space are kept for cap_distance to fly at 20 cm
+    assert field.safe_distance_cm(15) == 15
+    assert field.safe_distance_cm(5, bearing=math.pi) == 5
+    # too close to the wall: no move at all rather than cap_distance's 20 cm
+    om.curr_point = Pose2D(float(c), float(c + 27), 0.0)
+    assert field.safe_distance_cm(50) == 0
+    assert field.safe_distance_cm(15) == 0
+    # room for the 20 cm cap_distance flies, but not for the full request
+    om.curr_point = Pose2D(float(c), float(c + 3), 0.0)
+    assert field.safe_distance_cm(300) < 300 and field.safe_distance_cm(15) == 15
+    block = field.inflated(c + 26, c + 34, c, c)
+    assert block[:, 0].tolist() == [False, False, True, True, True, True, True, False, False]
+
+def test_speed():
+    """Full transform and per-scan repair cost"""
+    om = OccupancyGrid(100, 100, 0.1)
+    t0 = time.perf_counter()
+    field = ObstacleDistanceField(om)
+    print(f"full transform {om.map_size_N}^2: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    c = om.center_offset
+    rng = np.random.default_rng(0)
+    n = 100
+    t0 = time.perf_counter()
+    for i in range(n):
+        om.curr_point = Pose2D(c + i, c, rng.uniform(-math.pi, math.pi))
+        om.update_occup_map(rng.uniform(0.5, 4.5, 15))
+    print(f"scan + field repair: {(time.perf_counter() - t0) / n * 1e3:.2f} ms")
+    t0 = time.perf_counter()
+    for i in range(1000):
+        field.max_safe_travel(c, c, i * 0.01)
+    print(f"max_safe_travel: {(time.perf_counter() - t0):.3f} ms per query")
+
+if __name__ == "__main__":
+    test_incremental_matches_full()
+    test_tiled_storage()
+    test_safe_travel_and_inflation()
+    test_speed()
+    print("Test completed!")
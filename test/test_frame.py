@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test file for in-memory frame hand-off (frame.py)
+"""
+import sys
+import os
+import time
+import tempfile
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame import Frame, FrameArchiver, default_archiver, shutdown_default_archiver
+from Scorer.detect_objects import _image_content
+
+def make_image():
+    rng = np.random.default_rng(0)
+    img = np.zeros((720, 960, 3), dtype=np.uint8)
+    cv2.rectangle(img, (100, 100), (400, 300), (40, 200, 90), -1)
+    img[::7] = rng.integers(0, 256, img[::7].shape, dtype=np.uint8)
+    return img
+
+def test_lazy_cached_encoding():
+    """Bytes are encoded once per format and decode back to the frame"""
+    img = make_image()
+    frame = Frame(img, frame_id=3)
+    assert frame._encoded == {}
+    jpeg = frame.jpeg
+    assert frame.jpeg is jpeg
+    assert frame.encode(".jpg", quality=50) is not jpeg
+    png = frame.png
+    assert np.array_equal(cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_UNCHANGED), img)
+    assert jpeg[:2] == b"\xff\xd8" and Frame.mime_type(".jpg") == "image/jpeg"
+    # copy=True detaches the frame from a reused buffer
+    copied = Frame(img, copy=True)
+    img[:] = 0
+    assert copied.image.any()
+
+def test_save_and_save_async():
+    """Saving writes the cached bytes, in the background when asked"""
+    frame = Frame(make_image())
+    with tempfile.TemporaryDirectory() as d:
+        path = frame.save(os.path.join(d, "a.png"))
+        with open(path, "rb") as f:
+            assert f.read() == frame.png
+        fut = frame.save_async(os.path.join(d, "b.jpg"))
+        assert fut.result(timeout=5) == os.path.join(d, "b.jpg")
+        assert frame.path == os.path.join(d, "b.jpg")
+        # a failing write is logged, not raised
+        assert frame.save_async(os.path.join(d, "missing", "c.png")).result(timeout=5) is None
+
+def test_default_archiver_outlives_close():
+    """Closing or shutting down the shared archiver does not break later saves"""
+    frame = Frame(make_image())
+    with tempfile.TemporaryDirectory() as d:
+        default_archiver().close()
+        assert frame.save_async(os.path.join(d, "a.jpg")).result(timeout=5) is not None
+        first = default_archiver()
+        metrics = shutdown_default_archiver(timeout=5)
+        assert first.closed and metrics["written"] >= 1
+        assert shutdown_default_archiver() is None  # nothing to close until it is used again
+        assert frame.save_async(os.path.join(d, "b.jpg")).result(timeout=5) is not None
+        assert default_archiver() is not first
+
+class SlowFrame(Frame):
+    """Frame whose disk write takes `delay` seconds (a slow SD card)"""
+    delay = 0.05
+    def save(self, path, quality=90):
+        time.sleep(self.delay)
+        return super().save(path, quality)
+
+def test_archiver_backpressure():
+    """A slow disk never blocks submit(); the queue policy decides what is lost"""
+    img = make_image()[:120, :160]
+    with tempfile.TemporaryDirectory() as d:
+        for policy in ("drop_oldest", "drop_newest"):
+            archiver = FrameArchiver(max_queue=4, workers=1, policy=policy)
+            t0 = time.perf_counter()
+            futures = [archiver.submit(SlowFrame(img), os.path.join(d, f"{policy}_{i}")) for i in range(20)]
+            submit_ms = (time.perf_counter() - t0) / 20 * 1e3
+            assert archiver.depth <= 4
+            assert archiver.flush(timeout=5)
+            paths = [f.result(timeout=5) for f in futures]
+            written = [i for i, p in enumerate(paths) if p is not None]
+            m = archiver.metrics()
+            assert m["written"] == len(written) and m["dropped"] == 20 - len(written)
+            assert m["max_depth"] == 4 and m["write_ms_mean"] >= 40
+            if policy == "drop_oldest":
+                assert written[-4:] == [16, 17, 18, 19]
+            else:
+                assert 19 not in written and written[0] == 0
+            assert paths[written[0]].endswith(".jpg") and os.path.exists(paths[written[0]])
+            archiver.close()
+            print(f"{policy}: submit {submit_ms:.3f} ms, {m}")
+
+def test_detection_input():
+    """vision_detect accepts bytes, a path or a Frame"""
+    frame = Frame(make_image())
+    with tempfile.TemporaryDirectory() as d:
+        path = frame.save(os.path.join(d, "a.jpg"))
+        assert _image_content(path) == frame.jpeg
+    assert _image_content(frame) == frame.jpeg
+    assert _image_content(bytearray(b"abc")) == b"abc"
+
+def test_handoff_speed():
+    """Encoding in memory vs the PNG write + read-back it replaces"""
+    img = make_image()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "frame.png")
+        t0 = time.perf_counter()
+        cv2.imwrite(path, img)
+        with open(path, "rb") as f:
+            f.read()
+        t_png = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    frame = Frame(img, copy=True)
+    frame.jpeg
+    frame.jpeg  # detection and LLM share the cached bytes
+    t_mem = time.perf_counter() - t0
+    print(f"png write + read: {t_png * 1e3:.1f} ms, in-memory jpeg: {t_mem * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    test_lazy_cached_encoding()
+    test_save_and_save_async()
+    test_default_archiver_outlives_close()
+    test_archiver_backpressure()
+    test_detection_input()
+    test_handoff_speed()
+    print("Test completed!")
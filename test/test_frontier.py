@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test file for the incremental frontier index (frontier.py)
+"""
+import sys
+import os
+import time
+import math
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, Pose2D, Cell
+from frontier import FrontierIndex
+
+def _clusters(index):
+    return sorted(sorted(c.cells) for c in index.clusters.values())
+
+def test_incremental_matches_rebuild():
+    """Incremental updates give the same clusters as a full rebuild"""
+    for storage in ("dense", "tiled"):
+        om = OccupancyGrid(20, 20, 0.1, storage=storage)
+        index = FrontierIndex(om)
+        c = om.center_offset
+        rng = np.random.default_rng(1)
+        x, y = float(c), float(c)
+        for step in range(30):
+            nx, ny = x + rng.uniform(-15, 15), y + rng.uniform(-15, 15)
+            om.update_visited_path([(x, y), (nx, ny)], width_m=0.2)
+            om.curr_point = Pose2D(nx, ny, rng.uniform(-math.pi, math.pi))
+            om.update_occup_map(rng.uniform(0.3, 4.5, 15))
+            x, y = nx, ny
+        fresh = FrontierIndex(om, attach=False)
+        assert _clusters(index) == _clusters(fresh)
+        assert len(index.clusters) > 0
+        print(f"{storage}: {len(index.clusters)} clusters, {len(index.cell_cluster)} frontier cells")
+
+def test_clusters_split_and_merge():
+    """Closing a gap splits a cluster, reopening it merges them again"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    index = FrontierIndex(om)
+    om.update_visited_batch([(c, c)], [(c + 20, c)])
+    # a horizontal corridor has frontier along both sides, one 8-connected blob
+    assert len(index.clusters) == 1
+    assert index.largest().size == 21
+    # an obstacle in the middle of the corridor cuts it in two
+    om.grid[c, c + 10] = Cell.OBSTACLE
+    index.update_region(c, c, c + 10, c + 10)
+    assert len(index.clusters) == 2
+    om.grid[c, c + 10] = Cell.VISITED
+    index.update_region(c, c, c + 10, c + 10)
+    assert len(index.clusters) == 1
+
+def test_queries():
+    """largest() and nearest() return the expected clusters"""
+    om = OccupancyGrid(20, 20, 0.1)
+    c = om.center_offset
+    index = FrontierIndex(om)
+    om.update_visited_batch([(c, c)], [(c + 5, c)])           # small, near the drone
+    om.update_visited_batch([(c + 80, c)], [(c + 80, c + 40)])  # big, far away
+    assert index.largest().size == 41
+    assert index.largest(min_size=100) is None
+    near = index.nearest(c, c)
+    assert near.size == 6
+    cx, cy = near.centroid
+    assert abs(cx - (c + 2.5)) < 1e-9 and abs(cy - c) < 1e-9
+    assert index.nearest(c, c, min_size=10).size == 41
+
+def test_nearest_matches_brute_force():
+    """nearest() agrees with a scan over every cluster, near and far"""
+    om = OccupancyGrid(60, 60, 0.1)
+    c = om.center_offset
+    index = FrontierIndex(om)
+    rng = np.random.default_rng(3)
+    for _ in range(40):
+        x, y = rng.integers(c - 250, c + 250, 2)
+        om.update_visited_batch([(int(x), int(y))], [(int(x) + int(rng.integers(0, 6)), int(y))])
+    assert len(index.clusters) > 10
+    queries = [tuple(rng.uniform(c - 290, c + 290, 2)) for _ in range(200)] + [(0.0, 0.0), (-5000.0, 9000.0)]
+    for min_size in (1, 4):
+        for x, y in queries:
+            sizes = [k for k in index.clusters.values() if k.size >= min_size]
+            want = min(math.hypot(k.centroid[0] - x, k.centroid[1] - y) for k in sizes)
+            got = index.nearest(x, y, min_size=min_size)
+            assert abs(math.hypot(got.centroid[0] - x, got.centroid[1] - y) - want) < 1e-9
+
+def test_update_speed():
+    """Per-scan update cost on a large map"""
+    om = OccupancyGrid(100, 100, 0.1)
+    c = om.center_offset
+    t0 = time.perf_counter()
+    index = FrontierIndex(om)
+    print(f"initial scan of {om.map_size_N}^2: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    rng = np.random.default_rng(0)
+    n = 100
+    t0 = time.perf_counter()
+    for i in range(n):
+        om.curr_point = Pose2D(c + i, c, rng.uniform(-math.pi, math.pi))
+        om.update_occup_map(rng.uniform(0.5, 4.5, 15))
+    dt = (time.perf_counter() - t0) / n
+    print(f"scan + frontier update: {dt * 1e3:.2f} ms, {len(index.clusters)} clusters")
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        index.nearest(c, c)
+        index.largest()
+    print(f"nearest + largest: {(time.perf_counter() - t0):.3f} ms per query pair")
+
+if __name__ == "__main__":
+    test_incremental_matches_rebuild()
+    test_clusters_split_and_merge()
+    test_queries()
+    test_nearest_matches_brute_force()
+    test_update_speed()
+    print("Test completed!")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test file for memory-mapped map snapshots and incremental checkpoints
+"""
+import sys
+import os
+import math
+import time
+import tempfile
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import ValueMap, Pose2D, Cell
+from map_snapshot import save_snapshot, load_snapshot, MapCheckpointer
+
+os.environ.setdefault("GENAI_API_KEY", "test-key")
+from drone_controller import init_spatial_map, enable_checkpoints
+
+def make_map(storage="dense"):
+    vm = ValueMap(20, 20, 0.05, storage=storage, tile_size=64)
+    vm.curr_point.yaw = math.pi / 4
+    vm.update_value_map(0.8, Pose2D(x=30.0, y=10.0, yaw=0.0), max_range_m=30)
+    vm.grid[vm.center_offset, vm.center_offset] = Cell.VISITED
+    return vm
+
+def assert_same(a, b):
+    for name in a.LAYERS:
+        la, lb = getattr(a, name), getattr(b, name)
+        if hasattr(la, "to_dense"):
+            la, lb = la.to_dense(), lb.to_dense()
+        assert np.array_equal(la, lb), name
+    assert (a.curr_point.x, a.curr_point.y, a.curr_point.yaw) == \
+        (b.curr_point.x, b.curr_point.y, b.curr_point.yaw)
+
+def test_snapshot_roundtrip_dense():
+    """Dense snapshots reopen as memmaps and checkpoints only rewrite changed tiles"""
+    vm = make_map()
+    with tempfile.TemporaryDirectory() as d:
+        save_snapshot(vm, d)
+        t0 = time.perf_counter()
+        resumed = load_snapshot(d)
+        print(f"load: {(time.perf_counter() - t0) * 1e3:.2f} ms for {vm.map_size_N}x{vm.map_size_N}")
+        assert isinstance(resumed.value, np.memmap)
+        assert_same(vm, resumed)
+
+        cp = MapCheckpointer(resumed, d)
+        assert cp.checkpoint() == 0
+        resumed.update_drone_pos_and_ori(Pose2D(x=0.0, y=50.0, yaw=0.0))
+        resumed.value[5, 5] = 1.0
+        # one tile in value and nothing else
+        assert cp.checkpoint() == 1
+        again = load_snapshot(d)
+        assert_same(resumed, again)
+
+def test_snapshot_roundtrip_tiled():
+    """Tiled snapshots append new tiles and rewrite only modified ones"""
+    vm = make_map("tiled")
+    with tempfile.TemporaryDirectory() as d:
+        cp = MapCheckpointer(vm, d)
+        resumed = load_snapshot(d)
+        assert_same(vm, resumed)
+        n_tiles = len(vm.value.tiles)
+        vm.value[vm.center_offset, vm.center_offset] = 0.5  # existing tile
+        vm.value[-500, -500] = 0.25                         # new tile
+        assert cp.checkpoint() == 2
+        resumed = load_snapshot(d)
+        assert len(resumed.value.tiles) == n_tiles + 1
+        assert resumed.value[-500, -500] == np.float32(0.25)
+        assert_same(vm, resumed)
+
+def test_resume_is_opt_in():
+    """A launch starts with empty maps and replaces the old snapshot unless resume is asked for"""
+    with tempfile.TemporaryDirectory() as d:
+        om, vm = init_spatial_map(d)
+        om.curr_point.x += 7.0
+        for cp in enable_checkpoints(d, om, vm):
+            cp.checkpoint()
+
+        fresh, _ = init_spatial_map(d)
+        assert fresh.curr_point.x == om.curr_point.x - 7.0
+        resumed, _ = init_spatial_map(d, resume=True)
+        assert resumed.curr_point.x == om.curr_point.x
+
+        enable_checkpoints(d, fresh, ValueMap.from_occupancy(fresh))  # a fresh run overwrites it
+        resumed, _ = init_spatial_map(d, resume=True)
+        assert resumed.curr_point.x == fresh.curr_point.x
+
+if __name__ == "__main__":
+    test_snapshot_roundtrip_dense()
+    test_snapshot_roundtrip_tiled()
+    test_resume_is_opt_in()
+    print("Test completed!")
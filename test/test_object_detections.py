@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test file for the struct-of-arrays Detections container (object_detections.py)
+"""
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import vision
+from object_detections import Detections, LabelTable, box_iou
+from Scorer.detect_objects import _object_list
+from Scorer.detector_backends import bbox_iou
+
+def random_dicts(n, seed, names=("person", "umbrella", "car", "dog")):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 0.8, (n, 2))
+    wh = rng.uniform(0.02, 0.2, (n, 2))
+    return [{"object": names[rng.integers(len(names))], "score": float(rng.uniform(0.05, 1.0)),
+             "bbox": [float(xy[i, 0]), float(xy[i, 1]), float(xy[i, 0] + wh[i, 0]), float(xy[i, 1] + wh[i, 1])]}
+            for i in range(n)]
+
+def reference_nms(dets, thr):
+    # per-label greedy NMS over dicts, the slow way
+    order = sorted(range(len(dets)), key=lambda i: -dets[i]["score"])
+    keep = []
+    for i in order:
+        if all(dets[j]["object"] != dets[i]["object"] or bbox_iou(dets[i]["bbox"], dets[j]["bbox"]) <= thr
+               for j in keep):
+            keep.append(i)
+    return keep
+
+def test_round_trip_and_vision_response():
+    """Dicts and Vision responses give the same arrays, to_dicts gives them back"""
+    table = LabelTable()
+    objs = [vision.LocalizedObjectAnnotation(name=n, score=s, bounding_poly={"normalized_vertices": [
+                {"x": x0, "y": y0}, {"x": x1, "y": y0}, {"x": x1, "y": y1}, {"x": x0, "y": y1}]})
+            for n, s, x0, y0, x1, y1 in (("Person", 0.9, 0.1, 0.2, 0.4, 0.8), ("Umbrella", 0.6, 0.0, 0.1, 0.3, 0.35))]
+    response = vision.AnnotateImageResponse(localized_object_annotations=objs)
+    dets = Detections.from_vision_response(response, frame_id=7, table=table)
+    ref = _object_list(response.localized_object_annotations)
+    assert dets.label_names() == ["Person", "Umbrella"] and list(dets.frames) == [7, 7]
+    assert np.allclose(dets.boxes, [d["bbox"] for d in ref]) and np.allclose(dets.scores, [d["score"] for d in ref])
+    back = Detections.from_dicts(dets.to_dicts(), table=table)
+    assert np.array_equal(back.boxes, dets.boxes) and np.array_equal(back.labels, dets.labels)
+    assert len(Detections.from_vision_response(vision.AnnotateImageResponse(), table=table)) == 0
+    assert list(table.names) == ["Person", "Umbrella"]
+
+def test_detection_output_is_zero_copy():
+    """Boxes and scores of an OpenCV DetectionOutput are views, not copies"""
+    table = LabelTable()
+    out = np.array([[[[0, 1, 0.9, 0.1, 0.2, 0.5, 0.6], [0, 2, 0.4, 0.5, 0.5, 0.9, 1.1]]]], dtype=np.float32)
+    dets = Detections.from_detection_output(out, ["background", "person", "umbrella"], table=table)
+    assert np.shares_memory(dets.boxes, out) and np.shares_memory(dets.scores, out)
+    assert dets.label_names() == ["person", "umbrella"]
+    assert dets.clipped().boxes[1, 3] == 1.0 and dets.boxes[1, 3] > 1.0
+
+def test_filter_iou_nms():
+    """Vectorized filter, IoU and per-label NMS match the per-dict versions"""
+    table = LabelTable()
+    raw = random_dicts(300, 0)
+    dets = Detections.from_dicts(raw, table=table)
+    f = dets.filter(min_score=0.5, labels=["person", table.intern("dog")])
+    expect = [d for d in raw if d["score"] >= 0.5 and d["object"] in ("person", "dog")]
+    assert f.label_names() == [d["object"] for d in expect]
+    assert len(dets.filter(labels=["giraffe"])) == 0
+    m = dets[:20].iou(dets[:30])
+    assert m.shape == (20, 30)
+    assert abs(m[3, 7] - bbox_iou(raw[3]["bbox"], raw[7]["bbox"])) < 1e-5
+    ref = np.array([[bbox_iou(a["bbox"], b["bbox"]) for b in raw[:30]] for a in raw[:20]])
+    assert np.allclose(box_iou([d["bbox"] for d in raw[:20]], [d["bbox"] for d in raw[:30]]), ref, atol=1e-5)
+    assert np.array_equal(m, box_iou(dets.boxes[:20], dets.boxes[:30]))
+    for thr in (0.1, 0.3, 0.5):
+        assert list(dets.nms_indices(thr)) == reference_nms(raw, thr)
+    # across labels, overlapping boxes suppress each other too
+    two = Detections(np.array([[0, 0, 1, 1], [0, 0, 1, 1]]), np.array([0.9, 0.8]),
+                     table.intern_many(["person", "dog"]), table=table)
+    assert len(two.nms(0.5)) == 2 and len(two.nms(0.5, per_label=False)) == 1
+
+def test_merge_across_frames():
+    """Merging keeps one box per object seen in several frames"""
+    shared, other = LabelTable(), LabelTable()
+    a = Detections.from_dicts([{"object": "person", "score": 0.7, "bbox": [0.1, 0.1, 0.3, 0.5]}], 1, shared)
+    b = Detections.from_dicts([{"object": "car", "score": 0.5, "bbox": [0.6, 0.6, 0.9, 0.9]},
+                               {"object": "person", "score": 0.9, "bbox": [0.11, 0.1, 0.31, 0.5]}], 2, other)
+    merged = Detections.merge([a, b])
+    assert merged.table is shared and merged.label_names() == ["person", "car", "person"]
+    assert list(merged.frames) == [1, 2, 2]
+    dedup = Detections.merge([a, b], iou_threshold=0.5)
+    assert dedup.label_names() == ["person", "car"] and list(dedup.frames) == [2, 2]
+    assert len(Detections.merge([])) == 0
+    # an explicit table is used even while it is still empty
+    fresh = LabelTable()
+    into = Detections.merge([a, b], table=fresh)
+    assert into.table is fresh and into.label_names() == ["person", "car", "person"]
+    assert Detections.merge([], table=fresh).table is fresh
+
+def test_speed_vs_dicts():
+    """Filter + NMS on arrays instead of Python over dicts"""
+    raw = random_dicts(2000, 1)
+    dets = Detections.from_dicts(raw, table=LabelTable())
+    t0 = time.perf_counter()
+    fast = dets.filter(min_score=0.3).nms(0.5)
+    t_arr = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    kept = [d for d in raw if d["score"] >= 0.3]
+    slow = [kept[i] for i in reference_nms(kept, 0.5)]
+    t_dict = time.perf_counter() - t0
+    print(f"2000 detections filter+NMS: arrays {t_arr * 1e3:.1f} ms, dicts {t_dict * 1e3:.1f} ms")
+    assert fast.label_names() == [d["object"] for d in slow]
+    assert t_arr < t_dict
+
+if __name__ == "__main__":
+    test_round_trip_and_vision_response()
+    test_detection_output_is_zero_copy()
+    test_filter_iou_nms()
+    test_merge_across_frames()
+    test_speed_vs_dicts()
+    print("Test completed!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test file for the pipelined 360 deg survey in controller.observe_surrounding
+(stub drone and stub genai client, no network)
+"""
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# controller builds its client and frame folder at import time
+os.environ.setdefault("GENAI_API_KEY", "test-key")
+_workdir = tempfile.TemporaryDirectory()
+_cwd = os.getcwd()
+os.chdir(_workdir.name)
+import controller
+os.chdir(_cwd)
+controller.save_path = os.path.join(_workdir.name, "frame")
+from frame import default_archiver
+from upload_cache import UploadCache
+from test_upload_cache import StubClient
+
+TURN_S = 0.1
+UPLOAD_S = 0.15
+
+class StubReader:
+    background = True
+    def __init__(self):
+        self.n = 0
+    def latest(self):
+        self.n += 1
+        img = np.full((120, 160, 3), self.n, dtype=np.uint8)
+        return self.n, time.time(), img
+
+class StubTello:
+    def __init__(self):
+        self.reader = StubReader()
+        self.turns = 0
+        self.intervals = []  # (start, end) of each turn
+    def turn_cw(self, degree):
+        t0 = time.perf_counter()
+        time.sleep(TURN_S)
+        self.turns += 1
+        self.intervals.append((t0, time.perf_counter()))
+        return True, False
+    def get_frame_reader(self, background=False):
+        return self.reader
+
+class StubModels:
+    def __init__(self):
+        self.calls = []
+    def generate_content(self, model, contents):
+        self.calls.append((time.perf_counter(), contents))
+        return type("Response", (), {"text": "move_forward 50"})()
+
+class TimedFiles:
+    """client.files that records the (start, end) of each upload"""
+    def __init__(self, files):
+        self.files = files
+        self.uploads = files.uploads
+        self.intervals = []
+    def upload(self, **kwargs):
+        t0 = time.perf_counter()
+        out = self.files.upload(**kwargs)
+        self.intervals.append((t0, time.perf_counter()))
+        return out
+
+def run_survey(pipelined):
+    stub = StubClient(latency=UPLOAD_S)
+    stub.files = TimedFiles(stub.files)
+    stub.models = StubModels()
+    controller.client = stub
+    controller.uploads = UploadCache(stub, inline_max_bytes=0)
+    tello = StubTello()
+    out = controller.observe_surrounding(tello, pipelined=pipelined)
+    assert out == "move_forward 50" and tello.turns == 4
+    (called, contents), = stub.models.calls
+    # four images in direction order, then the prompt
+    assert [f.name for f in contents[:4]] == ["files/1", "files/2", "files/3", "files/4"]
+    assert len(stub.files.uploads) == 4
+    assert all(end <= called for _, end in stub.files.intervals)
+    return tello.intervals, stub.files.intervals
+
+def test_pipelined_survey():
+    """Uploads overlap the turns that follow them; sequentially they wait for the rotation"""
+    turns, uploads = run_survey(pipelined=False)
+    assert all(start >= turns[-1][1] for start, _ in uploads)
+    turns, uploads = run_survey(pipelined=True)
+    # each image is uploaded while the drone turns to the next heading
+    for (start, end), (turn_start, turn_end) in zip(uploads, turns[1:]):
+        assert start < turn_end and turn_start < end
+    default_archiver().flush(timeout=5)
+
+if __name__ == "__main__":
+    test_pipelined_survey()
+    print("Test completed!")
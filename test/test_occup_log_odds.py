@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test file for log-odds occupancy fusion in OccupancyGrid.update_occup_map
+"""
+import sys
+import os
+import math
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, Cell
+
+def test_single_beam():
+    """A beam clears the cells it crosses and marks its endpoint"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    # facing North (+y), wall 1 m ahead
+    for _ in range(3):
+        om.update_occup_map([1.0], bearings=[0.0], max_range_m=4.0)
+    assert om.grid[c + 10, c] == Cell.OBSTACLE
+    assert np.all(om.grid[c:c + 10, c] == Cell.FREE)
+    assert om.grid[c + 11, c] == Cell.UNKNOWN
+    assert np.isclose(om.log_odds[c + 10, c], om.L_OCC * 3)
+    # a max-range beam has no endpoint
+    om.update_occup_map([4.0], bearings=[math.pi / 2], max_range_m=4.0)
+    assert om.log_odds[c, c + 41] == 0.0
+    assert om.log_odds[c, c + 39] < 0.0
+
+def test_clamping_and_visited():
+    """Log-odds stay clamped and VISITED cells are kept unless an obstacle shows up"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    om.grid[c + 5, c] = Cell.VISITED
+    for _ in range(20):
+        om.update_occup_map([1.0], bearings=[0.0])
+    assert om.log_odds.max() == np.float32(om.L_MAX)
+    assert om.log_odds.min() == np.float32(om.L_MIN)
+    assert om.grid[c + 5, c] == Cell.VISITED
+    # the wall moved closer: the old free cell now ends the beam
+    for _ in range(20):
+        om.update_occup_map([0.5], bearings=[0.0])
+    assert om.grid[c + 5, c] == Cell.OBSTACLE
+
+def test_full_scan_speed():
+    """A full 82 deg scan is a single batched update"""
+    om = OccupancyGrid(50, 50, 0.05)
+    om.curr_point.yaw = 0.3
+    ranges = np.random.default_rng(0).uniform(0.5, 4.0, 82)
+    om.update_occup_map(ranges, fov_deg=82.0, max_range_m=4.0)
+    t0 = time.perf_counter()
+    n = 50
+    for _ in range(n):
+        om.update_occup_map(ranges, fov_deg=82.0, max_range_m=4.0)
+    dt = (time.perf_counter() - t0) / n
+    print(f"82-beam scan: {dt * 1e6:.0f} us")
+    assert (om.grid == Cell.OBSTACLE).sum() > 0
+    assert (om.grid == Cell.FREE).sum() > 0
+
+if __name__ == "__main__":
+    test_single_beam()
+    test_clamping_and_visited()
+    test_full_scan_speed()
+    print("Test completed!")
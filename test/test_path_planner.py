@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Test file for the D* Lite planner and command compression in path_planner.py
+"""
+import sys
+import os
+import math
+import heapq
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, Cell
+from path_planner import DStarLitePlanner, NEIGHBORS, path_to_commands, simplify_path, plan_commands, line_is_free
+from tello_wrapper import MOVEMENT_MIN
+
+def path_cost(grid, path):
+    cost = 0
+    for (x0, y0), (x1, y1) in zip(path[:-1], path[1:]):
+        assert max(abs(x1 - x0), abs(y1 - y0)) == 1
+        assert grid[y1, x1] != Cell.OBSTACLE
+        cost += 14 if x0 != x1 and y0 != y1 else 10
+    return cost
+
+def dijkstra_cost(grid, start, goal):
+    # reference search with the same costs and corner rule
+    N = grid.shape[0]
+    blocked = (grid == Cell.OBSTACLE).tolist()
+    free = lambda x, y: 0 <= x < N and 0 <= y < N and not blocked[y][x]
+    dist = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        d, (x, y) = heapq.heappop(heap)
+        if (x, y) == goal:
+            return d
+        if d > dist[(x, y)]:
+            continue
+        for dx, dy, step in NEIGHBORS:
+            if not free(x + dx, y + dy):
+                continue
+            if dx and dy and not (free(x + dx, y) and free(x, y + dy)):
+                continue
+            nd = d + step
+            if nd < dist.get((x + dx, y + dy), math.inf):
+                dist[(x + dx, y + dy)] = nd
+                heapq.heappush(heap, (nd, (x + dx, y + dy)))
+    return None
+
+def test_replanning_matches_dijkstra():
+    """Incremental replans stay optimal while cells change and the drone moves"""
+    rng = np.random.default_rng(3)
+    om = OccupancyGrid(3, 3, 0.1)   # 60 x 60 cells
+    N = om.map_size_N
+    om.grid[rng.random((N, N)) < 0.2] = Cell.OBSTACLE
+    start, goal = (2, 2), (N - 3, N - 3)
+    om.grid[start[1], start[0]] = om.grid[goal[1], goal[0]] = Cell.FREE
+    planner = DStarLitePlanner(om)
+    for step in range(15):
+        path = planner.plan(start, goal)
+        ref = dijkstra_cost(om.grid, start, goal)
+        if ref is None:
+            assert path is None
+        else:
+            assert path[0] == start and path[-1] == goal
+            assert path_cost(om.grid, path) == ref
+        if path is not None and len(path) > 3:
+            start = path[2]
+        # flip a few cells, never the drone's or the goal's
+        changed = []
+        for _ in range(6):
+            x, y = (int(v) for v in rng.integers(0, N, 2))
+            if (x, y) in (start, goal):
+                continue
+            om.grid[y, x] = Cell.FREE if om.grid[y, x] == Cell.OBSTACLE else Cell.OBSTACLE
+            changed.append((x, y))
+        if step % 2 and changed:
+            # a dirty box (as from the map's change log) instead of the cell list
+            xs, ys = zip(*changed)
+            planner.update_region(min(ys), max(ys), min(xs), max(xs))
+        else:
+            planner.update_cells(changed)
+
+def test_goal_change_keeps_window():
+    """A new goal re-roots the search without re-reading the map, and stays optimal"""
+    rng = np.random.default_rng(5)
+    om = OccupancyGrid(3, 3, 0.1)
+    N = om.map_size_N
+    om.grid[rng.random((N, N)) < 0.2] = Cell.OBSTACLE
+    planner = DStarLitePlanner(om)
+    start = (2, 2)
+    for _ in range(8):
+        goal = tuple(int(v) for v in rng.integers(0, N, 2))
+        om.grid[start[1], start[0]] = om.grid[goal[1], goal[0]] = Cell.FREE
+        planner.update_cells([start, goal])
+        path = planner.plan(start, goal)
+        ref = dijkstra_cost(om.grid, start, goal)
+        assert (path is None) if ref is None else path_cost(om.grid, path) == ref
+        changed = [tuple(int(v) for v in rng.integers(0, N, 2)) for _ in range(5)]
+        for x, y in changed:
+            om.grid[y, x] = Cell.OBSTACLE
+        planner.update_cells(changed)
+    assert planner.window_builds == 1
+
+def test_replan_is_local_on_large_grid():
+    """Small changes on a 1000 x 1000 map are repaired by re-expanding a few cells"""
+    om = OccupancyGrid(50, 50, 0.1)
+    assert om.map_size_N == 1000
+    c = om.center_offset
+    om.grid[c + 20, c - 30:c + 30] = Cell.OBSTACLE
+    planner = DStarLitePlanner(om)
+    path = planner.plan((c, c), (c, c + 60))
+    assert path is not None
+    first = planner.expansions
+    for k in (10, 20, 30):
+        x, y = path[k + 10]
+        om.grid[y, x - 1:x + 2] = Cell.OBSTACLE
+        planner.update_cells([(x - 1, y), (x, y), (x + 1, y)])
+        path = planner.plan(path[k], (c, c + 60))
+        assert path is not None
+        assert all(om.grid[py, px] != Cell.OBSTACLE for px, py in path)
+        assert planner.expansions < first / 4
+    assert planner.window_builds == 1
+
+def test_commands():
+    """Waypoints compress into the fewest turn/move primitives"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    # straight line north: no turn, split at MOVEMENT_MAX
+    assert path_to_commands([(c, c), (c, c + 50)], 0.0, 0.1) == [("move_forward", 250), ("move_forward", 250)]
+    # east with strafing allowed or not
+    assert path_to_commands([(c, c), (c + 10, c)], 0.0, 0.1) == [("move_right", 100)]
+    assert path_to_commands([(c, c), (c + 10, c)], 0.0, 0.1, allow_strafe=False) == \
+        [("turn_cw", 90), ("move_forward", 100)]
+    # collinear cells collapse into one leg
+    path = [(c, c + i) for i in range(21)]
+    assert simplify_path(om, path) == [(c, c), (c, c + 20)]
+    # around a wall
+    om.grid[c + 5, c - 3:c + 4] = Cell.OBSTACLE
+    planner = DStarLitePlanner(om)
+    om.curr_point.x, om.curr_point.y, om.curr_point.yaw = float(c), float(c), 0.0
+    cmds = plan_commands(planner, (c, c + 10))
+    print(cmds)
+    assert cmds is not None and 2 <= len(cmds) <= 4
+    assert all(name in ("turn_cw", "turn_ccw", "move_forward", "move_left", "move_right", "move_backward")
+               for name, _ in cmds)
+
+def test_no_move_below_minimum():
+    """Legs shorter than MOVEMENT_MIN are carried forward, never rounded up"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    assert path_to_commands([(c, c), (c, c + 1)], 0.0, 0.1) == []
+    # a one-cell jog: dropped, the next leg starts from where the drone is
+    cmds = path_to_commands([(c, c), (c + 1, c), (c + 1, c + 10)], 0.0, 0.1)
+    assert cmds[-1] == ("move_forward", 100) and len(cmds) == 2 and cmds[0][0] == "turn_cw"
+    # the jog goes around a wall end, so it is stretched to MOVEMENT_MIN instead
+    om.grid[c + 1:c + 5, c] = Cell.OBSTACLE
+    cmds = path_to_commands([(c, c), (c + 1, c), (c + 1, c + 10)], 0.0, 0.1, om=om)
+    assert cmds[0] == ("move_right", MOVEMENT_MIN)
+    # random maps: every planned move can be flown as is
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        om = OccupancyGrid(6, 6, 0.1)
+        c = om.center_offset
+        om.grid[c - 25:c + 25, c - 25:c + 25][rng.random((50, 50)) < 0.25] = Cell.OBSTACLE
+        om.grid[c, c] = Cell.FREE
+        om.curr_point.x, om.curr_point.y, om.curr_point.yaw = float(c), float(c), rng.uniform(-np.pi, np.pi)
+        planner = DStarLitePlanner(om)
+        for _ in range(10):
+            goal = (c + int(rng.integers(-20, 21)), c + int(rng.integers(-20, 21)))
+            om.grid[goal[1], goal[0]] = Cell.FREE
+            planner.update_cells([goal])
+            for name, value in plan_commands(planner, goal) or []:
+                assert name.startswith("turn_") or value >= MOVEMENT_MIN, (name, value)
+
+def test_line_of_sight_no_corner_cutting():
+    """A shortcut may not slip diagonally past an obstacle corner"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    om.grid[c, c + 1] = Cell.OBSTACLE
+    assert not line_is_free(om, (c, c), (c + 1, c + 1))
+    assert not line_is_free(om, (c, c), (c + 3, c + 3))
+    assert line_is_free(om, (c, c + 1), (c + 3, c + 3))
+    assert not line_is_free(om, (c, c - 1), (c + 2, c + 2))  # crosses the cell itself
+    # a simplified planner path only uses moves the planner allows
+    om.grid[c + 2:c + 10, c + 1] = Cell.OBSTACLE
+    planner = DStarLitePlanner(om)
+    path = planner.plan((c, c), (c + 4, c + 4))
+    assert path is not None
+    simple = simplify_path(om, path)
+    assert all(line_is_free(om, a, b) for a, b in zip(simple[:-1], simple[1:]))
+
+if __name__ == "__main__":
+    test_replanning_matches_dijkstra()
+    test_goal_change_keeps_window()
+    test_replan_is_local_on_large_grid()
+    test_commands()
+    test_no_move_below_minimum()
+    test_line_of_sight_no_corner_cutting()
+    print("Test completed!")
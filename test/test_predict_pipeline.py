@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Test file for the pipelined control loop in drone_controller.MovementPipeline
+(stub drone and stub perception, no network)
+"""
+import sys
+import os
+import time
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GENAI_API_KEY", "test-key")
+import math
+from drone_controller import (MovementPipeline, Scorer, Selector, Perception, predict_movement,
+                              integrate_move, decide_move, apply_perception, _COMMAND_DELTAS)
+from occupancy_map import OccupancyGrid, ValueMap, Cell
+from frame import Frame
+from path_planner import path_to_commands
+
+MOVE_S = 0.2
+DETECT_S = 0.1
+LLM_S = 0.2
+
+class StubReader:
+    background = True
+    def __init__(self):
+        self.n = 0
+    def latest(self):
+        self.n += 1
+        return self.n, time.time(), np.full((90, 120, 3), self.n % 256, dtype=np.uint8)
+
+class StubTello:
+    def __init__(self, fail_at=None):
+        self.reader = StubReader()
+        self.moves = []
+        self.intervals = []  # (start, end) of each move
+        self.fail_at = fail_at
+    def get_frame_reader(self, background=False):
+        return self.reader
+    def _move(self, name, value):
+        if self.fail_at is not None and len(self.moves) == self.fail_at:
+            raise RuntimeError("no response from drone")
+        t0 = time.perf_counter()
+        time.sleep(MOVE_S)
+        self.moves.append((name, value))
+        self.intervals.append((t0, time.perf_counter()))
+        return True, False
+    def __getattr__(self, name):
+        if name.startswith(("move_", "turn_")):
+            return lambda value: self._move(name, value)
+        raise AttributeError(name)
+
+class StubScorer(Scorer):
+    def __init__(self, executor, llm_s=LLM_S):
+        super().__init__(executor)
+        self.llm_s = llm_s
+        self.applied = []
+        self.applied_poses = []
+        self.om = None
+        self.intervals = {}  # (stage, frame id) -> (start, end)
+    def _stage(self, name, frame, seconds):
+        t0 = time.perf_counter()
+        time.sleep(seconds)
+        self.intervals[name, frame.frame_id] = (t0, time.perf_counter())
+    def detect_objects(self, frame):
+        self._stage("detect", frame, DETECT_S)
+        return [{"object": "person", "frame": frame.frame_id}]
+    def _request_llm(self, frame, instruction):
+        self._stage("llm", frame, self.llm_s)
+        return [{"object": "umbrella", "frame": frame.frame_id}]
+    def measure_coordinate_and_store(self, detections):
+        self.applied.append(detections[0]["frame"])
+        if self.om is not None:
+            p = self.om.curr_point
+            self.applied_poses.append((p.x, p.y, p.yaw))
+
+def make_maps():
+    om = OccupancyGrid(50, 50, 0.1)
+    return om, ValueMap.from_occupancy(om)
+
+def overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+def test_pipeline_overlaps_perception():
+    """Perception of frame N runs while move N is flown; serially it finishes first"""
+    n = 6
+    for mode in ("serial", "pipelined"):
+        executor = ThreadPoolExecutor(max_workers=2)
+        om, vm = make_maps()
+        scorer = StubScorer(executor)
+        scorer.decisions.max_distance = -1  # every frame is a new view
+        tello = StubTello()
+        pipeline = MovementPipeline(tello, om, vm, scorer, Selector()) if mode == "pipelined" else None
+        for _ in range(n):
+            if pipeline is not None:
+                pipeline.step()
+            else:
+                predict_movement(tello, om, vm, scorer, Selector())
+        executor.shutdown(wait=True)
+        assert len(tello.moves) == n
+        assert scorer.applied == [f for f in range(1, n + 1) for _ in range(2)]
+        if pipeline is not None:
+            assert pipeline.stats["applied"] == n and pipeline.stats["late"] == 0
+        for i, move in enumerate(tello.intervals):
+            stages = [scorer.intervals[stage, i + 1] for stage in ("detect", "llm")]
+            if mode == "serial":
+                assert all(end <= move[0] for _, end in stages)
+            else:
+                assert all(overlaps(stage, move) for stage in stages)
+                # frame N is applied before move N + 1 starts
+                if i + 1 < n:
+                    assert all(end <= tello.intervals[i + 1][0] for _, end in stages)
+
+def test_results_cast_from_capture_pose():
+    """Frame N is applied before move N is integrated into the pose"""
+    executor = ThreadPoolExecutor(max_workers=2)
+    om, vm = make_maps()
+    scorer = StubScorer(executor)
+    scorer.om = om
+    pipeline = MovementPipeline(StubTello(), om, vm, scorer, Selector())
+    poses = []
+    for _ in range(3):
+        p = om.curr_point
+        poses.append((p.x, p.y, p.yaw))
+        pipeline.step()
+    executor.shutdown(wait=True)
+    assert scorer.applied_poses == [pose for pose in poses for _ in range(2)]
+    assert (om.curr_point.x, om.curr_point.y, om.curr_point.yaw) != poses[0]
+
+def test_deadlines():
+    """Late stages are dropped, the stages that made it are still applied"""
+    executor = ThreadPoolExecutor(max_workers=2)
+    om, vm = make_maps()
+    scorer = StubScorer(executor, llm_s=0.6)
+    scorer.decisions.max_distance = -1
+    pipeline = MovementPipeline(StubTello(), om, vm, scorer, Selector(), llm_deadline_s=0.3)
+    pipeline.step()
+    assert pipeline.stats["late"] == 1 and pipeline.stats["applied"] == 1
+    assert scorer.applied == [1]  # detections only, the LLM stage missed its deadline
+    executor.shutdown(wait=True)
+
+def test_failed_move_cancels_inflight():
+    """An exception while flying cancels the requests still queued"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    om, vm = make_maps()
+    scorer = StubScorer(executor)
+    blocker = threading.Event()
+    executor.submit(blocker.wait)  # keeps the worker busy, so frame 1 stays queued
+    pipeline = MovementPipeline(StubTello(fail_at=0), om, vm, scorer, Selector())
+    try:
+        pipeline.step()
+        assert False, "the move should have raised"
+    except RuntimeError:
+        pass
+    blocker.set()
+    assert pipeline.stats["cancelled"] == 2 and pipeline.inflight is None
+    executor.shutdown(wait=True)
+    assert scorer.applied == []
+
+def test_integrated_pose_follows_commands():
+    """Turning and moving lands the map pose where the planner aimed"""
+    om, vm = make_maps()
+    x0, y0 = om.curr_point.x, om.curr_point.y
+    integrate_move(om, vm, _COMMAND_DELTAS["turn_cw"](90))
+    integrate_move(om, vm, _COMMAND_DELTAS["move_forward"](100))
+    assert abs(om.curr_point.x - (x0 + 10)) < 1e-9 and abs(om.curr_point.y - y0) < 1e-9  # East
+    integrate_move(om, vm, _COMMAND_DELTAS["move_right"](50))
+    assert abs(om.curr_point.x - (x0 + 10)) < 1e-9 and abs(om.curr_point.y - (y0 - 5)) < 1e-9  # South
+    assert (vm.curr_point.x, vm.curr_point.y) == (om.curr_point.x, om.curr_point.y)
+    for allow_strafe in (False, True):
+        for yaw_deg in (0, 45, 90, -135):
+            om, vm = make_maps()
+            om.curr_point.yaw = vm.curr_point.yaw = math.radians(yaw_deg)
+            start = (int(om.curr_point.x), int(om.curr_point.y))
+            for goal in ((start[0] + 20, start[1]), (start[0] - 7, start[1] + 7), (start[0], start[1] - 12)):
+                om.curr_point.x, om.curr_point.y = float(start[0]), float(start[1])
+                for name, value in path_to_commands([start, goal], om.curr_point.yaw, om.cell_size, allow_strafe):
+                    integrate_move(om, vm, _COMMAND_DELTAS[name](value))
+                assert abs(om.curr_point.x - goal[0]) < 0.6 and abs(om.curr_point.y - goal[1]) < 0.6
+
+def test_decide_move_approaches_target():
+    """A person straight ahead gives a planned move towards it, around obstacles"""
+    om, vm = make_maps()
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    p = Perception(Frame(np.zeros((8, 8, 3), dtype=np.uint8)), (om.curr_point.x, om.curr_point.y, 0.0), 0.0)
+    p.detections = [{"object": "person", "score": 0.95, "bbox": [0.45, 0.2, 0.55, 0.8]}]
+    apply_perception(om, vm, scorer, p)
+    selector = Selector()
+    assert decide_move(om, vm, selector)[0] == "move_forward"
+
+    # wall right in front of the drone: the planner goes around it
+    cx, cy = int(om.curr_point.x), int(om.curr_point.y)
+    om.grid[cy + 1, cx - 2:cx + 3] = Cell.OBSTACLE
+    om.mark_dirty(cy + 1, cy + 1, cx - 2, cx + 2)
+    name, _ = decide_move(om, vm, selector)
+    assert name in ("turn_cw", "turn_ccw", "move_left", "move_right")
+    assert selector.planner is not None and selector.planner.goal is not None
+
+    # obstacles and visited cells are read from the occupancy grid
+    coords, values, _ = selector.select_free_points(vm, om.curr_point, occupancy_grid=om)
+    assert len(coords) and all(om.grid[y, x] not in (Cell.OBSTACLE, Cell.VISITED) for y, x in coords)
+    assert all((y, x) != (cy, cx) for y, x in coords) and np.all(values > 0)
+
+def test_decide_move_keeps_goal():
+    """The goal persists while the drone flies to it, so the planner only repairs its search"""
+    om, vm = make_maps()
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    selector = Selector()
+    # nothing seen yet: no zero-value cell is a target, the drone searches
+    assert decide_move(om, vm, selector) == ("turn_cw", 90) and selector.goal is None
+
+    p = Perception(Frame(np.zeros((8, 8, 3), dtype=np.uint8)), (om.curr_point.x, om.curr_point.y, 0.0), 0.0)
+    p.detections = [{"object": "person", "score": 0.95, "bbox": [0.45, 0.3, 0.55, 0.75]}]  # ~3 m ahead
+    apply_perception(om, vm, scorer, p)
+    command = decide_move(om, vm, selector)
+    goal = selector.goal
+    assert command[0] == "move_forward" and goal is not None and goal[1] > om.curr_point.y + 10
+    for _ in range(4):
+        integrate_move(om, vm, _COMMAND_DELTAS[command[0]](command[1]))
+        command = decide_move(om, vm, selector)
+        if selector.goal != goal:
+            break
+        assert selector.planner.goal == goal
+    assert selector.planner.window_builds == 1  # one planner, repaired in place
+    assert abs(om.curr_point.x - goal[0]) <= 2 and abs(om.curr_point.y - goal[1]) <= 2
+
+    # a goal that became an obstacle is dropped
+    selector.goal = (goal[0], goal[1] + 5)
+    om.grid[goal[1] + 5, goal[0]] = Cell.OBSTACLE
+    om.mark_dirty(goal[1] + 5, goal[1] + 5, goal[0], goal[0])
+    decide_move(om, vm, selector)
+    assert selector.goal != (goal[0], goal[1] + 5)
+
+if __name__ == "__main__":
+    test_pipeline_overlaps_perception()
+    test_results_cast_from_capture_pose()
+    test_deadlines()
+    test_failed_move_cancels_inflight()
+    test_integrated_pose_follows_commands()
+    test_decide_move_approaches_target()
+    test_decide_move_keeps_goal()
+    print("Test completed!")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test file for the tiled (sparse) storage mode of OccupancyGrid/ValueMap
+"""
+import sys
+import os
+import math
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiled_grid import TiledArray
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D, Cell
+
+def test_tiled_array_indexing():
+    """TiledArray behaves like a dense array for scalar, slice and fancy indexing"""
+    dense = np.zeros((100, 100), dtype=np.float32)
+    tiled = TiledArray((100, 100), np.float32, tile_size=16)
+    rng = np.random.default_rng(0)
+    ys = rng.integers(0, 100, 500)
+    xs = rng.integers(0, 100, 500)
+    vals = rng.random(500).astype(np.float32)
+    dense[ys, xs] = vals
+    tiled[ys, xs] = vals
+    dense[10:40, 5:25] = 2.0
+    tiled[10:40, 5:25] = 2.0
+    dense[3, 97] = 7.0
+    tiled[3, 97] = 7.0
+    assert tiled[3, 97] == 7.0
+    assert np.array_equal(tiled[ys, xs], dense[ys, xs])
+    assert np.array_equal(tiled[0:100, 0:100], dense)
+    assert np.array_equal(tiled[12], dense[12])
+    assert np.array_equal(tiled.to_dense(), dense)
+    # missing tiles read as fill, negative indices are real coordinates
+    empty = TiledArray((10, 10), np.int8, fill=Cell.UNKNOWN, tile_size=8)
+    assert empty[-50, 1000] == Cell.UNKNOWN
+    empty[-50, 1000] = Cell.VISITED
+    assert empty[-50, 1000] == Cell.VISITED
+    assert len(empty.tiles) == 1
+
+def test_tiled_comparisons_and_masks():
+    """grid == value, np.argwhere and boolean masks give the dense results"""
+    dense = ValueMap(5, 5, 0.1)
+    tiled = ValueMap(5, 5, 0.1, storage="tiled", tile_size=16)
+    for vm in (dense, tiled):
+        vm.update_visited_in_occup_grid(Pose2D(vm.curr_point.x + 12, vm.curr_point.y + 7, 0.0), vm.curr_point)
+        vm.grid[3:6, 40:44] = Cell.OBSTACLE
+        vm.update_value_map(0.6, Pose2D(0.0, 0.0, 0.0), max_range_m=8)
+    for cell in (Cell.OBSTACLE, Cell.VISITED, Cell.UNKNOWN):
+        assert np.array_equal(tiled.grid == cell, dense.grid == cell)
+        assert np.array_equal(tiled.grid != cell, dense.grid != cell)
+        assert np.array_equal(np.argwhere(tiled.grid == cell), np.argwhere(dense.grid == cell))
+    mask = dense.grid == Cell.VISITED
+    assert np.array_equal(tiled.value[tiled.grid == Cell.VISITED], dense.value[mask])
+    assert np.array_equal(tiled.value[mask], dense.value[mask])
+    dense.value[mask] = 0.25
+    tiled.value[tiled.grid == Cell.VISITED] = 0.25
+    assert np.array_equal(np.asarray(tiled.value), dense.value)
+    assert np.array_equal(tiled.grid, dense.grid)
+    # the comparison stays tiled and sees cells allocated past the nominal bounds
+    big = TiledArray((2000, 2000), np.int8, fill=Cell.UNKNOWN, tile_size=16)
+    big[5, 7] = Cell.OBSTACLE
+    big[-40, 2100] = Cell.OBSTACLE
+    mask = big == Cell.OBSTACLE
+    assert isinstance(mask, TiledArray) and mask.nbytes == 2 * 16 * 16
+    assert np.argwhere(mask).tolist() == [[-40, 2100], [5, 7]]
+    assert (big != Cell.OBSTACLE)[-40, 2099] and not (big != Cell.OBSTACLE)[-40, 2100]
+    big[mask] = Cell.FREE
+    assert big[-40, 2100] == Cell.FREE and big[5, 7] == Cell.FREE and not (big == Cell.OBSTACLE).any()
+    try:
+        tiled.value[np.ones((3, 3), dtype=bool)]
+        assert False, "a mask of the wrong shape should be rejected"
+    except IndexError:
+        pass
+
+def test_tiled_value_map_matches_dense():
+    """Tiled maps produce the same values as dense ones and only allocate touched tiles"""
+    dense = ValueMap(50, 50, 0.05)
+    tiled = ValueMap(50, 50, 0.05, storage="tiled", tile_size=32)
+    pose = Pose2D(x=30.0, y=10.0, yaw=0.0)
+    moves = [Pose2D(0.0, 40.0, 0.0), Pose2D(0.0, 0.0, math.pi / 3), Pose2D(25.0, 60.0, 0.0)]
+    for delta in moves:
+        for vm in (dense, tiled):
+            prev = Pose2D(vm.curr_point.x, vm.curr_point.y, vm.curr_point.yaw)
+            vm.update_drone_pos_and_ori(delta)
+            vm.update_visited_in_occup_grid(vm.curr_point, prev)
+            vm.update_value_map(0.7, pose, max_range_m=20)
+    assert np.array_equal(tiled.value.to_dense(), dense.value)
+    assert np.array_equal(tiled.conf.to_dense(), dense.conf)
+    assert np.array_equal(tiled.n.to_dense(), dense.n)
+    assert np.array_equal(tiled.grid.to_dense(), dense.grid)
+    assert tiled.find_optimal_point(pose, max_range_m=20) == dense.find_optimal_point(pose, max_range_m=20)
+    assert tiled.value.nbytes < dense.value.nbytes / 100
+    print(f"dense: {dense.value.nbytes} bytes/layer, tiled: {tiled.value.nbytes} bytes/layer")
+
+def test_tiled_map_grows_past_bounds():
+    """A tiled map keeps the real position instead of clamping it at the edge"""
+    om = OccupancyGrid(1, 1, 0.1, storage="tiled", tile_size=8)
+    assert om.map_size_N == 20
+    prev = Pose2D(om.curr_point.x, om.curr_point.y, om.curr_point.yaw)
+    om.update_drone_pos_and_ori(Pose2D(x=0.0, y=300.0, yaw=0.0))
+    assert om.curr_point.y == om.center_offset + 30
+    om.update_visited_in_occup_grid(om.curr_point, prev)
+    end = om.world_to_cells(om.curr_point.x, om.curr_point.y)
+    assert end is not None
+    assert om.grid[end[1], end[0]] == Cell.VISITED
+
+    # dense maps still clamp
+    dm = OccupancyGrid(1, 1, 0.1)
+    dm.update_drone_pos_and_ori(Pose2D(x=0.0, y=300.0, yaw=0.0))
+    assert dm.curr_point.y == dm.map_size_N - 1
+
+if __name__ == "__main__":
+    test_tiled_array_indexing()
+    test_tiled_comparisons_and_masks()
+    test_tiled_value_map_matches_dense()
+    test_tiled_map_grows_past_bounds()
+    print("Test completed!")
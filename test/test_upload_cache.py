@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test file for the content-hash upload cache (upload_cache.py), against a
+local stub of the genai client (no network)
+"""
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.genai import types
+from frame import Frame
+from upload_cache import UploadCache, EXPIRY_MARGIN_S
+
+class StubFiles:
+    """client.files with upload() recorded locally; files expire after `lifetime`"""
+    def __init__(self, lifetime=timedelta(hours=48), latency=0.0):
+        self.uploads = []
+        self.lifetime = lifetime
+        self.latency = latency
+    def upload(self, *, file, config=None):
+        time.sleep(self.latency)
+        data = file.read()
+        self.uploads.append(data)
+        return types.File(name=f"files/{len(self.uploads)}", mime_type=config.mime_type,
+                          size_bytes=len(data), expiration_time=datetime.now(timezone.utc) + self.lifetime)
+
+class StubClient:
+    def __init__(self, **kwargs):
+        self.files = StubFiles(**kwargs)
+
+def random_bytes(n, seed):
+    return np.random.default_rng(seed).integers(0, 256, n, dtype=np.uint8).tobytes()
+
+def test_reuse_and_inline():
+    """Same content is uploaded once; small images go inline"""
+    client = StubClient()
+    cache = UploadCache(client, inline_max_bytes=1000)
+    big = random_bytes(5000, 0)
+    f1 = cache.part(big)
+    f2 = cache.part(bytes(big))
+    assert isinstance(f1, types.File) and f1 is f2
+    assert len(client.files.uploads) == 1 and cache.hits == 1 and cache.misses == 1
+    small = cache.part(random_bytes(100, 1), mime_type="image/png")
+    assert isinstance(small, types.Part) and small.inline_data.mime_type == "image/png"
+    assert len(client.files.uploads) == 1 and cache.inlined == 1
+    # paths and frames are keyed by their bytes too
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "a.jpg")
+        with open(path, "wb") as f:
+            f.write(big)
+        assert cache.upload(path) is f1
+    frame = Frame(np.random.default_rng(2).integers(0, 256, (120, 160, 3), dtype=np.uint8))
+    assert cache.upload(frame) is cache.upload(Frame(frame.image.copy()))
+    assert client.files.uploads[-1] == frame.jpeg and len(client.files.uploads) == 2
+
+def test_lru_and_ttl():
+    """Entries leave by LRU order and after the TTL"""
+    client = StubClient()
+    cache = UploadCache(client, max_entries=2, ttl_s=0.2, inline_max_bytes=0)
+    a, b, c = (random_bytes(64, i) for i in range(3))
+    fa = cache.upload(a)
+    cache.upload(b)
+    assert cache.upload(a) is fa        # a is now most recent
+    cache.upload(c)                     # evicts b
+    assert len(cache) == 2
+    cache.upload(b)
+    assert len(client.files.uploads) == 4
+    time.sleep(0.25)
+    assert cache.upload(a) is not fa    # expired locally
+    assert len(client.files.uploads) == 5
+
+def test_remote_expiry():
+    """A file close to its server-side expiration is uploaded again"""
+    client = StubClient(lifetime=timedelta(seconds=EXPIRY_MARGIN_S + 0.2))
+    cache = UploadCache(client, inline_max_bytes=0)
+    data = random_bytes(64, 0)
+    f1 = cache.upload(data)
+    assert cache.upload(data) is f1
+    time.sleep(0.3)
+    assert cache.upload(data) is not f1
+    assert len(client.files.uploads) == 2
+
+def test_hover_speedup():
+    """Hovering: the same frame sent repeatedly costs one round-trip"""
+    client = StubClient(latency=0.02)
+    cache = UploadCache(client, inline_max_bytes=0)
+    frame = Frame(np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8))
+    t0 = time.perf_counter()
+    for _ in range(20):
+        cache.upload(frame)
+    dt = time.perf_counter() - t0
+    print(f"20 sends of one frame: {dt * 1e3:.1f} ms, {len(client.files.uploads)} upload(s)")
+    assert len(client.files.uploads) == 1
+
+if __name__ == "__main__":
+    test_reuse_and_inline()
+    test_lru_and_ttl()
+    test_remote_expiry()
+    test_hover_speedup()
+    print("Test completed!")
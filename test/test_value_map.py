@@ -5,11 +5,13 @@ Test file for ValueMap visualization and update_value_map functionality
 import sys
 import os
 import math
+import random
+import numpy as np
 
 # Add parent directory to path to import occupancy_map
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from occupancy_map import ValueMap, Pose2D
+from occupancy_map import ValueMap, Pose2D, Cell
 
 def print_value_numbers(vm, show_range=20):
     """Print actual numeric values from value, conf, and n maps"""
@@ -176,10 +178,101 @@ def test_basic_update():
     updated_cells4 = (vm4.n > 0).sum()
     print(f"\nUpdated cells: {updated_cells4}")
     '''
+def test_vectorized_matches_loop():
+    """Batched update_value_map must give the same maps as the per-cell loop"""
+    rng = random.Random(0)
+    for cell_size in (0.2, 0.1, 0.05):
+        vm_vec = ValueMap(10, 10, cell_size)
+        vm_loop = ValueMap(10, 10, cell_size)
+        obs_y = np.arange(0, vm_vec.map_size_N, 7)
+        obs_x = (obs_y * 3) % vm_vec.map_size_N
+        vm_vec.grid[obs_y, obs_x] = Cell.OBSTACLE
+        vm_loop.grid[obs_y, obs_x] = Cell.OBSTACLE
+        for i in range(12):
+            x = rng.uniform(0, vm_vec.map_size_N - 1)
+            y = rng.uniform(0, vm_vec.map_size_N - 1)
+            yaw = rng.choice([0.0, math.pi / 2, math.pi, -math.pi / 2, rng.uniform(-7.0, 7.0)])
+            for vm in (vm_vec, vm_loop):
+                vm.curr_point.x, vm.curr_point.y, vm.curr_point.yaw = x, y, yaw
+            score = rng.uniform(0.0, 1.0)
+            r = rng.choice([2, 4, 7.5, 15])
+            fov = rng.choice([60.0, 82.0, 120.0])
+            pose = Pose2D(x=30.0, y=10.0, yaw=yaw)
+            # twice so the fusion branch (conf > 0) is exercised too
+            for s in (score, score * 0.5):
+                vm_vec.update_value_map(s, pose, fov_deg=fov, max_range_m=r)
+                vm_loop._update_value_map_loop(s, pose, fov_deg=fov, max_range_m=r)
+        assert np.array_equal(vm_vec.value, vm_loop.value)
+        assert np.array_equal(vm_vec.conf, vm_loop.conf)
+        assert np.array_equal(vm_vec.n, vm_loop.n)
+
+def test_stencil_cache():
+    """Cached sector stencils match the exact update when the pose sits on a sector center"""
+    vm_exact = ValueMap(10, 10, 0.1)
+    vm_stencil = ValueMap(10, 10, 0.1)
+    for i, sector in enumerate([0, 4, 8, 12, 2, 0, 4]):
+        for vm in (vm_exact, vm_stencil):
+            vm.curr_point.x = float(vm.center_offset + i)
+            vm.curr_point.y = float(vm.center_offset - i)
+            vm.curr_point.yaw = math.radians(sector * 22.5)
+        pose = Pose2D(x=30.0, y=10.0, yaw=0.0)
+        vm_exact.update_value_map(0.6, pose, fov_deg=82.0, max_range_m=8)
+        vm_stencil.update_value_map(0.6, pose, fov_deg=82.0, max_range_m=8, use_stencil=True)
+        assert vm_exact.find_optimal_point(pose, max_range_m=8) == \
+            vm_stencil.find_optimal_point(pose, max_range_m=8, use_stencil=True)
+    assert np.array_equal(vm_exact.value, vm_stencil.value)
+    assert np.array_equal(vm_exact.conf, vm_stencil.conf)
+    assert np.array_equal(vm_exact.n, vm_stencil.n)
+    # 5 distinct sectors, every other lookup is a hit
+    assert vm_stencil.stencils.misses == 5
+    assert vm_stencil.stencils.hits == 9
+
+    # LRU eviction
+    vm_stencil.stencils.max_size = 2
+    vm_stencil.stencils.clear()
+    for r in (3, 4, 5, 3):
+        vm_stencil._fov_stencil(r, 82.0)
+    assert len(vm_stencil.stencils) == 2
+    assert vm_stencil.stencils.misses == 4
+
+def test_find_top_k_points():
+    """Top-k candidates are ranked, filtered and spaced"""
+    vm = ValueMap(10, 10, 0.1)
+    pose = Pose2D(x=30.0, y=10.0, yaw=0.0)
+    vm.update_value_map(0.8, pose, fov_deg=82.0, max_range_m=10)
+    ys, xs, _ = vm._fov_cells(10, 82.0)
+    # make the values distinct so the ranking is well defined
+    vm.value[ys, xs] += np.linspace(0.0, 0.01, ys.size, dtype=np.float32)
+
+    coords, values, confs = vm.find_top_k_points(pose, k=5, max_range_m=10)
+    assert coords.shape == (5, 2)
+    assert np.all(np.diff(values) <= 0)
+    assert tuple(coords[0]) == vm.find_optimal_point(pose, max_range_m=10)
+    assert np.array_equal(values, np.sort(vm.value[ys, xs])[::-1][:5])
+    assert np.array_equal(confs, vm.conf[coords[:, 0], coords[:, 1]])
+
+    # filtered cells never come back
+    best = tuple(coords[0])
+    vm.grid[best] = Cell.VISITED
+    coords2, _, _ = vm.find_top_k_points(pose, k=5, max_range_m=10, skip_cells=(Cell.OBSTACLE, Cell.VISITED))
+    assert best not in map(tuple, coords2)
+    _, _, confs3 = vm.find_top_k_points(pose, k=50, max_range_m=10, min_conf=0.5)
+    assert np.all(confs3 >= 0.5)
+
+    # spacing
+    coords4, values4, _ = vm.find_top_k_points(pose, k=4, max_range_m=10, min_spacing=3.0)
+    assert len(coords4) == 4
+    d = np.hypot(*(coords4[:, None, :] - coords4[None, :, :]).transpose(2, 0, 1))
+    assert np.all(d[~np.eye(4, dtype=bool)] >= 3.0)
+    assert np.all(np.diff(values4) <= 0)
+
 if __name__ == "__main__":
     print("Testing ValueMap update_value_map functionality\n")
     
     test_basic_update()
+    test_vectorized_matches_loop()
+    test_stencil_cache()
+    test_find_top_k_points()
     
     print("\n" + "=" * 60)
     print("Test completed!")
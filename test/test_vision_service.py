@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test file for the pooled, batched Cloud Vision service (Scorer/vision_service.py)
+against a local fake ImageAnnotator gRPC server (no network, no credentials)
+"""
+import sys
+import os
+import time
+import threading
+from concurrent import futures
+
+import grpc
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import vision
+from google.cloud.vision_v1.services.image_annotator.transports import ImageAnnotatorGrpcTransport
+from Scorer.vision_service import VisionService, default_vision_service, shutdown_default_vision_service
+
+class FakeVisionServer:
+    """ImageAnnotator.BatchAnnotateImages on localhost; every image gets one
+    object named after its bytes, images whose bytes start with b"bad" fail"""
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.batches = []
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+        handler = grpc.method_handlers_generic_handler("google.cloud.vision.v1.ImageAnnotator", {
+            "BatchAnnotateImages": grpc.unary_unary_rpc_method_handler(
+                self.batch_annotate,
+                request_deserializer=vision.BatchAnnotateImagesRequest.deserialize,
+                response_serializer=vision.BatchAnnotateImagesResponse.serialize),
+        })
+        self.server.add_generic_rpc_handlers((handler,))
+        self.port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+
+    def batch_annotate(self, request, context):
+        time.sleep(self.latency)
+        self.batches.append(len(request.requests))
+        responses = []
+        for r in request.requests:
+            name = r.image.content.decode()
+            if name.startswith("bad"):
+                responses.append(vision.AnnotateImageResponse(error={"code": 3, "message": f"cannot read {name}"}))
+                continue
+            obj = vision.LocalizedObjectAnnotation(name=name, score=0.9, bounding_poly={
+                "normalized_vertices": [{"x": 0.1, "y": 0.2}, {"x": 0.5, "y": 0.2},
+                                        {"x": 0.5, "y": 0.6}, {"x": 0.1, "y": 0.6}]})
+            responses.append(vision.AnnotateImageResponse(localized_object_annotations=[obj]))
+        return vision.BatchAnnotateImagesResponse(responses=responses)
+
+    def client_factory(self):
+        channel = grpc.insecure_channel(f"127.0.0.1:{self.port}")
+        return vision.ImageAnnotatorClient(transport=ImageAnnotatorGrpcTransport(channel=channel))
+
+    def stop(self):
+        self.server.stop(None)
+
+def test_batches_and_per_frame_futures():
+    """Frames submitted together share requests, each gets its own result"""
+    server = FakeVisionServer()
+    service = VisionService(pool_size=2, batch_window_s=0.05, client_factory=server.client_factory)
+    futs = [service.submit(f"img{i}".encode()) for i in range(40)]
+    results = [f.result(timeout=10) for f in futs]
+    for i, r in enumerate(results):
+        assert r == [{"object": f"img{i}", "score": r[0]["score"], "bbox": r[0]["bbox"]}]
+        assert abs(r[0]["score"] - 0.9) < 1e-6
+    assert max(server.batches) <= 16 and sum(server.batches) == 40 and len(server.batches) <= 4
+    m = service.metrics()
+    print(f"40 frames: batches {server.batches}, {m}")
+    assert m["completed"] == 40 and m["clients"] <= 2 and m["batch_mean"] >= 10
+    assert 0 < m["p50_ms"] <= m["p90_ms"] <= m["p99_ms"]
+    service.close()
+    server.stop()
+
+def test_clients_are_reused():
+    """Many sequential calls reuse the pool's clients"""
+    server = FakeVisionServer(latency=0.0)
+    created = []
+    def factory():
+        created.append(1)
+        return server.client_factory()
+    service = VisionService(pool_size=2, batch_window_s=0.0, client_factory=factory)
+    for i in range(30):
+        assert service.detect(f"seq{i}".encode(), timeout=10)[0]["object"] == f"seq{i}"
+    assert len(created) <= 2 and service.metrics()["batches"] == 30
+    service.close()
+    server.stop()
+
+def test_errors_and_cancellation():
+    """A bad image fails its own future only; cancelled frames are not sent"""
+    server = FakeVisionServer()
+    service = VisionService(pool_size=1, batch_window_s=0.1, timeout_s=1.0,
+                            client_factory=server.client_factory)
+    good, bad, dropped = service.submit(b"ok"), service.submit(b"bad image"), service.submit(b"skip")
+    assert dropped.cancel()
+    assert good.result(timeout=10)[0]["object"] == "ok"
+    try:
+        bad.result(timeout=10)
+        assert False, "the bad image should fail"
+    except RuntimeError as e:
+        assert "cannot read" in str(e)
+    assert server.batches == [2] and service.metrics()["failed"] == 1
+    # the whole request failing fails every frame in it
+    server.stop()
+    fut = service.submit(b"server gone")
+    t0 = time.perf_counter()
+    assert fut.exception(timeout=10) is not None
+    assert time.perf_counter() - t0 < 3.0  # retries stop at timeout_s
+    assert service.metrics()["failed"] == 2
+    service.close()
+
+def test_concurrent_callers():
+    """Threads calling detect() at once are served from shared batches"""
+    server = FakeVisionServer(latency=0.05)
+    service = VisionService(pool_size=2, batch_window_s=0.02, client_factory=server.client_factory)
+    out = {}
+    def caller(i):
+        out[i] = service.detect(f"t{i}".encode(), timeout=10)[0]["object"]
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(24)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    dt = time.perf_counter() - t0
+    print(f"24 concurrent callers: {dt * 1e3:.0f} ms in {len(server.batches)} requests")
+    assert out == {i: f"t{i}" for i in range(24)}
+    assert len(server.batches) < 24
+    service.close()
+    server.stop()
+
+def test_default_service_lifecycle():
+    """The shared service is only closed if it exists, and comes back after close"""
+    shutdown_default_vision_service()
+    assert shutdown_default_vision_service() is None  # never created: nothing started or closed
+    first = default_vision_service()
+    first.close()
+    second = default_vision_service()
+    assert first.closed and second is not first and not second.closed
+    assert shutdown_default_vision_service(timeout=5)["completed"] == 0 and second.closed
+
+if __name__ == "__main__":
+    test_batches_and_per_frame_futures()
+    test_clients_are_reused()
+    test_errors_and_cancellation()
+    test_concurrent_callers()
+    test_default_service_lifecycle()
+    print("Test completed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test file for batched trajectory rasterization (update_visited_batch / update_visited_path)
+"""
+import sys
+import os
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import OccupancyGrid, Pose2D, Cell
+
+def test_batch_matches_single_segments():
+    """Straight, diagonal and shallow segments give the same cells as the Bresenham walk"""
+    single = OccupancyGrid(10, 10, 0.1)
+    batch = OccupancyGrid(10, 10, 0.1)
+    c = single.center_offset
+    path = [(c, c), (c, c + 30), (c + 20, c + 30), (c + 40, c + 10), (c + 40, c - 25), (c - 5, c - 25)]
+    for p0, p1 in zip(path[:-1], path[1:]):
+        single.update_visited_in_occup_grid(Pose2D(p1[0], p1[1], 0.0), Pose2D(p0[0], p0[1], 0.0))
+    batch.update_visited_path(path)
+    assert np.array_equal(single.grid, batch.grid)
+
+    # shallow and steep slopes, where rounding ties decide the cell
+    rng = np.random.default_rng(0)
+    shallow = [((0, 0), (10, 1)), ((0, 0), (7, 2)), ((3, -2), (-9, 1)), ((0, 0), (1, 12)), ((5, 5), (-2, 8))]
+    shallow += [(tuple(rng.integers(-30, 30, 2)), tuple(rng.integers(-30, 30, 2))) for _ in range(200)]
+    for p0, p1 in shallow:
+        single = OccupancyGrid(10, 10, 0.1)
+        batch = OccupancyGrid(10, 10, 0.1)
+        p0, p1 = (c + p0[0], c + p0[1]), (c + p1[0], c + p1[1])
+        single.update_visited_in_occup_grid(Pose2D(p1[0], p1[1], 0.0), Pose2D(p0[0], p0[1], 0.0))
+        batch.update_visited_batch([p0], [p1])
+        assert np.array_equal(single.grid, batch.grid), (p0, p1)
+
+def test_obstacles_and_footprint():
+    """Obstacles are kept and a footprint marks a corridor"""
+    om = OccupancyGrid(10, 10, 0.1)
+    c = om.center_offset
+    om.grid[c + 5, c] = Cell.OBSTACLE
+    om.update_visited_batch([(c, c)], [(c, c + 10)], width_m=0.5)
+    assert om.grid[c + 5, c] == Cell.OBSTACLE
+    assert om.grid[c + 5, c + 2] == Cell.VISITED
+    assert om.grid[c + 5, c - 2] == Cell.VISITED
+    assert om.grid[c + 5, c + 3] == Cell.UNKNOWN
+    # segments that leave a dense map are skipped
+    om.update_visited_batch([(c, c)], [(c, om.map_size_N + 5)])
+    assert om.grid[c + 15, c] == Cell.UNKNOWN
+
+def test_replay_speed():
+    """Replaying a long flight in one call"""
+    om = OccupancyGrid(50, 50, 0.1)
+    rng = np.random.default_rng(0)
+    poses = [Pose2D(x, y, 0.0) for x, y in rng.uniform(200, 800, (2000, 2))]
+    t0 = time.perf_counter()
+    om.update_visited_path(poses, width_m=0.3)
+    print(f"2000 poses: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    assert (om.grid == Cell.VISITED).sum() > 0
+
+if __name__ == "__main__":
+    test_batch_matches_single_segments()
+    test_obstacles_and_footprint()
+    test_replay_speed()
+    print("Test completed!")
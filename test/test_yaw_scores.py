@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test file for per-column yaw scores (Scorer.score_yaw_direction_in_image)
+and the bearing-indexed cone update (ValueMap.update_value_map_bearings)
+"""
+import sys
+import os
+import math
+import time
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GENAI_API_KEY", "test")
+
+from occupancy_map import OccupancyGrid, ValueMap, Pose2D, Cell
+from frame import Frame
+from drone_controller import Scorer, MyConfig, Perception, apply_perception, project_detections, to_detections
+
+def make_maps(yaw=0.3):
+    om = OccupancyGrid(50, 50, 0.1)
+    om.curr_point = Pose2D(x=om.curr_point.x + 0.3, y=om.curr_point.y - 0.2, yaw=yaw)
+    vm = ValueMap.from_occupancy(om)
+    vm.curr_point = Pose2D(x=om.curr_point.x, y=om.curr_point.y, yaw=yaw)
+    return om, vm
+
+def test_constant_vector_is_update_value_map():
+    """A constant score vector gives exactly the scalar update"""
+    for use_stencil in (False, True):
+        _, a = make_maps()
+        _, b = make_maps()
+        for score in (0.7, 0.2, 0.9):
+            a.update_value_map(score, Pose2D(0.0, 0.0, a.curr_point.yaw), max_range_m=12, use_stencil=use_stencil)
+            b.update_value_map_bearings(np.full(32, score), max_range_m=12, use_stencil=use_stencil)
+        assert np.array_equal(a.n, b.n) and np.allclose(a.value, b.value) and np.allclose(a.conf, b.conf)
+
+def test_scores_follow_bearing():
+    """Each cell takes the score of its own bearing across the cone"""
+    _, vm = make_maps(yaw=0.0)
+    half = math.radians(82.0) / 2.0
+    bearings = np.linspace(-half, half, 16)
+    scores = (bearings > 0).astype(np.float64)  # only the right half of the image
+    vm.update_value_map_bearings(scores, bearings, max_range_m=12)
+    cy, cx = int(vm.curr_point.y), int(vm.curr_point.x)
+    assert vm.value[cy + 10, cx + 5] > 0.1   # ahead and to the right (east)
+    assert vm.value[cy + 10, cx - 5] == 0.0 and vm.n[cy + 10, cx - 5] == 1  # seen, nothing there
+    assert vm.n[cy - 10, cx] == 0            # behind the drone
+
+def test_column_scores_from_detections():
+    """Columns covered by a box get its score and range, the others nothing"""
+    scorer = Scorer()
+    dets = [{"object": "person", "score": 0.8, "bbox": [0.6, 0.2, 0.8, 0.8]},
+            {"object": "umbrella", "score": 0.5, "bbox": [0.7, 0.1, 0.9, 0.3]}]
+    s = scorer.score_yaw_direction_in_image(dets, n_bins=20)
+    assert s.bearings.shape == s.ranges.shape == s.value.shape == (20,)
+    assert np.all(np.diff(s.bearings) > 0) and np.allclose(s.bearings, -s.bearings[::-1])
+    assert abs(s.bearings[-1] - math.atan(0.475 / (0.5 / math.tan(math.radians(41.0))))) < 1e-12
+    u = (np.arange(20) + 0.5) / 20
+    expect = np.maximum(np.where((u >= 0.6) & (u <= 0.8), 0.8, 0.0), np.where((u >= 0.7) & (u <= 0.9), 0.5, 0.0))
+    assert np.allclose(s.value, expect)
+    assert np.all(np.isnan(s.ranges[u < 0.6])) and np.all(np.isfinite(s.ranges[(u > 0.6) & (u < 0.9)]))
+    empty = scorer.score_yaw_direction_in_image([])
+    assert empty.value.shape == (MyConfig.YAW_BINS,) and not empty.value.any() and np.all(np.isnan(empty.ranges))
+    assert scorer.score_yaw_direction_in_image(None) is None
+
+def test_apply_perception_uses_columns():
+    """A frame with a person on the right raises value on the right only"""
+    om, vm = make_maps(yaw=0.0)
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    p = Perception(Frame(np.zeros((8, 8, 3), dtype=np.uint8)), (om.curr_point.x, om.curr_point.y, 0.0), 0.0)
+    p.detections = [{"object": "person", "score": 0.9, "bbox": [0.75, 0.3, 0.85, 0.7]}]
+    p.llm_detections = [{"object": "person with umbrella", "score": 0.95}]  # no box
+    for _ in range(2):
+        apply_perception(om, vm, scorer, p)
+    cy, cx = int(vm.curr_point.y), int(vm.curr_point.x)
+    ys, xs = np.nonzero(vm.n)
+    right = xs > cx + 1
+    left = xs < cx - 1
+    assert vm.value[ys[right], xs[right]].max() > 0.0 and vm.value[ys[left], xs[left]].max() == 0.0
+    # detections are targets, not obstacles: the occupancy map is untouched
+    assert not np.any(om.log_odds) and not np.any(om.grid == Cell.OBSTACLE)
+
+def test_detection_counted_once():
+    """A detected object is fused at its point only, the cone fills in the rest"""
+    om, vm = make_maps(yaw=0.0)
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    p = Perception(Frame(np.zeros((8, 8, 3), dtype=np.uint8)), (om.curr_point.x, om.curr_point.y, 0.0), 0.0)
+    p.detections = [{"object": "dog", "score": 0.9, "bbox": [0.45, 0.05, 0.55, 0.95]}]  # half a metre ahead
+    apply_perception(om, vm, scorer, p)
+    assert vm.n.max() == 1  # no cell fused twice in one frame
+    _, alone = make_maps(yaw=0.0)
+    bearings, ranges = project_detections(to_detections(p.detections))
+    cells = alone.update_value_points(bearings, ranges, 0.9, origin=om.curr_point,
+                                      radius_m=MyConfig.DETECTION_RADIUS_M, fov_deg=MyConfig.CAMERA_FOV_DEG)
+    ys, xs = np.nonzero(alone.n)
+    assert len(ys) > 1 and np.allclose(vm.value[ys, xs], alone.value[ys, xs])
+    (cy, cx), = cells  # the dog's own cell, fused once with its score
+    assert alone.n[cy, cx] == vm.n[cy, cx] == 1 and vm.value[cy, cx] == alone.value[cy, cx] > 0
+    assert np.count_nonzero(vm.n) > len(ys)  # the rest of the cone was still updated
+
+def test_cone_reaches_detection_range():
+    """Column scores cover the depth the object was projected to, and the object counts once"""
+    om, vm = make_maps(yaw=0.0)
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    p = Perception(Frame(np.zeros((8, 8, 3), dtype=np.uint8)), (om.curr_point.x, om.curr_point.y, 0.0), 0.0)
+    p.detections = [{"object": "person", "score": 0.9, "bbox": [0.45, 0.3, 0.55, 0.75]}]
+    bearings, ranges = project_detections(to_detections(p.detections))
+    assert 2.5 < ranges[0] < MyConfig.MAX_DETECTION_RANGE_M  # about 3 m ahead
+    apply_perception(om, vm, scorer, p)
+    cy, cx = int(vm.curr_point.y), int(vm.curr_point.x)
+    r = int(ranges[0] / vm.cell_size)
+    assert vm.n[cy + r, cx] == 1 and vm.value[cy + r, cx] > 0.5  # the object, fused once
+    assert vm.n[cy + r - 5, cx] == 1 and vm.value[cy + r - 5, cx] > 0.0  # the column in front of it
+    assert vm.n.max() == 1
+
+def test_obstacles_from_occupancy_grid():
+    """The cone skips cells the occupancy grid marks as obstacles"""
+    om, vm = make_maps(yaw=0.0)
+    scorer = Scorer()
+    scorer.attach_maps(om, vm)
+    cy, cx = int(vm.curr_point.y), int(vm.curr_point.x)
+    om.grid[cy + 8, cx - 1:cx + 2] = Cell.OBSTACLE
+    p = Perception(Frame(np.zeros((8, 8, 3), dtype=np.uint8)), (om.curr_point.x, om.curr_point.y, 0.0), 0.0)
+    p.detections = [{"object": "person", "score": 0.9, "bbox": [0.45, 0.3, 0.55, 0.75]}]
+    apply_perception(om, vm, scorer, p)
+    assert not vm.n[cy + 8, cx - 1:cx + 2].any() and vm.n[cy + 7, cx] == 1
+    _, plain = make_maps(yaw=0.0)
+    plain.update_value_map(0.5, Pose2D(0.0, 0.0, 0.0), max_range_m=12, obstacle_grid=om.grid)
+    assert not plain.n[cy + 8, cx - 1:cx + 2].any() and plain.n[cy + 7, cx] == 1
+
+def test_same_cost_as_scalar_update():
+    """The per-column update is one batched op over the cone"""
+    _, a = make_maps()
+    _, b = make_maps()
+    scores = np.random.default_rng(0).uniform(0, 1, 64)
+    t0 = time.perf_counter()
+    for _ in range(200):
+        a.update_value_map(0.5, Pose2D(0.0, 0.0, a.curr_point.yaw), max_range_m=20)
+    t_scalar = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(200):
+        b.update_value_map_bearings(scores, max_range_m=20)
+    t_cols = time.perf_counter() - t0
+    print(f"cone update: scalar {t_scalar / 200 * 1e3:.3f} ms, 64 columns {t_cols / 200 * 1e3:.3f} ms")
+    assert t_cols < 3 * t_scalar
+
+if __name__ == "__main__":
+    test_constant_vector_is_update_value_map()
+    test_scores_follow_bearing()
+    test_column_scores_from_detections()
+    test_apply_perception_uses_columns()
+    test_detection_counted_once()
+    test_cone_reaches_detection_range()
+    test_obstacles_from_occupancy_grid()
+    test_same_cost_as_scalar_update()
+    print("Test completed!")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batched ValueMap.update_value_map vs the per-cell loop version
+"""
+import sys
+import os
+import math
+import time
+import numpy as np
+
+# Add parent directory to path to import occupancy_map
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from occupancy_map import ValueMap, Pose2D
+
+RANGES_M = [1.0, 2.0, 4.0, 8.0]
+CELL_SIZES = [0.2, 0.1, 0.05]
+REPEAT = 5
+
+def time_update(update, vm, pose, r_cells, repeat=REPEAT, **kwargs):
+    best = float("inf")
+    for i in range(repeat):
+        vm.curr_point.yaw = (i * 0.37) % (2 * math.pi) - math.pi
+        t0 = time.perf_counter()
+        update(0.75, pose, fov_deg=82.0, max_range_m=r_cells, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def run_benchmark():
+    print(f"{'range(m)':>8} {'cell(m)':>8} {'r_cells':>8} {'loop(ms)':>10} {'numpy(ms)':>10} {'speedup':>8} {'equal':>6} {'stencil(ms)':>12}")
+    for cell_size in CELL_SIZES:
+        for range_m in RANGES_M:
+            # update_value_map takes the radius in cells
+            r_cells = int(round(range_m / cell_size))
+            vm_loop = ValueMap(10, 10, cell_size)
+            vm_vec = ValueMap(10, 10, cell_size)
+            pose = Pose2D(x=30.0, y=10.0, yaw=0.0)
+            t_loop = time_update(vm_loop._update_value_map_loop, vm_loop, pose, r_cells)
+            t_vec = time_update(vm_vec.update_value_map, vm_vec, pose, r_cells)
+            # warm the stencil cache once, then time cached updates
+            vm_st = ValueMap(10, 10, cell_size)
+            time_update(vm_st.update_value_map, vm_st, pose, r_cells, use_stencil=True)
+            t_st = time_update(vm_st.update_value_map, vm_st, pose, r_cells, use_stencil=True)
+            equal = (np.array_equal(vm_loop.value, vm_vec.value)
+                     and np.array_equal(vm_loop.conf, vm_vec.conf)
+                     and np.array_equal(vm_loop.n, vm_vec.n))
+            print(f"{range_m:8.1f} {cell_size:8.2f} {r_cells:8d} {t_loop*1e3:10.2f} {t_vec*1e3:10.3f} "
+                  f"{t_loop/t_vec:7.1f}x {str(equal):>6} {t_st*1e3:12.3f}")
+
+if __name__ == "__main__":
+    run_benchmark()
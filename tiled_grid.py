@@ -0,0 +1,243 @@
+import numpy as np
+from typing import Dict, Tuple, Optional
+
+# 2D array stored as fixed-size square tiles that are allocated on first write.
+# Reads of tiles that were never written return the fill value.
+# Indices are absolute cell coordinates: negative or beyond `shape` is allowed,
+# so a map backed by this can grow past its nominal bounds.
+# Supported indexing: tiled[y, x] (scalars), tiled[y0:y1, x0:x1] (dense copy),
+# tiled[ys, xs] (integer arrays, gather/scatter like numpy fancy indexing),
+# tiled[mask] (boolean array of the nominal shape, or a tiled mask such as
+# tiled == value).
+# Comparisons (==, !=) with a scalar or another TiledArray run tile by tile and
+# return a tiled bool array: the allocated tiles are compared, the others take
+# the result for the fill value. nonzero() (so np.nonzero/np.argwhere) covers
+# every allocated tile, plus the unallocated nominal area when the fill value
+# itself is nonzero. np.asarray() gives a dense copy of the nominal area.
+class TiledArray:
+    ndim = 2
+
+    def __init__(self, shape: Tuple[int, int], dtype, fill=0, tile_size: int = 64):
+        self.shape = (int(shape[0]), int(shape[1]))  # nominal size, used for open slices
+        self.dtype = np.dtype(dtype)
+        self.fill = self.dtype.type(fill)
+        self.tile_size = int(tile_size)
+        self.tiles: Dict[Tuple[int, int], np.ndarray] = {}
+
+    # ------------------------------------------------------------------
+    # tile helpers
+    def _new_tile(self) -> np.ndarray:
+        return np.full((self.tile_size, self.tile_size), self.fill, dtype=self.dtype)
+
+    def tile(self, ty: int, tx: int, create: bool = False) -> Optional[np.ndarray]:
+        t = self.tiles.get((ty, tx))
+        if t is None and create:
+            t = self._new_tile()
+            self.tiles[(ty, tx)] = t
+        return t
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.tiles) * self.tile_size * self.tile_size * self.dtype.itemsize
+
+    # bounding box (y_min, y_max, x_min, x_max) of allocated tiles, inclusive
+    def allocated_bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        if not self.tiles:
+            return None
+        keys = np.array(list(self.tiles.keys()))
+        T = self.tile_size
+        return (int(keys[:, 0].min()) * T, int(keys[:, 0].max()) * T + T - 1,
+                int(keys[:, 1].min()) * T, int(keys[:, 1].max()) * T + T - 1)
+
+    def copy(self) -> "TiledArray":
+        out = TiledArray(self.shape, self.dtype, self.fill, self.tile_size)
+        out.tiles = {k: t.copy() for k, t in self.tiles.items()}
+        return out
+
+    # dense copy of the nominal area (or of the given slices)
+    def to_dense(self) -> np.ndarray:
+        return self[0:self.shape[0], 0:self.shape[1]]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+    def _compare(self, other, op):
+        if isinstance(other, TiledArray) and other.tile_size == self.tile_size:
+            out = TiledArray(self.shape, np.bool_, fill=op(self.fill, other.fill), tile_size=self.tile_size)
+            for key in self.tiles.keys() | other.tiles.keys():
+                a = self.tiles.get(key, self.fill)
+                b = other.tiles.get(key, other.fill)
+                out.tiles[key] = np.broadcast_to(op(a, b), (self.tile_size, self.tile_size)).copy()
+            return out
+        if np.ndim(other) == 0:
+            out = TiledArray(self.shape, np.bool_, fill=op(self.fill, other), tile_size=self.tile_size)
+            out.tiles = {key: op(t, other) for key, t in self.tiles.items()}
+            return out
+        return op(self.to_dense(), np.asarray(other))
+
+    # elementwise, like numpy
+    def __eq__(self, other):
+        return self._compare(other, np.equal)
+
+    def __ne__(self, other):
+        return self._compare(other, np.not_equal)
+
+    # (ys, xs) of the nonzero cells in row-major order, see the note at the top
+    def nonzero(self) -> Tuple[np.ndarray, np.ndarray]:
+        T = self.tile_size
+        ys, xs = [np.zeros(0, np.int64)], [np.zeros(0, np.int64)]
+        for (ty, tx), t in self.tiles.items():
+            iy, ix = np.nonzero(t)
+            ys.append(iy + ty * T)
+            xs.append(ix + tx * T)
+        if self.fill:
+            for ty, a, b in self._tile_ranges(0, self.shape[0]):
+                for tx, c, d in self._tile_ranges(0, self.shape[1]):
+                    if (ty, tx) not in self.tiles:
+                        iy, ix = np.mgrid[a:b, c:d]
+                        ys.append(iy.ravel())
+                        xs.append(ix.ravel())
+        ys, xs = np.concatenate(ys).astype(np.int64), np.concatenate(xs).astype(np.int64)
+        order = np.lexsort((xs, ys))
+        return ys[order], xs[order]
+
+    def any(self) -> bool:
+        return bool(self.fill) or any(t.any() for t in self.tiles.values())
+
+    __hash__ = None
+
+    # ------------------------------------------------------------------
+    # indexing
+    def _mask_cells(self, key) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        # (ys, xs) selected by a boolean mask key, None for any other key
+        if isinstance(key, TiledArray):
+            if key.dtype != np.bool_:
+                return None
+            return key.nonzero()
+        if not (isinstance(key, np.ndarray) and key.dtype == np.bool_):
+            return None
+        if key.shape != self.shape:
+            raise IndexError(f"boolean mask of shape {key.shape} does not match {self.shape}")
+        return np.nonzero(key)
+
+    def _split_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        if len(key) != 2:
+            raise IndexError("TiledArray takes exactly 2 indices")
+        return key
+
+    def _slice_bounds(self, s: slice, axis: int) -> Tuple[int, int]:
+        if s.step not in (None, 1):
+            raise IndexError("TiledArray slices do not support a step")
+        start = 0 if s.start is None else int(s.start)
+        stop = self.shape[axis] if s.stop is None else int(s.stop)
+        return start, max(start, stop)
+
+    def __getitem__(self, key):
+        cells = self._mask_cells(key)
+        if cells is not None:
+            return self._gather(*cells)
+        ky, kx = self._split_key(key)
+        if isinstance(ky, slice) or isinstance(kx, slice):
+            y0, y1 = self._slice_bounds(ky, 0) if isinstance(ky, slice) else (int(ky), int(ky) + 1)
+            x0, x1 = self._slice_bounds(kx, 1) if isinstance(kx, slice) else (int(kx), int(kx) + 1)
+            block = self._read_block(y0, y1, x0, x1)
+            if not isinstance(ky, slice):
+                block = block[0]
+            elif not isinstance(kx, slice):
+                block = block[:, 0]
+            return block
+        if np.isscalar(ky) and np.isscalar(kx):
+            T = self.tile_size
+            y, x = int(ky), int(kx)
+            t = self.tiles.get((y // T, x // T))
+            return self.fill if t is None else t[y % T, x % T]
+        return self._gather(np.asarray(ky), np.asarray(kx))
+
+    def __setitem__(self, key, value):
+        cells = self._mask_cells(key)
+        if cells is not None:
+            self._scatter(*cells, value)
+            return
+        ky, kx = self._split_key(key)
+        if isinstance(ky, slice) or isinstance(kx, slice):
+            y0, y1 = self._slice_bounds(ky, 0) if isinstance(ky, slice) else (int(ky), int(ky) + 1)
+            x0, x1 = self._slice_bounds(kx, 1) if isinstance(kx, slice) else (int(kx), int(kx) + 1)
+            self._write_block(y0, y1, x0, x1, value)
+            return
+        if np.isscalar(ky) and np.isscalar(kx):
+            T = self.tile_size
+            y, x = int(ky), int(kx)
+            self.tile(y // T, x // T, create=True)[y % T, x % T] = value
+            return
+        self._scatter(np.asarray(ky), np.asarray(kx), value)
+
+    # ------------------------------------------------------------------
+    # block and fancy access
+    def _tile_ranges(self, lo: int, hi: int):
+        # yields (tile index, start, stop) covering [lo, hi)
+        T = self.tile_size
+        t = lo // T
+        while t * T < hi:
+            a, b = max(lo, t * T), min(hi, (t + 1) * T)
+            yield t, a, b
+            t += 1
+
+    def _read_block(self, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        out = np.full((y1 - y0, x1 - x0), self.fill, dtype=self.dtype)
+        T = self.tile_size
+        for ty, a, b in self._tile_ranges(y0, y1):
+            for tx, c, d in self._tile_ranges(x0, x1):
+                t = self.tiles.get((ty, tx))
+                if t is not None:
+                    out[a - y0:b - y0, c - x0:d - x0] = t[a - ty * T:b - ty * T, c - tx * T:d - tx * T]
+        return out
+
+    def _write_block(self, y0: int, y1: int, x0: int, x1: int, value) -> None:
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), (y1 - y0, x1 - x0))
+        T = self.tile_size
+        for ty, a, b in self._tile_ranges(y0, y1):
+            for tx, c, d in self._tile_ranges(x0, x1):
+                src = value[a - y0:b - y0, c - x0:d - x0]
+                t = self.tiles.get((ty, tx))
+                if t is None:
+                    # writing the fill value into a missing tile is a no-op
+                    if not (src != self.fill).any():
+                        continue
+                    t = self.tile(ty, tx, create=True)
+                t[a - ty * T:b - ty * T, c - tx * T:d - tx * T] = src
+
+    def _group_by_tile(self, ys: np.ndarray, xs: np.ndarray):
+        # yields (tile key, selector into the flat index arrays, local y, local x)
+        T = self.tile_size
+        ty, tx = ys // T, xs // T
+        ly, lx = ys - ty * T, xs - tx * T
+        if ty.size and ty.min() == ty.max() and tx.min() == tx.max():
+            yield (int(ty[0]), int(tx[0])), slice(None), ly, lx
+            return
+        keys, inverse = np.unique(np.stack([ty, tx], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        splits = np.searchsorted(inverse[order], np.arange(1, len(keys)))
+        for (kty, ktx), sel in zip(keys, np.split(order, splits)):
+            yield (int(kty), int(ktx)), sel, ly[sel], lx[sel]
+
+    def _gather(self, ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+        ys, xs = np.broadcast_arrays(ys, xs)
+        shape = ys.shape
+        ys, xs = ys.reshape(-1).astype(np.int64), xs.reshape(-1).astype(np.int64)
+        out = np.full(ys.shape, self.fill, dtype=self.dtype)
+        for key, sel, ly, lx in self._group_by_tile(ys, xs):
+            t = self.tiles.get(key)
+            if t is not None:
+                out[sel] = t[ly, lx]
+        return out.reshape(shape)
+
+    def _scatter(self, ys: np.ndarray, xs: np.ndarray, value) -> None:
+        ys, xs = np.broadcast_arrays(ys, xs)
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), ys.shape).reshape(-1)
+        ys, xs = ys.reshape(-1).astype(np.int64), xs.reshape(-1).astype(np.int64)
+        for key, sel, ly, lx in self._group_by_tile(ys, xs):
+            self.tile(key[0], key[1], create=True)[ly, lx] = value[sel]
@@ -0,0 +1,118 @@
+import io
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+from google.genai import types
+
+from frame import Frame
+
+# Content-addressed layer over client.files.upload.
+# Images are keyed by a hash of their bytes: the same image sent again reuses
+# the File handle of the first upload instead of another round-trip. Entries
+# leave the cache by LRU order, after ttl_s, or shortly before the server-side
+# expiration_time of the file. Images smaller than inline_max_bytes are not
+# uploaded at all but sent inline with the request.
+
+INLINE_MAX_BYTES = 512 * 1024
+EXPIRY_MARGIN_S = 120.0  # treat a remote file as gone this long before it expires
+
+ImageSource = Union[bytes, bytearray, memoryview, str, os.PathLike, Frame]
+
+@dataclass
+class _Entry:
+    file: types.File
+    created: float
+    expires: float  # local time.time() deadline
+
+class UploadCache:
+    def __init__(self, client, max_entries: int = 128, ttl_s: float = 3600.0,
+                 inline_max_bytes: int = INLINE_MAX_BYTES):
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.inline_max_bytes = inline_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.inlined = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # a File or an inline Part for the image, whichever is cheaper to send
+    def part(self, image: ImageSource, mime_type: Optional[str] = None):
+        data, mime_type = self._read(image, mime_type)
+        if len(data) <= self.inline_max_bytes:
+            self.inlined += 1
+            return types.Part.from_bytes(data=data, mime_type=mime_type)
+        return self._upload(data, mime_type)
+
+    # always a File (uploaded once per content)
+    def upload(self, image: ImageSource, mime_type: Optional[str] = None) -> types.File:
+        data, mime_type = self._read(image, mime_type)
+        return self._upload(data, mime_type)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------------------------------------------------------
+    def _upload(self, data: bytes, mime_type: str) -> types.File:
+        key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.expires:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry.file
+                del self._entries[key]
+                self.evicted += 1
+            self.misses += 1
+        # upload outside the lock, other threads keep using the cache
+        file = self.client.files.upload(file=io.BytesIO(data),
+                                        config=types.UploadFileConfig(mime_type=mime_type))
+        entry = _Entry(file=file, created=now, expires=self._expiry(file, now))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+        return file
+
+    def _expiry(self, file: types.File, now: float) -> float:
+        expires = now + self.ttl_s
+        remote = getattr(file, "expiration_time", None)
+        if isinstance(remote, datetime):
+            if remote.tzinfo is None:
+                remote = remote.replace(tzinfo=timezone.utc)
+            expires = min(expires, remote.timestamp() - EXPIRY_MARGIN_S)
+        return expires
+
+    @staticmethod
+    def _read(image: ImageSource, mime_type: Optional[str]):
+        if isinstance(image, Frame):
+            return image.jpeg, mime_type or Frame.mime_type(".jpg")
+        if isinstance(image, (str, os.PathLike)):
+            with open(image, "rb") as f:
+                data = f.read()
+            if mime_type is None:
+                ext = os.path.splitext(str(image))[1]
+                try:
+                    mime_type = Frame.mime_type(ext)
+                except KeyError:
+                    logging.warning(f"unknown image type {ext!r}, sending as octet-stream")
+                    mime_type = "application/octet-stream"
+            return data, mime_type
+        return bytes(image), mime_type or "image/jpeg"
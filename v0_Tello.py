@@ -1,7 +1,10 @@
-from typing import Tuple
+from typing import Tuple, Optional
+import os
 import time
 from djitellopy import TelloException
 from occupancy_map import OccupancyGrid, ValueMap, Pose2D
+from map_snapshot import MapCheckpointer, load_snapshot, snapshot_exists
+from distance_field import ObstacleDistanceField
 from tello_wrapper import TelloWrapper
 
 
@@ -10,11 +13,15 @@ class MyConfig:
     WIDTH = 50
     HEIGHT = 50
     CELL_SIZE = 0.1
+    SNAPSHOT_DIR = "map_snapshot"  # maps are checkpointed here, set to None to disable
+    RESUME_SNAPSHOT = False        # True continues from the snapshot in SNAPSHOT_DIR instead of replacing it
+    DRONE_RADIUS = 0.2             # metres, moves are clipped to keep this clearance
 
-def test_spatial_memory(tello: TelloWrapper, wp_record: list, occupancy_grid: OccupancyGrid, value_map: ValueMap):
+def test_spatial_memory(tello: TelloWrapper, wp_record: list, occupancy_grid: OccupancyGrid, value_map: ValueMap,
+                        distance_field: Optional[ObstacleDistanceField] = None):
     try:
         # Get delta movement
-        delta_pose = move_drone(tello, wp)
+        delta_pose = move_drone(tello, wp, distance_field)
         if delta_pose is None:
             print("Failed to execute waypoint")
             return False
@@ -41,13 +48,22 @@ def test_spatial_memory(tello: TelloWrapper, wp_record: list, occupancy_grid: Oc
         print(f"Unexpected error: {e}")
         return False
 
-def move_drone(tello: TelloWrapper, wp: list):
+def move_drone(tello: TelloWrapper, wp: list, distance_field: Optional[ObstacleDistanceField] = None):
     import math
     try:
         if wp[0] == "move_forward":
-            tello.move_forward(wp[1])
+            dist = wp[1]
+            if distance_field is not None:
+                # stop short of known obstacles; a move with room to fly is
+                # left for cap_distance()
+                dist = distance_field.safe_distance_cm(dist)
+                if dist < wp[1]:
+                    print(f"Clipped move_forward {wp[1]} -> {dist} cm")
+                if dist == 0:
+                    return Pose2D(x=0.0, y=0.0, yaw=0.0)
+            tello.move_forward(dist)
             # Return delta movement in cm
-            pose = Pose2D(x=0.0, y=float(wp[1]), yaw=0.0)
+            pose = Pose2D(x=0.0, y=float(dist), yaw=0.0)
         elif wp[0] == "turn_cw":
             tello.turn_cw(wp[1])
             # Convert degrees to radians for yaw
@@ -79,14 +95,33 @@ def print_occup_map(occupancy_grid: OccupancyGrid, pose1, pose2):
     for row in occupancy_grid.grid[y_min:y_min+1]:
         print(''.join(symbols.get(cell, '?') for cell in row[x_min:x_min+1]))
 
-def init_spatial_map() -> Tuple[OccupancyGrid, ValueMap]:
+def init_spatial_map(snapshot_dir: Optional[str] = None, resume: bool = False) -> Tuple[OccupancyGrid, ValueMap]:
+    # resume from the last snapshot only when asked to
+    if resume and snapshot_dir is not None:
+        if snapshot_exists(os.path.join(snapshot_dir, "occupancy")) \
+                and snapshot_exists(os.path.join(snapshot_dir, "value")):
+            occupancy_grid = load_snapshot(os.path.join(snapshot_dir, "occupancy"))
+            p = occupancy_grid.curr_point
+            print(f"*** RESUMING spatial map from {snapshot_dir} at cell ({p.x:.1f}, {p.y:.1f}); "
+                  f"the drone must take off from that pose ***")
+            return occupancy_grid, load_snapshot(os.path.join(snapshot_dir, "value"))
+        print(f"No snapshot in {snapshot_dir} to resume, starting with empty maps")
     occupancy_grid = OccupancyGrid(MyConfig.WIDTH, MyConfig.HEIGHT, MyConfig.CELL_SIZE)
     value_map = ValueMap.from_occupancy(occupancy_grid)
     return occupancy_grid, value_map
 
 def main():
     tello = TelloWrapper()
-    occupancy_grid, value_map = init_spatial_map()
+    occupancy_grid, value_map = init_spatial_map(MyConfig.SNAPSHOT_DIR, MyConfig.RESUME_SNAPSHOT)
+    checkpointers = []
+    if MyConfig.SNAPSHOT_DIR is not None:
+        # a fresh run replaces the snapshot an earlier run left behind
+        overwrite = not MyConfig.RESUME_SNAPSHOT
+        checkpointers = [MapCheckpointer(occupancy_grid, os.path.join(MyConfig.SNAPSHOT_DIR, "occupancy"),
+                                         incremental=True, overwrite=overwrite),
+                         MapCheckpointer(value_map, os.path.join(MyConfig.SNAPSHOT_DIR, "value"),
+                                         incremental=True, overwrite=overwrite)]
+    distance_field = ObstacleDistanceField(occupancy_grid, radius_m=MyConfig.DRONE_RADIUS)
     tello.connect()
     tello.start_stream()
     waypoints = [["move_forward", 25], ["turn_cw", 90], ["move_forward", 50], ["turn_cw", 90], ["move_forward", 35], ["turn_cw", 90], "move_forward", 15]
@@ -100,7 +135,9 @@ def main():
                         print("Battery too low, landing...")
                         break
                     if input("Next Waypoint?: [y/n]") == 'y':
-                        success = test_spatial_memory(tello, wp, occupancy_grid, value_map)
+                        success = test_spatial_memory(tello, wp, occupancy_grid, value_map, distance_field)
+                        for cp in checkpointers:
+                            cp.checkpoint()
                         if not success:
                             print("Waypoint failed, stopping...")
                             break